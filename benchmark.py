@@ -0,0 +1,309 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import bson
+import numpy as np
+from bson.raw_bson import RawBSONDocument
+from data_generator import DataGenerator
+from mongodb_handler import MongoDBHandler
+from pipeline import generate_chunk, chunk_plan
+from sinks import JsonFileSink
+
+# Usuários gerados por benchmark e quantas vezes cada um é repetido (vale a melhor rodada)
+DEFAULT_USERS = 20_000
+DEFAULT_REPEAT = 3
+
+# Queda máxima, em porcentagem, de uma métrica de vazão em relação à linha de base
+DEFAULT_THRESHOLD = 10.0
+
+DEFAULT_RESULTS = 'benchmark.json'
+
+BENCHMARK_SEED = 42
+BENCHMARK_REFERENCE_TIME = 1_700_000_000
+
+
+def peak_rss_mb() -> float:
+    """
+    Retorna o pico de memória residente do processo até o momento. Como o pico
+    é o do processo inteiro, `run_benchmarks` executa cada benchmark em um
+    processo próprio.
+
+    Retorno:
+    float: Pico de RSS em MiB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é medido em KiB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def best_time(run: Callable[[], object], repeat: int, setup: Optional[Callable[[], object]] = None) -> float:
+    """
+    Mede a melhor de `repeat` execuções de `run`.
+
+    Parâmetros:
+    run (Callable): Função medida; recebe o retorno de `setup`, se houver.
+    repeat (int): Número de rodadas.
+    setup (Callable, opcional): Preparação de cada rodada, fora da medição.
+
+    Retorno:
+    float: Menor tempo, em segundos.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        run() if setup is None else run(state)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _rates(seconds: float, **amounts) -> Dict[str, float]:
+    metrics = {'seconds': round(seconds, 6)}
+    for name, amount in amounts.items():
+        metrics[f'{name}_per_sec'] = round(amount / seconds, 2) if seconds else 0.0
+    metrics['peak_rss_mb'] = round(peak_rss_mb(), 2)
+    return metrics
+
+
+def _generator(config: dict) -> DataGenerator:
+    random.seed(BENCHMARK_SEED)
+    return DataGenerator(config, seed=BENCHMARK_SEED, id_key=BENCHMARK_SEED,
+                         reference_time=BENCHMARK_REFERENCE_TIME)
+
+
+def _chunks(config: dict, users: int, date_format: str, encoder=None) -> list:
+    return [generate_chunk(config, BENCHMARK_SEED, index, start, size, date_format, encoder,
+                           BENCHMARK_REFERENCE_TIME)
+            for index, start, size in chunk_plan(users, min(users, 10_000))]
+
+
+def bench_create_number(config: dict, users: int, repeat: int) -> Dict[str, float]:
+    calls = users * 10
+    seconds = best_time(lambda generator: [generator.create_number(18) for _ in range(calls)], repeat,
+                        lambda: _generator(config))
+    return _rates(seconds, calls=calls)
+
+
+def bench_generate_transactions(config: dict, users: int, repeat: int) -> Dict[str, float]:
+    transactions = users * 2
+    seconds = best_time(lambda generator: generator.generate_transactions(transactions), repeat,
+                        lambda: _generator(config))
+    return _rates(seconds, transactions=transactions)
+
+
+def bench_generate_user(config: dict, users: int, repeat: int) -> Dict[str, float]:
+    generated = {}
+
+    def run(generator):
+        generated['transactions'] = sum(len(generator.generate_user()['transactions']) for _ in range(users))
+
+    seconds = best_time(run, repeat, lambda: _generator(config))
+    return _rates(seconds, users=users, transactions=generated['transactions'])
+
+
+def bench_generate_users_batch(config: dict, users: int, repeat: int) -> Dict[str, float]:
+    generated = {}
+
+    def run(generator):
+        generated['transactions'] = sum(len(user['transactions']) for user in generator.generate_users_batch(users))
+
+    seconds = best_time(run, repeat, lambda: _generator(config))
+    return _rates(seconds, users=users, transactions=generated['transactions'])
+
+
+def bench_json_sink(config: dict, users: int, repeat: int) -> Dict[str, float]:
+    chunks = _chunks(config, users, JsonFileSink.date_format)
+    transactions = sum(len(user['transactions']) for chunk in chunks for user in chunk)
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'benchmark.json')
+
+        def run():
+            with JsonFileSink(file_path) as sink:
+                for chunk in chunks:
+                    sink.write(chunk)
+
+        seconds = best_time(run, repeat)
+        size = os.path.getsize(file_path)
+    return _rates(seconds, users=users, transactions=transactions, bytes=size)
+
+
+class MemoryCollection:
+    """
+    Coleção em memória com a interface de insert_many do Motor.
+
+    Substitui o servidor no benchmark: codifica cada documento em BSON, como o
+    driver faria antes de enviá-lo, e contabiliza os bytes.
+    """
+
+    def __init__(self):
+        self.documents = 0
+        self.bytes = 0
+
+    async def insert_many(self, documents: List, ordered: bool = True):
+        for document in documents:
+            raw = document.raw if isinstance(document, RawBSONDocument) else bson.encode(document)
+            self.bytes += len(raw)
+        self.documents += len(documents)
+
+
+def _bench_mongo(config: dict, users: int, repeat: int, raw_bson: bool) -> Dict[str, float]:
+    handler = MongoDBHandler('mongodb://localhost:27017', 'benchmark', 'benchmark', raw_bson=raw_bson)
+    chunks = _chunks(config, users, handler.date_format, handler.encoder)
+    transactions = None if raw_bson else sum(len(user['transactions']) for chunk in chunks for user in chunk)
+
+    async def source():
+        for chunk in chunks:
+            # insert_chunks acrescenta o _id aos dicionários
+            yield chunk if raw_bson else [dict(user) for user in chunk]
+
+    def run(collection):
+        handler.coll = collection
+        asyncio.run(handler.insert_chunks(source()))
+
+    collection = {}
+
+    def setup():
+        collection['last'] = MemoryCollection()
+        return collection['last']
+
+    seconds = best_time(run, repeat, setup)
+    amounts = {'users': users}
+    if transactions is not None:
+        amounts['transactions'] = transactions
+    return _rates(seconds, **amounts, bytes=collection['last'].bytes)
+
+
+def bench_mongo_sink(config: dict, users: int, repeat: int) -> Dict[str, float]:
+    return _bench_mongo(config, users, repeat, raw_bson=False)
+
+
+def bench_mongo_sink_raw(config: dict, users: int, repeat: int) -> Dict[str, float]:
+    return _bench_mongo(config, users, repeat, raw_bson=True)
+
+
+BENCHMARKS = {
+    'create_number': bench_create_number,
+    'generate_transactions': bench_generate_transactions,
+    'generate_user': bench_generate_user,
+    'generate_users_batch': bench_generate_users_batch,
+    'json_sink': bench_json_sink,
+    'mongo_sink': bench_mongo_sink,
+    'mongo_sink_raw': bench_mongo_sink_raw,
+}
+
+
+def run_benchmarks(config: dict, users: int = DEFAULT_USERS, repeat: int = DEFAULT_REPEAT,
+                   names: Optional[List[str]] = None) -> Dict:
+    """
+    Executa os benchmarks de geração e dos destinos, cada um em um processo novo
+    (spawn), para que o pico de memória de um não contamine os seguintes.
+
+    Parâmetros:
+    config (dict): Dicionário de configuração carregado do arquivo config.json.
+    users (int): Usuários gerados (ou gravados) por benchmark.
+    repeat (int): Rodadas de cada benchmark; vale a mais rápida.
+    names (list, opcional): Benchmarks a executar; se ausente, todos.
+
+    Retorno:
+    dict: {'meta': {...}, 'benchmarks': {nome: {métrica: valor}}}.
+    """
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for name in names or BENCHMARKS:
+        if name not in BENCHMARKS:
+            raise ValueError(f'Unknown benchmark {name}')
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[name] = executor.submit(BENCHMARKS[name], config, users, repeat).result()
+    return {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'users': users,
+            'repeat': repeat,
+        },
+        'benchmarks': results,
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Compara as métricas de vazão (`*_per_sec`) com as de uma linha de base.
+
+    Parâmetros:
+    results (dict): Resultados de `run_benchmarks`.
+    baseline (dict): Resultados gravados anteriormente.
+    threshold (float): Queda máxima tolerada, em porcentagem.
+
+    Retorno:
+    list: Descrição de cada métrica que caiu mais que `threshold`; vazia se não houver regressão.
+    """
+    regressions = []
+    for name, metrics in results['benchmarks'].items():
+        reference = baseline.get('benchmarks', {}).get(name, {})
+        for metric, value in metrics.items():
+            if not metric.endswith('_per_sec') or not reference.get(metric):
+                continue
+            change = (value - reference[metric]) / reference[metric] * 100
+            if change < -threshold:
+                regressions.append(f'{name}.{metric}: {value:.2f} vs {reference[metric]:.2f} ({change:+.1f}%)')
+    return regressions
+
+
+def format_results(results: Dict) -> str:
+    """
+    Formata os resultados como uma tabela, uma linha por benchmark.
+    """
+    lines = []
+    for name, metrics in results['benchmarks'].items():
+        rates = ', '.join(f'{metric}={value:,.0f}' for metric, value in metrics.items() if metric.endswith('_per_sec'))
+        lines.append(f'{name:<24} {metrics["seconds"]:>9.3f}s  {rates}  peak_rss={metrics["peak_rss_mb"]:.1f}MiB')
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks de vazão do gerador de dados')
+    parser.add_argument('--config', default='config.json', help='Arquivo de configuração (padrão: config.json)')
+    parser.add_argument('--users', type=int, default=DEFAULT_USERS, help=f'Usuários por benchmark (padrão: {DEFAULT_USERS})')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help=f'Rodadas de cada benchmark; vale a mais rápida (padrão: {DEFAULT_REPEAT})')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='Executa apenas os benchmarks indicados')
+    parser.add_argument('--output', default=DEFAULT_RESULTS, help=f'Arquivo JSON dos resultados (padrão: {DEFAULT_RESULTS})')
+    parser.add_argument('--compare', help='Resultados de referência; falha se alguma vazão cair mais que --threshold')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help=f'Queda máxima tolerada, em %% (padrão: {DEFAULT_THRESHOLD})')
+    args = parser.parse_args(argv)
+
+    with open(args.config, 'r', encoding='utf-8') as config_file:
+        config = json.load(config_file)
+
+    results = run_benchmarks(config, args.users, args.repeat, args.only)
+    print(format_results(results))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'Regressions over {args.threshold}%:')
+            print('\n'.join(regressions))
+            return 1
+        print(f'No regressions over {args.threshold}% against {args.compare}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
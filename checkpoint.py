@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Set
+
+# Nome padrão do manifesto de checkpoint
+DEFAULT_MANIFEST = 'checkpoint.json'
+
+MANIFEST_VERSION = 1
+
+
+def _to_ranges(indices: Set[int]) -> List[List[int]]:
+    ranges = []
+    for index in sorted(indices):
+        if ranges and ranges[-1][1] == index:
+            ranges[-1][1] = index + 1
+        else:
+            ranges.append([index, index + 1])
+    return ranges
+
+
+def _from_ranges(ranges: List[List[int]]) -> Set[int]:
+    return {index for start, end in ranges for index in range(start, end)}
+
+
+class Manifest:
+    def __init__(self, path: str, params: Dict):
+        """
+        Inicializa o manifesto que registra os chunks já gravados em cada destino.
+
+        Parâmetros:
+        path (str): Caminho do arquivo do manifesto.
+        params (dict): Parâmetros que determinam os chunks (semente, referência de
+            data, quantidade e tamanho dos chunks); uma retomada só é válida com os mesmos valores.
+        """
+        self.path = path
+        self.params = params
+        self.sinks = {}
+
+    @classmethod
+    def open(cls, path: str, params: Dict, resume: bool = False) -> 'Manifest':
+        """
+        Abre o manifesto de uma execução nova ou retomada.
+
+        Ao retomar, os parâmetros gravados (como a semente e a referência de data
+        sorteadas na primeira execução) prevalecem sobre os ausentes em `params`.
+
+        Parâmetros:
+        path (str): Caminho do arquivo do manifesto.
+        params (dict): Parâmetros da execução; valores None são preenchidos pelo manifesto.
+        resume (bool): Se True, carrega o progresso gravado em `path`.
+
+        Retorno:
+        Manifest: Manifesto pronto para uso.
+
+        Lança:
+        ValueError: Se o manifesto existente tiver sido criado com outros parâmetros.
+        """
+        if not resume or not os.path.exists(path):
+            if resume:
+                logging.warning(f'Checkpoint {path} not found, starting from scratch')
+            manifest = cls(path, params)
+            manifest.save()
+            return manifest
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != MANIFEST_VERSION:
+            raise ValueError(f'Unsupported checkpoint version in {path}')
+        stored = data['params']
+        for name, value in params.items():
+            if value is not None and stored.get(name) != value:
+                raise ValueError(f'Checkpoint {path} was created with {name}={stored.get(name)!r}, not {value!r}')
+        manifest = cls(path, stored)
+        manifest.sinks = {
+            key: dict(state, chunks=_from_ranges(state['chunks'])) for key, state in data['sinks'].items()
+        }
+        logging.info(f'Resuming from checkpoint {path}')
+        return manifest
+
+    def committed(self, sink: str) -> Set[int]:
+        """
+        Retorna os índices dos chunks já gravados no destino.
+
+        Parâmetros:
+        sink (str): Chave do destino (ex.: 'mongo:banco.colecao').
+
+        Retorno:
+        set: Índices dos chunks gravados.
+        """
+        return set(self.sinks.get(sink, {}).get('chunks', ()))
+
+    def state(self, sink: str) -> Dict:
+        """
+        Retorna o estado extra gravado para o destino (ex.: posição no arquivo).
+
+        Parâmetros:
+        sink (str): Chave do destino.
+
+        Retorno:
+        dict: Estado gravado em `commit`, sem a lista de chunks.
+        """
+        return {key: value for key, value in self.sinks.get(sink, {}).items() if key != 'chunks'}
+
+    def commit(self, sink: str, index: int, **state):
+        """
+        Marca um chunk como gravado no destino e salva o manifesto.
+
+        Parâmetros:
+        sink (str): Chave do destino.
+        index (int): Índice do chunk.
+        **state: Estado extra do destino após o chunk (ex.: offset, count).
+        """
+        self.sinks.setdefault(sink, {'chunks': set()})['chunks'].add(index)
+        self.update(sink, **state)
+
+    def update(self, sink: str, **state):
+        """
+        Grava estado extra do destino, sem marcar chunks (ex.: índices a recriar), e salva o manifesto.
+
+        Parâmetros:
+        sink (str): Chave do destino.
+        **state: Estado extra do destino.
+        """
+        self.sinks.setdefault(sink, {'chunks': set()}).update(state)
+        self.save()
+
+    def save(self):
+        """
+        Grava o manifesto de forma atômica (arquivo temporário + rename).
+        """
+        data = {
+            'version': MANIFEST_VERSION,
+            'params': self.params,
+            'sinks': {key: dict(state, chunks=_to_ranges(state['chunks'])) for key, state in self.sinks.items()},
+        }
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temporary, self.path)
+
+
+def pending_users(manifest: Optional[Manifest], sink: str, plan: List) -> int:
+    """
+    Conta os usuários dos chunks que ainda faltam gravar no destino.
+
+    Parâmetros:
+    manifest (Manifest, opcional): Manifesto da execução; None conta todos.
+    sink (str): Chave do destino.
+    plan (list): Plano de chunks, como retornado por `pipeline.chunk_plan`.
+
+    Retorno:
+    int: Número de usuários pendentes.
+    """
+    committed = manifest.committed(sink) if manifest else set()
+    return sum(size for index, _, size in plan if index not in committed)
@@ -0,0 +1,403 @@
+import csv
+import io
+import json
+import logging
+import os
+import struct
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from pipeline import EncodedChunk
+from records import Records, Nested
+from schema import DEFAULT_SCHEMA, categorical_fields, seller_name_fields
+from seller_registry import SELLER_NAME_PREFIX
+from compression import CompressedWriter, EXTENSIONS, Member, check_codec, compress
+
+# Formatos da exportação em tabelas
+COLUMNAR_FORMATS = ('csv', 'npy')
+
+# Nome da tabela dos documentos raiz; cada campo array vira uma tabela com o nome do campo
+ROOT_TABLE = 'users'
+
+# Colunas de texto gravadas no formato npy como códigos de um dicionário (as do schema padrão)
+DICTIONARY_FIELDS = ('mccCategory', 'type')
+
+# Colunas de seller_name gravadas no formato npy como o ordinal (int64) do vendedor (as do schema padrão)
+ORDINAL_FIELDS = ('seller_name',)
+
+DICTIONARY_FILE = 'dictionary.json'
+
+# Cabeçalho reservado no início de cada arquivo .npy, reescrito ao final com o total de linhas
+NPY_HEADER_SIZE = 128
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+
+# Tamanho do buffer de escrita de cada arquivo
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+
+def flatten(records: Records) -> Dict[str, Tuple[Tuple[str, ...], List]]:
+    """
+    Normaliza um lote de documentos em tabelas planas.
+
+    Os campos simples do documento raiz formam a tabela ROOT_TABLE; os itens de
+    cada campo array formam uma tabela com o nome do campo, precedidos da
+    primeira coluna do documento raiz (ex.: consumer_id) como chave.
+
+    Parâmetros:
+    records (Records): Documentos em colunas.
+
+    Retorno:
+    dict: {tabela: (colunas, valores de cada coluna)}.
+
+    Lança:
+    ValueError: Se os itens de um array tiverem arrays (só um nível é suportado).
+    """
+    key, parent = records.keys[0], records.columns[0]
+    if isinstance(parent, Nested):
+        raise ValueError('The first field of the document must not be an array')
+    tables = {ROOT_TABLE: ([], [])}
+    for name, column in zip(records.keys, records.columns):
+        if not isinstance(column, Nested):
+            tables[ROOT_TABLE][0].append(name)
+            tables[ROOT_TABLE][1].append(column)
+            continue
+        items = column.records
+        if any(isinstance(child, Nested) for child in items.columns):
+            raise ValueError(f'Columnar export supports a single level of arrays; {name} has nested arrays')
+        keys = [key for key, start, end in zip(parent, column.starts, column.ends) for _ in range(end - start)]
+        tables[name] = ([key] + list(items.keys), [keys] + list(items.columns))
+    return {table: (tuple(names), columns) for table, (names, columns) in tables.items()}
+
+
+def dictionary_fields(config: dict) -> Tuple[str, ...]:
+    """
+    Colunas codificadas por dicionário no formato npy: os campos de texto de
+    largura variável e poucos valores do schema (ver `categorical_fields`). Os
+    nomes de vendedores, um por vendedor, saem como ordinais (`ordinal_fields`);
+    as demais colunas de texto (IDs, constantes) têm largura fixa, e a do
+    primeiro chunk vale para todos.
+
+    Parâmetros:
+    config (dict): Dicionário de configuração; sem config["SCHEMA"], vale o DEFAULT_SCHEMA.
+
+    Retorno:
+    tuple: Nomes das colunas.
+    """
+    return categorical_fields(config.get("SCHEMA", DEFAULT_SCHEMA), config)
+
+
+def ordinal_fields(config: dict) -> Tuple[str, ...]:
+    """
+    Colunas de seller_name gravadas no formato npy como o ordinal do vendedor: o
+    nome é sempre SELLER_NAME_PREFIX seguido do ordinal, e um dicionário de nomes
+    cresceria com o número de vendedores da execução.
+
+    Parâmetros:
+    config (dict): Dicionário de configuração; sem config["SCHEMA"], vale o DEFAULT_SCHEMA.
+
+    Retorno:
+    tuple: Nomes das colunas.
+    """
+    return seller_name_fields(config.get("SCHEMA", DEFAULT_SCHEMA))
+
+
+def _npy_column(values: List, dictionary: bool, ordinal: bool = False):
+    """
+    Converte uma coluna para o formato npy: um array numpy de largura fixa,
+    ou (valores distintos, índices) nas colunas de dicionário; None se vazia.
+    """
+    if not values:
+        return None
+    first = values[0]
+    if ordinal:
+        prefix = len(SELLER_NAME_PREFIX)
+        return np.array([int(value[prefix:]) for value in values], dtype=np.int64)
+    if dictionary:
+        uniques, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        return uniques.tolist(), inverse.astype(np.int32)
+    if isinstance(first, bool):
+        return np.asarray(values, dtype=np.bool_)
+    if isinstance(first, int):
+        return np.asarray(values, dtype=np.int64)
+    if isinstance(first, float):
+        return np.asarray(values, dtype=np.float64)
+    if isinstance(first, datetime):
+        return np.asarray(values, dtype='datetime64[s]')
+    if isinstance(first, str):
+        return np.char.encode(np.asarray(values, dtype=str), 'utf-8')
+    raise ValueError(f'Unsupported column type {type(first).__name__}')
+
+
+class ColumnarChunkEncoder:
+    """
+    Converte chunks de usuários nas tabelas da exportação em colunas.
+
+    A instância é picklable e roda nos workers: no formato 'csv' cada tabela
+    sai como linhas CSV em UTF-8; no 'npy', como arrays numpy de largura fixa,
+    as colunas de dicionário como os valores distintos do chunk e o índice
+    de cada linha, traduzidos para os códigos globais pelo destino, e as de
+    seller_name como o ordinal de cada vendedor.
+    """
+
+    def __init__(self, fmt: str = 'csv', dictionary: Sequence[str] = DICTIONARY_FIELDS,
+                 codec: Optional[str] = None, level: Optional[int] = None,
+                 ordinals: Sequence[str] = ORDINAL_FIELDS):
+        """
+        Parâmetros:
+        fmt (str): 'csv' ou 'npy'.
+        dictionary (list): Colunas de texto codificadas por dicionário no formato 'npy'.
+        ordinals (list): Colunas de seller_name gravadas como ordinais no formato 'npy'.
+        codec (str, opcional): No formato 'csv', comprime as linhas de cada tabela com este codec.
+        level (int, opcional): Nível de compressão.
+
+        Lança:
+        ValueError: Se o formato não for suportado.
+        """
+        if fmt not in COLUMNAR_FORMATS:
+            raise ValueError(f'Unknown columnar format {fmt}')
+        self.fmt = fmt
+        self.dictionary = frozenset(dictionary)
+        self.ordinals = frozenset(ordinals)
+        self.codec = codec
+        self.level = level
+
+    def __call__(self, users: Records) -> Dict[str, Tuple[Tuple[str, ...], Union[bytes, List]]]:
+        """
+        Converte um chunk de usuários.
+
+        Parâmetros:
+        users (Records): Chunk de usuários em colunas.
+
+        Retorno:
+        dict: {tabela: (colunas, dados)}, com os dados em CSV (bytes, ou um Member comprimido)
+            ou uma lista de colunas convertidas.
+        """
+        tables = {}
+        for table, (names, columns) in flatten(users).items():
+            if self.fmt == 'csv':
+                buffer = io.StringIO()
+                csv.writer(buffer, lineterminator='\n').writerows(zip(*columns))
+                data = buffer.getvalue().encode('utf-8')
+                if self.codec is not None:
+                    data = Member(compress(data, self.codec, self.level), len(data))
+                tables[table] = (names, data)
+            else:
+                tables[table] = (names, [_npy_column(values, name in self.dictionary, name in self.ordinals)
+                                         for name, values in zip(names, columns)])
+        return tables
+
+
+def npy_header(dtype: np.dtype, rows: int) -> bytes:
+    """
+    Monta o cabeçalho (versão 1.0) de um arquivo .npy unidimensional com
+    exatamente NPY_HEADER_SIZE bytes, para ser reescrito no lugar ao final.
+
+    Parâmetros:
+    dtype (np.dtype): Tipo dos valores.
+    rows (int): Número de linhas.
+
+    Retorno:
+    bytes: O cabeçalho.
+    """
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (rows,)})
+    length = NPY_HEADER_SIZE - len(NPY_MAGIC) - 2
+    if len(header) >= length:
+        raise ValueError(f'npy header for {dtype} does not fit in {NPY_HEADER_SIZE} bytes')
+    return NPY_MAGIC + struct.pack('<H', length) + (header.ljust(length - 1) + '\n').encode('latin1')
+
+
+class NpyColumnWriter:
+    def __init__(self, path: str, buffer_size: int = DEFAULT_BUFFER_SIZE, dtype: Optional[np.dtype] = None):
+        """
+        Arquivo .npy gravado em partes: o cabeçalho é reservado na abertura e
+        reescrito no fechamento, quando o tipo e o total de linhas são conhecidos.
+
+        Parâmetros:
+        path (str): Caminho do arquivo.
+        buffer_size (int): Tamanho do buffer de escrita, em bytes.
+        dtype (np.dtype, opcional): Tipo da coluna; se ausente, o da primeira parte gravada.
+        """
+        self.path = path
+        self.dtype = dtype
+        self.rows = 0
+        self._file = open(path, 'wb', buffering=buffer_size)
+        self._file.write(b'\0' * NPY_HEADER_SIZE)
+
+    def write(self, values: np.ndarray) -> int:
+        if self.dtype is None:
+            self.dtype = values.dtype
+        elif values.dtype != self.dtype:
+            # Textos mais curtos que os do primeiro chunk são completados; mais longos não cabem
+            if values.dtype.kind != 'S' or self.dtype.kind != 'S' or values.itemsize > self.dtype.itemsize:
+                raise ValueError(f'Column {self.path} changed from {self.dtype} to {values.dtype}; '
+                                 f'variable-width text columns must be dictionary-encoded')
+            values = values.astype(self.dtype)
+        self.rows += len(values)
+        return self._file.write(values.tobytes())
+
+    def close(self):
+        self._file.seek(0)
+        # Colunas sem nenhum valor ficam com um tipo qualquer, de largura fixa
+        self._file.write(npy_header(self.dtype if self.dtype is not None else np.dtype(np.float64), self.rows))
+        self._file.close()
+
+
+class ColumnarSink:
+    def __init__(self, directory: str, fmt: str = 'csv', dictionary: Sequence[str] = DICTIONARY_FIELDS,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, compress: Optional[str] = None, level: Optional[int] = None,
+                 ordinals: Sequence[str] = ORDINAL_FIELDS):
+        """
+        Inicializa um destino que grava os usuários em tabelas normalizadas:
+        ROOT_TABLE com os campos simples e uma tabela por campo array (ex.:
+        transactions), chaveada pela primeira coluna do documento (consumer_id).
+
+        No formato 'csv', cada tabela é um arquivo `<tabela>.csv` com cabeçalho.
+        No 'npy', cada coluna é um arquivo `<tabela>/<coluna>.npy` de largura fixa,
+        que pode ser mapeado sem cópia com `np.load(..., mmap_mode='r')` (ver
+        `load_table`); as colunas de `dictionary` guardam códigos int32 dos
+        textos listados em DICTIONARY_FILE, e as de `ordinals` o ordinal int64
+        de cada vendedor (o nome é SELLER_NAME_PREFIX seguido do ordinal).
+
+        Parâmetros:
+        directory (str): Diretório de saída, criado se não existir.
+        fmt (str): 'csv' ou 'npy'.
+        dictionary (list): Colunas de texto codificadas por dicionário no formato 'npy'.
+        buffer_size (int): Tamanho do buffer de escrita de cada arquivo, em bytes.
+        compress (str, opcional): Apenas no formato 'csv': grava `<tabela>.csv.gz` (ou a
+            extensão do codec) em membros comprimidos nos workers, com um índice (ver `CompressedWriter`).
+        level (int, opcional): Nível de compressão.
+        ordinals (list): Colunas de seller_name gravadas como ordinais no formato 'npy'.
+
+        Lança:
+        ValueError: Se a compressão for pedida no formato 'npy', que precisa ser mapeável.
+        """
+        if compress is not None:
+            if fmt != 'csv':
+                raise ValueError(f'Compression is only supported for csv tables, not {fmt}')
+            check_codec(compress)
+        self.directory = directory
+        self.compress = compress
+        self.level = level
+        self.encoder = ColumnarChunkEncoder(fmt, dictionary, compress, level, ordinals)
+        # No npy as datas viram datetime64; no CSV são gravadas em ISO 8601
+        self.date_format = 'datetime' if fmt == 'npy' else 'iso'
+        self.buffer_size = buffer_size
+        self.count = 0
+        self.bytes_written = 0
+        self._files = {}
+        self._dictionaries = {}
+
+    @property
+    def fmt(self) -> str:
+        return self.encoder.fmt
+
+    @property
+    def checkpoint_key(self) -> str:
+        """
+        Chave do destino no manifesto de checkpoint.
+        """
+        return f'{self.fmt}:{self.directory}'
+
+    def open(self):
+        """
+        Cria o diretório de saída; os arquivos são abertos no primeiro chunk de cada tabela.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _csv_file(self, table: str, names: Tuple[str, ...]):
+        if table not in self._files:
+            path = os.path.join(self.directory, f'{table}.csv')
+            if self.compress is not None:
+                self._files[table] = CompressedWriter(path + EXTENSIONS[self.compress], self.compress, self.level,
+                                                      self.buffer_size)
+            else:
+                self._files[table] = open(path, 'wb', buffering=self.buffer_size)
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator='\n').writerow(names)
+            self.bytes_written += self._files[table].write(buffer.getvalue().encode('utf-8'))
+        return self._files[table]
+
+    def _npy_column(self, table: str, name: str) -> NpyColumnWriter:
+        key = (table, name)
+        if key not in self._files:
+            os.makedirs(os.path.join(self.directory, table), exist_ok=True)
+            self._files[key] = NpyColumnWriter(os.path.join(self.directory, table, f'{name}.npy'), self.buffer_size)
+            self.bytes_written += NPY_HEADER_SIZE
+        return self._files[key]
+
+    def _codes(self, table: str, name: str, uniques: List[str], inverse: np.ndarray) -> np.ndarray:
+        # Códigos globais na ordem em que cada texto aparece pela primeira vez
+        lookup = self._dictionaries.setdefault(f'{table}.{name}', {})
+        mapping = np.array([lookup.setdefault(value, len(lookup)) for value in uniques], dtype=np.int32)
+        return mapping[inverse]
+
+    def write(self, chunk: Union[Records, EncodedChunk]):
+        """
+        Acrescenta um chunk de usuários às tabelas.
+
+        Parâmetros:
+        chunk (Records ou EncodedChunk): Chunk de usuários, ou chunk já convertido por `self.encoder`.
+        """
+        if not isinstance(chunk, EncodedChunk):
+            chunk = EncodedChunk(-1, len(chunk), self.encoder(chunk))
+        for table, (names, data) in chunk.payload.items():
+            if self.fmt == 'csv':
+                self.bytes_written += self._csv_file(table, names).write(data)
+                continue
+            for name, values in zip(names, data):
+                column = self._npy_column(table, name)
+                if values is None:
+                    continue
+                if isinstance(values, tuple):
+                    values = self._codes(table, name, *values)
+                self.bytes_written += column.write(values)
+        self.count += chunk.count
+
+    def close(self):
+        """
+        Fecha os arquivos, finalizando os cabeçalhos .npy e gravando os dicionários.
+        """
+        for file in self._files.values():
+            file.close()
+        self._files = {}
+        if self.fmt == 'npy':
+            with open(os.path.join(self.directory, DICTIONARY_FILE), 'w', encoding='utf-8') as f:
+                json.dump({column: list(lookup) for column, lookup in self._dictionaries.items()}, f,
+                          ensure_ascii=False)
+        logging.info(f'Wrote {self.count} users to {self.directory} ({self.fmt})')
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def load_dictionary(directory: str) -> Dict[str, List[str]]:
+    """
+    Lê os dicionários de uma exportação npy.
+
+    Retorno:
+    dict: {'<tabela>.<coluna>': textos}, em que o código de cada texto é a sua posição na lista.
+    """
+    with open(os.path.join(directory, DICTIONARY_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_table(directory: str, table: str, mmap_mode: Optional[str] = 'r') -> Dict[str, np.ndarray]:
+    """
+    Carrega as colunas de uma tabela exportada no formato npy.
+
+    Parâmetros:
+    directory (str): Diretório da exportação.
+    table (str): Nome da tabela (ex.: 'users', 'transactions').
+    mmap_mode (str, opcional): Modo do np.load; 'r' mapeia os arquivos sem copiá-los.
+
+    Retorno:
+    dict: {coluna: array}; as colunas de dicionário trazem os códigos (ver `load_dictionary`),
+        e as de seller_name, os ordinais dos vendedores.
+    """
+    path = os.path.join(directory, table)
+    return {name[:-len('.npy')]: np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+            for name in sorted(os.listdir(path)) if name.endswith('.npy')}
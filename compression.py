@@ -0,0 +1,204 @@
+import bz2
+import gzip
+import io
+import json
+import lzma
+import os
+import zlib
+from typing import Dict, List, Optional, Union
+
+# Codecs suportados; o zstd depende do pacote opcional zstandard
+CODECS = ('gzip', 'bz2', 'xz', 'zstd')
+
+EXTENSIONS = {'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz', 'zstd': '.zst'}
+
+DEFAULT_LEVELS = {'gzip': 6, 'bz2': 9, 'xz': 6, 'zstd': 3}
+
+# Sufixo do índice gravado ao lado do arquivo comprimido
+INDEX_SUFFIX = '.idx'
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError('zstd compression requires the zstandard package (pip install zstandard)') from None
+    return zstandard
+
+
+def check_codec(codec: str):
+    """
+    Verifica se um codec é conhecido e está disponível.
+
+    Lança:
+    ValueError: Se o codec não existir ou depender de um pacote não instalado.
+    """
+    if codec not in CODECS:
+        raise ValueError(f'Unknown compression codec {codec}')
+    if codec == 'zstd':
+        _zstandard()
+
+
+def compress(data: bytes, codec: str, level: Optional[int] = None) -> bytes:
+    """
+    Comprime um bloco como um membro independente (gzip), stream (bz2, xz) ou
+    frame (zstd). Blocos concatenados formam um arquivo válido do codec.
+
+    Parâmetros:
+    data (bytes): Dados a comprimir.
+    codec (str): Um de CODECS.
+    level (int, opcional): Nível de compressão; padrão DEFAULT_LEVELS[codec].
+
+    Retorno:
+    bytes: O bloco comprimido.
+    """
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    if codec == 'gzip':
+        # wbits=31 produz o cabeçalho e o rodapé gzip
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    if codec == 'bz2':
+        return bz2.compress(data, level)
+    if codec == 'xz':
+        return lzma.compress(data, preset=level)
+    if codec == 'zstd':
+        return _zstandard().ZstdCompressor(level=level).compress(data)
+    raise ValueError(f'Unknown compression codec {codec}')
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    """
+    Descomprime um arquivo inteiro, com todos os seus membros.
+    """
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    if codec == 'bz2':
+        return bz2.decompress(data)
+    if codec == 'xz':
+        return lzma.decompress(data)
+    if codec == 'zstd':
+        with _zstandard().ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True) as reader:
+            return reader.read()
+    raise ValueError(f'Unknown compression codec {codec}')
+
+
+class Member:
+    """
+    Bloco já comprimido, com o tamanho dos dados originais.
+    """
+    __slots__ = ('data', 'size')
+
+    def __init__(self, data: bytes, size: int):
+        self.data = data
+        self.size = size
+
+
+class CompressingEncoder:
+    """
+    Envolve o encoder de um destino, comprimindo cada chunk como um membro
+    independente. É picklable: a compressão roda junto com a serialização, nos
+    workers (ou na thread geradora, com um único worker; o zlib libera o GIL).
+    """
+
+    def __init__(self, encoder, codec: str, level: Optional[int] = None):
+        """
+        Parâmetros:
+        encoder: Encoder do destino, que retorna bytes.
+        codec (str): Um de CODECS.
+        level (int, opcional): Nível de compressão.
+        """
+        self.encoder = encoder
+        self.codec = codec
+        self.level = level
+
+    @property
+    def positional(self) -> bool:
+        return getattr(self.encoder, 'positional', False)
+
+    def __call__(self, users, index: Optional[int] = None) -> Member:
+        data = self.encoder(users, index) if self.positional else self.encoder(users)
+        return Member(compress(data, self.codec, self.level), len(data))
+
+
+class CompressedWriter:
+    def __init__(self, path: str, codec: str, level: Optional[int] = None, buffer_size: int = -1,
+                 offset: Optional[int] = None):
+        """
+        Arquivo comprimido gravado como uma sequência de membros independentes,
+        como o pigz, com um índice dos membros em `path + INDEX_SUFFIX`.
+
+        Cada linha do índice é um JSON com a posição ('offset') e o tamanho
+        ('size') do membro no arquivo e a posição ('raw_offset') e o tamanho
+        ('raw_size') dos dados originais, o que permite buscar um trecho ou
+        descomprimir os membros em paralelo.
+
+        Parâmetros:
+        path (str): Caminho do arquivo.
+        codec (str): Um de CODECS.
+        level (int, opcional): Nível de compressão dos blocos comprimidos aqui.
+        buffer_size (int): Tamanho do buffer de escrita, em bytes.
+        offset (int, opcional): Para retomar: posição, obtida de `tell`, após o
+            último membro gravado; o arquivo e o índice são truncados ali.
+        """
+        check_codec(codec)
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.codec = codec
+        self.level = level
+        self.raw_offset = 0
+        if offset is None:
+            self._file = open(path, 'wb', buffering=buffer_size)
+            self._index = open(self.index_path, 'w', encoding='utf-8')
+            return
+        entries = [entry for entry in load_index(self.index_path) if entry['offset'] + entry['size'] <= offset]
+        if entries:
+            self.raw_offset = entries[-1]['raw_offset'] + entries[-1]['raw_size']
+        self._file = open(path, 'r+b', buffering=buffer_size)
+        self._file.truncate(offset)
+        self._file.seek(offset)
+        self._index = open(self.index_path, 'w', encoding='utf-8')
+        for entry in entries:
+            self._index.write(json.dumps(entry) + '\n')
+
+    def write(self, data: Union[bytes, Member]) -> int:
+        """
+        Grava um membro; bytes ainda não comprimidos são comprimidos aqui.
+
+        Retorno:
+        int: Bytes comprimidos gravados.
+        """
+        if not isinstance(data, Member):
+            data = Member(compress(data, self.codec, self.level), len(data))
+        offset = self._file.tell()
+        written = self._file.write(data.data)
+        self._index.write(json.dumps({'offset': offset, 'size': written,
+                                      'raw_offset': self.raw_offset, 'raw_size': data.size}) + '\n')
+        self.raw_offset += data.size
+        return written
+
+    def flush(self):
+        self._file.flush()
+        self._index.flush()
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+
+
+def load_index(path: str) -> List[Dict[str, int]]:
+    """
+    Lê o índice de membros de um arquivo comprimido.
+
+    Parâmetros:
+    path (str): Caminho do índice (o arquivo comprimido + INDEX_SUFFIX).
+
+    Retorno:
+    list: Um dicionário por membro, na ordem do arquivo; vazia se o índice não existir.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
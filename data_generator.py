@@ -1,22 +1,145 @@
 import json
 import random
 import logging
+import time
+from collections import Counter
 from math import trunc
-from datetime import datetime, timedelta
-from typing import List, Dict, Union
-from colorama import Fore, Style
+from datetime import datetime
+from typing import List, Dict, Union, Optional
+import numpy as np
+from seller_registry import SellerRegistry, SELLER_ID_LENGTH, SELLER_NAME_PREFIX, seller_id_length
+from id_allocator import IdAllocator
+from time_window import TimeWindow
+from schema import GenerationPlan
+from records import Records, Nested
+
+# Campos dos documentos gerados sem config["SCHEMA"]
+USER_FIELDS = ('consumer_id', 'age', 'exact_distance', 'score', 'seller_id', 'transactions')
+TRANSACTION_FIELDS = ('transactionId', 'seller_id', 'seller_name', 'mcc', 'mccCategory', 'value', 'date', 'type')
+
+# Campos dos documentos de vendedores (generate_seller_records)
+SELLER_FIELDS = ('seller_id', 'seller_name')
+
+# Quantidade máxima de transações por usuário
+MAX_TRANSACTIONS = 4
+
+# Quantidade de dígitos do consumer_id e do transactionId
+CONSUMER_ID_LENGTH = 18
+TRANSACTION_ID_LENGTH = 18
+
+logger = logging.getLogger(__name__)
 
 class DataGenerator:
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, seed: Union[int, np.random.SeedSequence, None] = None,
+                 id_key: Optional[int] = None, user_offset: int = 0,
+                 reference_time: Union[datetime, str, int, None] = None):
         """
         Inicializa a classe DataGenerator com as configurações fornecidas.
 
         Parâmetros:
         config (dict): Dicionário de configuração carregado do arquivo config.json.
+        seed (int ou SeedSequence, opcional): Semente do gerador NumPy usado na geração em lote.
+        id_key (int, opcional): Chave das permutações de IDs; geradores com a mesma chave e
+            `user_offset` distintos produzem IDs disjuntos. Se ausente, é sorteada.
+        user_offset (int): Posição global do primeiro usuário deste gerador, que define o
+            intervalo de contadores dos IDs.
+        reference_time (datetime, str ou int, opcional): Fim da janela de datas das transações;
+            se ausente, o instante atual, fixado na criação do gerador.
         """
-        self.sellers = config["SELLERS"]
         self.mcc_dict = config["MCC_DICT"]
         self.transaction_types = config["TRANSACTION_TYPES"]
+        self.rng = np.random.default_rng(seed)
+        if id_key is None:
+            id_key = int(self.rng.integers(0, 2 ** 63))
+        self.id_key = id_key
+        self.consumer_allocator = IdAllocator(CONSUMER_ID_LENGTH, (id_key, 0), start=user_offset)
+        self.seller_allocator = IdAllocator(seller_id_length(config), (id_key, 1), start=user_offset,
+                                            reserved=config["SELLERS"])
+        self.transaction_allocator = IdAllocator(TRANSACTION_ID_LENGTH, (id_key, 2),
+                                                 start=user_offset * MAX_TRANSACTIONS)
+        self.seller_registry = SellerRegistry.from_config(config, self.rng)
+        self.initial_sellers = [int(seller) for seller in config["SELLERS"]]
+        # Com config["SCHEMA"], o formato dos documentos vem do schema compilado
+        self.plan = None
+        if "SCHEMA" in config:
+            self.plan = GenerationPlan(config["SCHEMA"], config,
+                                       {'consumer': 1, 'transaction': MAX_TRANSACTIONS})
+        self._warm_registry(user_offset)
+        self.time_window = TimeWindow.from_config(config, reference_time)
+        # Contadores agregados das chamadas; vão para o log em flush_counters
+        self.counters = Counter()
+
+    @staticmethod
+    def max_users(config: dict) -> int:
+        """
+        Calcula quantos usuários podem ser gerados sem repetir IDs.
+
+        Parâmetros:
+        config (dict): Dicionário de configuração carregado do arquivo config.json.
+
+        Retorno:
+        int: Limite imposto pelo menor espaço de IDs (em geral o seller_id, de `seller_id_length` dígitos).
+        """
+        sellers = IdAllocator(seller_id_length(config), 0, reserved=config["SELLERS"]).capacity
+        return min(10 ** CONSUMER_ID_LENGTH, sellers, 10 ** TRANSACTION_ID_LENGTH // MAX_TRANSACTIONS)
+
+    @staticmethod
+    def config_for(config: dict, docs_count: int) -> dict:
+        """
+        Ajusta a configuração a uma execução de `docs_count` usuários com IDs únicos.
+
+        Cada usuário cria um vendedor, então o seller_id precisa de um ID por
+        usuário. Sem config["SELLER_ID_LENGTH"], o seller_id ganha os dígitos
+        necessários (no mínimo SELLER_ID_LENGTH); as execuções que já cabem nos
+        6 dígitos não mudam. Como depende só de `docs_count`, todos os chunks,
+        shards e retomadas de uma execução usam a mesma largura.
+
+        Parâmetros:
+        config (dict): Dicionário de configuração carregado do arquivo config.json.
+        docs_count (int): Número total de usuários da execução.
+
+        Retorno:
+        dict: `config`, ou uma cópia com o SELLER_ID_LENGTH necessário.
+
+        Lança:
+        ValueError: Se `docs_count` exceder os IDs únicos disponíveis (com o
+            SELLER_ID_LENGTH configurado, ou os do consumer_id e do transactionId).
+        """
+        limit = DataGenerator.max_users(config)
+        if docs_count <= limit:
+            return config
+        if "SELLER_ID_LENGTH" in config:
+            raise ValueError(f'Cannot generate {docs_count} users with unique ids: the limit is {limit}; '
+                             f'increase SELLER_ID_LENGTH ({seller_id_length(config)}) in the config')
+        length = SELLER_ID_LENGTH
+        while limit < docs_count:
+            if length >= CONSUMER_ID_LENGTH:
+                raise ValueError(f'Cannot generate {docs_count} users with unique ids: the limit is {limit}')
+            length += 1
+            limit = DataGenerator.max_users(dict(config, SELLER_ID_LENGTH=length))
+        logger.info(f'Using {length}-digit seller ids for {docs_count} users')
+        return dict(config, SELLER_ID_LENGTH=length)
+
+    def _warm_registry(self, user_offset: int):
+        """
+        Reconstrói o registro de vendedores como estaria após `user_offset` usuários.
+
+        Com a política 'ring' o registro contém exatamente os últimos vendedores
+        registrados, que o alocador de seller_id recalcula sem gerar os usuários
+        anteriores. Assim cada chunk começa com o mesmo estado que teria em uma
+        geração sequencial. Com 'reservoir' o estado depende de toda a história e
+        o chunk parte apenas dos vendedores iniciais.
+
+        Parâmetros:
+        user_offset (int): Posição global do primeiro usuário deste gerador.
+        """
+        registry = self.seller_registry
+        if not user_offset or registry.eviction != 'ring' or (self.plan is not None and not self.plan.new_sellers):
+            return
+        first = max(0, user_offset - registry.capacity)
+        registry.total += first
+        history = self.seller_allocator.at(np.arange(first, user_offset, dtype=np.uint64))
+        registry.add(history.astype(np.int64))
 
     def create_number(self, length: int = 1, type_r: str = 'str') -> Union[str, int, float]:
         """
@@ -29,7 +152,9 @@ class DataGenerator:
         Retorno:
         str ou int ou float: Número gerado como string, inteiro ou decimal.
         """
-        logging.info(f'Creating number of length {length} and type {type_r}')
+        self.counters['numbers'] += 1
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Creating number of length %s and type %s', length, type_r)
         if type_r == 'decimal':
             return random.randint(10, 200) + round(random.random(), 2)
         number = ''.join(str(trunc(random.random() * 10)) for _ in range(length))
@@ -40,16 +165,18 @@ class DataGenerator:
         Gera uma data e hora aleatória dentro de um intervalo de dias.
 
         Parâmetros:
-        days (int): O número de dias para trás a partir de hoje para o intervalo.
+        days (int): O número de dias para trás, a partir da referência do gerador, para o intervalo.
 
         Retorno:
         datetime: Data e hora geradas.
         """
-        logging.info(f'Generating random datetime within {days} days range')
-        now = datetime.now()
-        past_date = now - timedelta(days=days)
-        random_timestamp = random.randint(int(past_date.timestamp()), int(now.timestamp()))
-        return datetime.fromtimestamp(random_timestamp)
+        self.counters['datetimes'] += 1
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Generating random datetime within %s days range', days)
+        window = self.time_window
+        if days != window.days:
+            window = TimeWindow(days, window.end)
+        return datetime.fromtimestamp(window.sample_one(self.rng))
 
     def generate_transactions(self, n: int) -> List[Dict]:
         """
@@ -61,15 +188,22 @@ class DataGenerator:
         Retorno:
         list: Lista de dicionários representando transações.
         """
-        logging.info(f'Generating {n} transactions')
+        self.counters['transactions'] += n
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Generating %s transactions', n)
         transactions = []
-        for _ in range(n):
-            pos_seller = random.randint(0, len(self.sellers) - 1)
+        allocator = self.transaction_allocator
+        # Poucas transações por chamada: IDs e vendedores saem pelos caminhos escalares
+        transaction_ids = [allocator.format_one(allocator.allocate_one()) for _ in range(n)]
+        slots = [self.seller_registry.sample_one() for _ in range(n)]
+        seller_ids = self.seller_registry.seller_ids(slots)
+        seller_names = self.seller_registry.seller_names(slots)
+        for transaction_id, seller_id, seller_name in zip(transaction_ids, seller_ids, seller_names):
             mcc = random.randint(0, len(self.mcc_dict) - 1)
             transaction = {
-                'transactionId': self.create_number(18),
-                'seller_id': self.sellers[pos_seller],
-                'seller_name': f'SELLER{pos_seller}',
+                'transactionId': transaction_id,
+                'seller_id': seller_id,
+                'seller_name': seller_name,
                 'mcc': self.mcc_dict[mcc]['mcc'],
                 'mccCategory': self.mcc_dict[mcc]['category'],
                 'value': self.create_number(type_r='decimal'),
@@ -86,11 +220,13 @@ class DataGenerator:
         Retorno:
         dict: Dicionário representando um usuário.
         """
-        logging.info('Generating user')
-        seller_id = self.create_number(6)
-        self.sellers.append(seller_id)
+        self.counters['users'] += 1
+        logger.debug('Generating user')
+        seller = self.seller_allocator.allocate_one()
+        seller_id = self.seller_allocator.format_one(seller)
+        self.seller_registry.add_one(seller)
         user = {
-            'consumer_id': self.create_number(18),
+            'consumer_id': self.consumer_allocator.format_one(self.consumer_allocator.allocate_one()),
             'age': random.randint(16, 99),
             'exact_distance': random.randint(1000, 10000),
             'score': random.randint(100, 1000),
@@ -99,6 +235,154 @@ class DataGenerator:
         }
         return user
 
+    @staticmethod
+    def format_timestamps(timestamps: np.ndarray, date_format: str = 'datetime') -> list:
+        """
+        Converte de uma só vez timestamps Unix em datas no horário local.
+
+        Parâmetros:
+        timestamps (ndarray): Timestamps Unix em segundos.
+        date_format (str): 'datetime' para objetos datetime, 'iso' para strings ISO 8601.
+
+        Retorno:
+        list: Datas no formato pedido; as strings ISO são idênticas a `datetime.isoformat()`.
+        """
+        if date_format == 'datetime':
+            fromtimestamp = datetime.fromtimestamp
+            return [fromtimestamp(timestamp) for timestamp in timestamps.tolist()]
+        if date_format != 'iso':
+            raise ValueError(f'Unknown date format {date_format}')
+        if len(timestamps) == 0:
+            return []
+        # Deslocamento UTC no início e no fim de cada hora em que há datas; uma
+        # mudança de horário de verão (inclusive duas que se anulam na janela)
+        # aparece como deslocamentos diferentes entre as horas
+        hours, positions = np.unique(timestamps // 3600, return_inverse=True)
+        localtime = time.localtime
+        starts = [localtime(hour * 3600).tm_gmtoff for hour in hours.tolist()]
+        ends = [localtime(hour * 3600 + 3599).tm_gmtoff for hour in hours.tolist()]
+        if starts == ends:
+            offsets = np.array(starts, dtype=np.int64)[positions.reshape(-1)]
+            local = (timestamps + offsets).astype('datetime64[s]')
+            return np.datetime_as_string(local).tolist()
+        # A mudança de horário cai no meio de uma hora: o deslocamento varia dentro dela
+        return [datetime.fromtimestamp(timestamp).isoformat() for timestamp in timestamps.tolist()]
+
+    def generate_users_batch(self, n: int, date_format: str = 'datetime') -> List[Dict]:
+        """
+        Gera um lote de usuários sorteando todos os campos como arrays NumPy.
+
+        Parâmetros:
+        n (int): O número de usuários a serem gerados.
+        date_format (str): 'datetime' para datas como datetime, 'iso' para strings ISO 8601
+            já formatadas (dispensa o `default` do json na serialização).
+
+        Retorno:
+        list: Lista de dicionários representando usuários, no mesmo formato de `generate_user`
+            ou no formato de config["SCHEMA"], se houver.
+        """
+        return self.generate_records(n, date_format).to_dicts()
+
+    def generate_records(self, n: int, date_format: str = 'datetime') -> Records:
+        """
+        Gera um lote de usuários em colunas, sem criar um dicionário por documento.
+
+        Cada campo do lote (idades, scores, distâncias, quantidades de transações,
+        índices de vendedores, MCCs e tipos, valores, datas e IDs) é sorteado em uma
+        única chamada vetorizada. Os destinos serializam as colunas diretamente.
+
+        Parâmetros:
+        n (int): O número de usuários a serem gerados.
+        date_format (str): 'datetime' ou 'iso', como em `generate_users_batch`.
+
+        Retorno:
+        Records: Usuários em colunas, com as transações como coluna aninhada.
+        """
+        if self.plan is not None:
+            return self.plan.generate(self, n, date_format)
+        rng = self.rng
+        ages = rng.integers(16, 100, size=n).tolist()
+        distances = rng.integers(1000, 10001, size=n).tolist()
+        scores = rng.integers(100, 1001, size=n).tolist()
+        counts = rng.integers(0, MAX_TRANSACTIONS + 1, size=n)
+        consumer_ids = self.consumer_allocator.format(self.consumer_allocator.allocate(n))
+        new_sellers = self.seller_allocator.allocate(n)
+        seller_ids = self.seller_allocator.format(new_sellers)
+
+        # Os vendedores do lote são registrados antes do sorteio das transações,
+        # que podem referenciar qualquer vendedor já registrado
+        registry = self.seller_registry
+        registry.add(new_sellers.astype(np.int64))
+
+        total = int(counts.sum())
+        self.counters['users'] += n
+        self.counters['transactions'] += total
+        slots = registry.sample(total)
+        transaction_sellers = registry.seller_ids(slots)
+        transaction_seller_names = registry.seller_names(slots)
+        mccs = rng.integers(0, len(self.mcc_dict), size=total).tolist()
+        types = rng.integers(0, len(self.transaction_types), size=total).tolist()
+        values = (rng.integers(10, 201, size=total) + np.round(rng.random(total), 2)).tolist()
+        timestamps = self.time_window.sample(rng, total)
+        dates = self.format_timestamps(timestamps, date_format)
+        transaction_ids = self.transaction_allocator.format(self.transaction_allocator.allocate(total))
+
+        mcc_codes = [item['mcc'] for item in self.mcc_dict]
+        mcc_categories = [item['category'] for item in self.mcc_dict]
+        transaction_types = self.transaction_types
+        transactions = Records(TRANSACTION_FIELDS, [
+            transaction_ids,
+            transaction_sellers,
+            transaction_seller_names,
+            [mcc_codes[mcc] for mcc in mccs],
+            [mcc_categories[mcc] for mcc in mccs],
+            values,
+            dates,
+            [transaction_types[type_index] for type_index in types],
+        ], total)
+
+        ends = np.cumsum(counts).tolist()
+        starts = [0] + ends[:-1]
+        return Records(USER_FIELDS, [
+            consumer_ids, ages, distances, scores, seller_ids, Nested(transactions, starts, ends)
+        ], n)
+
+    def generate_seller_records(self, start: int, size: int) -> Records:
+        """
+        Gera os documentos dos vendedores criados pelos usuários [start, start + size).
+
+        Cada usuário registra um vendedor novo, cujo seller_id é a posição do
+        usuário no alocador e cujo seller_name vem do ordinal de registro; por isso
+        os vendedores de uma execução são recalculados sem gerar os usuários, com
+        os mesmos seller_id e seller_name das transações. O lote que começa em 0
+        inclui os vendedores de config["SELLERS"].
+
+        Parâmetros:
+        start (int): Posição global do primeiro usuário.
+        size (int): Número de usuários.
+
+        Retorno:
+        Records: Vendedores com os campos SELLER_FIELDS.
+        """
+        initial = self.initial_sellers if start == 0 else []
+        if self.plan is not None and not self.plan.new_sellers:
+            size = 0
+        created = self.seller_allocator.at(np.arange(start, start + size, dtype=np.uint64)).astype(np.int64)
+        ids = np.concatenate([np.array(initial, dtype=np.int64), created])
+        # Com 'reservoir' o registro de cada chunk recomeça nos vendedores iniciais (ver _warm_registry)
+        first = len(self.initial_sellers) + (start if self.seller_registry.eviction == 'ring' else 0)
+        ordinals = list(range(len(initial))) + list(range(first, first + size))
+        seller_ids = np.char.zfill(ids.astype(str), self.seller_allocator.length).tolist() if len(ids) else []
+        return Records(SELLER_FIELDS, [seller_ids, [f'{SELLER_NAME_PREFIX}{ordinal}' for ordinal in ordinals]], len(ids))
+
+    def flush_counters(self):
+        """
+        Registra no log, em uma única linha, os contadores acumulados e os zera.
+        """
+        if self.counters:
+            logger.info('Generated ' + ', '.join(f'{name}={count}' for name, count in sorted(self.counters.items())))
+            self.counters.clear()
+
     @staticmethod
     def json_serial(obj):
         """
@@ -131,4 +415,5 @@ class DataGenerator:
             raise TypeError(f'Type {obj.__class__.__name__} not serializable')
         
         user_json = json.dumps(user, indent=4, ensure_ascii=False, default=custom_serializer)
+        from colorama import Fore, Style
         print(Fore.CYAN + user_json + Style.RESET_ALL)
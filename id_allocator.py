@@ -0,0 +1,185 @@
+from typing import Iterable, List, Optional, Sequence, Union
+import numpy as np
+
+# Número de rodadas da rede de Feistel
+FEISTEL_ROUNDS = 4
+
+_MIX_1 = np.uint64(0x9E3779B97F4A7C15)
+_MIX_2 = np.uint64(0xBF58476D1CE4E5B9)
+
+# Identificadores calculados de uma vez por `allocate_one`
+SCALAR_BLOCK = 256
+
+
+class IdAllocator:
+    def __init__(self, length: int, key: Union[int, Sequence[int]], start: int = 0, stop: Optional[int] = None,
+                 reserved: Iterable = ()):
+        """
+        Inicializa um alocador de identificadores únicos com `length` dígitos.
+
+        Cada identificador é a imagem de um contador por uma permutação com chave
+        (rede de Feistel com cycle-walking) sobre [0, 10 ** length): contadores
+        distintos geram sempre identificadores distintos, sem tabela de consulta,
+        e os identificadores parecem aleatórios. Alocadores com a mesma chave e
+        intervalos de contadores disjuntos (um por worker ou shard) nunca colidem.
+
+        Parâmetros:
+        length (int): Quantidade de dígitos dos identificadores.
+        key (int ou sequência de int): Chave da permutação; a mesma chave gera a mesma sequência.
+        start (int): Primeiro contador do intervalo deste alocador.
+        stop (int, opcional): Fim (exclusivo) do intervalo; se ausente, o fim do domínio.
+        reserved (Iterable): Identificadores já usados fora do alocador (ex.: config["SELLERS"]),
+            que nunca são gerados.
+        """
+        self.length = length
+        self.domain = 10 ** length
+        bits = max(2, int(self.domain - 1).bit_length())
+        bits += bits % 2
+        self._half = np.uint64(bits // 2)
+        self._mask = np.uint64((1 << (bits // 2)) - 1)
+        self._keys = np.random.SeedSequence(key).generate_state(FEISTEL_ROUNDS, np.uint64)
+        reserved = np.array(sorted({int(r) for r in reserved if 0 <= int(r) < self.domain}), dtype=np.uint64)
+        # Contadores cuja imagem é um identificador reservado são pulados
+        self._skipped = np.sort(self.invert(reserved)) if len(reserved) else reserved
+        self.capacity = self.domain - len(self._skipped)
+        self.next = start
+        self.stop = self.capacity if stop is None else min(stop, self.capacity)
+        # Bloco pré-calculado do caminho escalar: identificadores das posições a partir de _block_start
+        self._block_start = 0
+        self._block: List[int] = []
+
+    def _round(self, right: np.ndarray, key: np.uint64) -> np.ndarray:
+        h = (right ^ key) * _MIX_1
+        h ^= h >> np.uint64(29)
+        h *= _MIX_2
+        h ^= h >> np.uint64(32)
+        return h & self._mask
+
+    def _encrypt(self, values: np.ndarray) -> np.ndarray:
+        left, right = values >> self._half, values & self._mask
+        for key in self._keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self._half) | right
+
+    def _decrypt(self, values: np.ndarray) -> np.ndarray:
+        left, right = values >> self._half, values & self._mask
+        for key in self._keys[::-1]:
+            left, right = right ^ self._round(left, key), left
+        return (left << self._half) | right
+
+    def _walk(self, values: np.ndarray, step) -> np.ndarray:
+        values = step(values)
+        outside = np.flatnonzero(values >= self.domain)
+        # Cycle-walking: reaplica a permutação até cair dentro do domínio decimal
+        while len(outside):
+            values[outside] = step(values[outside])
+            outside = outside[values[outside] >= self.domain]
+        return values
+
+    def permute(self, counters: np.ndarray) -> np.ndarray:
+        """
+        Aplica a permutação a contadores de [0, 10 ** length).
+
+        Parâmetros:
+        counters (ndarray): Contadores.
+
+        Retorno:
+        ndarray: Identificadores (uint64) correspondentes.
+        """
+        return self._walk(np.asarray(counters, dtype=np.uint64), self._encrypt)
+
+    def invert(self, values: np.ndarray) -> np.ndarray:
+        """
+        Inverso de `permute`: recupera o contador de cada identificador.
+
+        Parâmetros:
+        values (ndarray): Identificadores.
+
+        Retorno:
+        ndarray: Contadores (uint64) correspondentes.
+        """
+        return self._walk(np.asarray(values, dtype=np.uint64), self._decrypt)
+
+    def at(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Retorna os identificadores das posições informadas da sequência de alocação.
+
+        Parâmetros:
+        positions (ndarray): Posições na sequência (0 é o primeiro identificador alocável).
+
+        Retorno:
+        ndarray: Identificadores (uint64), sem os reservados.
+        """
+        positions = np.asarray(positions, dtype=np.uint64)
+        counters = positions
+        if len(self._skipped):
+            # Desloca cada posição pelos contadores pulados até ela (ponto fixo)
+            while True:
+                shifted = positions + np.searchsorted(self._skipped, counters, side='right').astype(np.uint64)
+                if np.array_equal(shifted, counters):
+                    break
+                counters = shifted
+        return self.permute(counters)
+
+    def allocate_one(self) -> int:
+        """
+        Aloca o próximo identificador do intervalo, pelo caminho escalar: os
+        identificadores são calculados em blocos de SCALAR_BLOCK posições, o que
+        dilui o custo fixo das operações NumPy nas alocações de um em um.
+
+        Retorno:
+        int: O mesmo identificador que `allocate(1)` retornaria.
+
+        Lança:
+        OverflowError: Se o intervalo do alocador se esgotar.
+        """
+        if self.next >= self.stop:
+            raise OverflowError(f'ID range exhausted: cannot allocate 1 id of length {self.length} '
+                                f'from position {self.next} (stop {self.stop})')
+        index = self.next - self._block_start
+        if not 0 <= index < len(self._block):
+            end = min(self.next + SCALAR_BLOCK, self.stop)
+            self._block = self.at(np.arange(self.next, end, dtype=np.uint64)).tolist()
+            self._block_start, index = self.next, 0
+        self.next += 1
+        return self._block[index]
+
+    def allocate(self, n: int) -> np.ndarray:
+        """
+        Aloca os próximos `n` identificadores do intervalo, em O(1) por identificador.
+
+        Parâmetros:
+        n (int): Quantidade de identificadores.
+
+        Retorno:
+        ndarray: Identificadores (uint64) únicos.
+
+        Lança:
+        OverflowError: Se o intervalo do alocador se esgotar.
+        """
+        if self.next + n > self.stop:
+            raise OverflowError(f'ID range exhausted: cannot allocate {n} ids of length {self.length} '
+                                f'from position {self.next} (stop {self.stop})')
+        values = self.at(np.arange(self.next, self.next + n, dtype=np.uint64))
+        self.next += n
+        return values
+
+    def format(self, values: np.ndarray) -> List[str]:
+        """
+        Formata identificadores em lote.
+
+        Parâmetros:
+        values (ndarray): Identificadores.
+
+        Retorno:
+        list: Identificadores como strings completadas com zeros à esquerda.
+        """
+        if not len(values):
+            return []
+        return np.char.zfill(values.astype(str), self.length).tolist()
+
+    def format_one(self, value: int) -> str:
+        """
+        Formata um identificador, como `format`.
+        """
+        return str(value).zfill(self.length)
@@ -1,13 +1,85 @@
+import atexit
 import logging
+import multiprocessing
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, Tuple, Union
 
-def setup_logging():
+# Nível de log padrão, substituível por config["LOG_LEVEL"] ou --log-level
+DEFAULT_LOG_LEVEL = 'INFO'
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_queue = None
+_listener = None
+
+
+def setup_logging(level: Union[str, int] = DEFAULT_LOG_LEVEL, log_file: str = 'app.log'):
     """
     Configura o logging para salvar logs em um arquivo chamado 'app.log'.
+
+    Os registros são apenas enfileirados por quem os emite; um QueueListener em
+    segundo plano faz a escrita no arquivo. A fila é compartilhável com os
+    processos geradores (ver `worker_logging_args`).
+
+    Parâmetros:
+    level (str ou int): Nível mínimo dos registros (ex.: 'DEBUG', 'INFO').
+    log_file (str): Arquivo de destino dos logs.
+    """
+    global _queue, _listener
+    if _listener is not None:
+        set_log_level(level)
+        return
+    _queue = multiprocessing.Queue(-1)
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    _listener = QueueListener(_queue, file_handler)
+    _listener.start()
+    root = logging.getLogger()
+    root.addHandler(QueueHandler(_queue))
+    set_log_level(level)
+    atexit.register(stop_logging)
+
+
+def set_log_level(level: Union[str, int]):
+    """
+    Altera o nível mínimo dos registros de log.
+
+    Parâmetros:
+    level (str ou int): Nível mínimo dos registros (ex.: 'DEBUG', 'INFO').
+    """
+    logging.getLogger().setLevel(level.upper() if isinstance(level, str) else level)
+
+
+def stop_logging():
+    """
+    Escreve os registros pendentes e encerra a thread de escrita dos logs.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def worker_logging_args() -> Tuple[Optional[multiprocessing.Queue], int]:
+    """
+    Retorna os argumentos de `init_worker_logging` para os processos geradores.
+
+    Retorno:
+    tuple: Fila de logs do processo principal (ou None) e o nível atual.
+    """
+    return _queue, logging.getLogger().level
+
+
+def init_worker_logging(log_queue: Optional[multiprocessing.Queue], level: int):
+    """
+    Faz um processo gerador enviar os seus logs à fila do processo principal.
+
+    Parâmetros:
+    log_queue (Queue, opcional): Fila criada por `setup_logging`; None mantém o logging do processo.
+    level (int): Nível mínimo dos registros.
     """
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler("app.log"),
-        ]
-    )
+    if log_queue is None:
+        return
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(level)
@@ -1,28 +1,47 @@
+import sys
 import json
 import logging
 import argparse
 import asyncio
+import signal
 from time import sleep
 from os import system, name, makedirs
 from os.path import exists, join
-from tqdm import tqdm
-from colorama import init, Fore, Style
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from pipeline import generate_chunks, generate_seller_chunks, prefetch, aprefetch, chunk_plan, shard_chunks, resolve_seed, DEFAULT_CHUNK_SIZE, DEFAULT_QUEUE_SIZE
+from time_window import to_timestamp
 from data_generator import DataGenerator
-from mongodb_handler import MongoDBHandler
-from logger import setup_logging
+from checkpoint import Manifest, pending_users, DEFAULT_MANIFEST
+from stats import RunStats, LiveSummary, profiled, DEFAULT_SUMMARY_INTERVAL
+from sinks import JsonFileSink, FILE_FORMATS
+from columnar import ColumnarSink, COLUMNAR_FORMATS, dictionary_fields, ordinal_fields
+from compression import CODECS, EXTENSIONS
+from streaming import STREAM_UNITS, DEFAULT_MAX_BATCH
+from logger import setup_logging, DEFAULT_LOG_LEVEL
 
-# Configuração de logging
-setup_logging()
-
-# Inicializa o colorama
-init(autoreset=True)
+# O motor, o tqdm e o colorama são importados apenas quando usados, para que
+# execuções curtas sem terminal (--quiet) iniciem rapidamente
 
 # Configuração global
 config = None
 
+# Segundos de cada unidade aceita em --rate
+RATE_UNITS = {'s': 1, 'm': 60, 'h': 3600}
+
 # Funções utilitárias
 
+@lru_cache(maxsize=None)
+def colors():
+    """
+    Importa e inicializa o colorama na primeira mensagem colorida.
+
+    Retorno:
+    tuple: Os objetos Fore e Style do colorama.
+    """
+    from colorama import init, Fore, Style
+    init(autoreset=True)
+    return Fore, Style
+
 def clear_screen():
     """
     Limpa a tela do terminal.
@@ -42,10 +61,31 @@ def cls_message(message, delay=2):
     sleep(delay)
     clear_screen()
 
+def notify(args, message, error=False, delay=2):
+    """
+    Informa o resultado de uma execução com argumentos.
+
+    No modo --quiet não há cores, atrasos nem limpeza da tela: apenas os erros
+    são escritos em stderr e o resultado é dado pelo código de saída.
+
+    Parâmetros:
+    args: Argumentos da linha de comando.
+    message (str): Mensagem a ser exibida.
+    error (bool): Se a mensagem informa um erro.
+    delay (int): O tempo em segundos antes de limpar a tela.
+    """
+    if getattr(args, 'quiet', False):
+        if error:
+            print(message, file=sys.stderr)
+        return
+    Fore, _ = colors()
+    cls_message((Fore.RED if error else Fore.GREEN) + message, delay=delay)
+
 def print_main_menu():
     """
     Exibe o menu principal.
     """
+    Fore, _ = colors()
     clear_screen()
     print(Fore.CYAN + "===============================")
     print(Fore.CYAN + "       Gerador de Dados        ")
@@ -58,6 +98,7 @@ def print_generation_menu():
     """
     Exibe o menu de opções de geração de dados.
     """
+    Fore, _ = colors()
     clear_screen()
     print(Fore.CYAN + "===============================")
     print(Fore.CYAN + "    Opções de Geração de Dados ")
@@ -66,20 +107,310 @@ def print_generation_menu():
     print(Fore.CYAN + "[2] Salvar em um arquivo JSON")
     print(Fore.CYAN + "===============================")
 
-def generate_users_parallel(data_generator, docs_count):
+def user_chunks(config, docs_count, chunk_size=DEFAULT_CHUNK_SIZE, seed=None, workers=1, sink=None,
+                reference_time=None, manifest=None, stats=None, summary_interval=DEFAULT_SUMMARY_INTERVAL,
+                quiet=False, shard=None):
     """
-    Gera usuários em paralelo.
+    Gera usuários em chunks, atualizando a barra de progresso a cada chunk.
+
+    Sem um terminal (ex.: em um job agendado), a barra é substituída por um
+    resumo periódico das estatísticas da execução.
 
     Parâmetros:
-    data_generator (DataGenerator): Instância do gerador de dados.
+    config (dict): Configurações carregadas do arquivo config.json.
     docs_count (int): Número de usuários a serem gerados.
+    chunk_size (int): Número máximo de usuários por chunk.
+    seed (int, opcional): Semente global da geração.
+    workers (int): Número de processos geradores.
+    sink (opcional): Destino (JsonFileSink ou MongoDBHandler); com um `encoder`, os chunks
+        já chegam serializados pelos workers.
+    reference_time (str, opcional): Fim da janela de datas das transações (ISO 8601).
+    manifest (Manifest, opcional): Checkpoint da execução; os chunks já gravados em `sink`
+        não são gerados de novo.
+    stats (RunStats, opcional): Estatísticas da execução, que recebem os tempos de cada chunk.
+    summary_interval (float): Segundos entre os resumos exibidos quando não há terminal.
+    quiet (bool): Se True, não exibe progresso.
+    shard (tuple, opcional): (índice, total) de shards; gera apenas a parte deste shard.
+
+    Retorno:
+    Iterator: Chunks de usuários gerados.
+    """
+    stats = stats if stats is not None else RunStats()
+    encoding = {'date_format': sink.date_format, 'encoder': sink.encoder} if sink is not None else {}
+    skip = manifest.committed(sink.checkpoint_key) if manifest is not None and sink is not None else None
+    plan = chunk_plan(docs_count, chunk_size)
+    if shard is not None:
+        plan = [plan[index] for index in shard_chunks(len(plan), *shard)]
+    if plan and isinstance(sink, JsonFileSink):
+        # Os workers abrem o array JSON no primeiro chunk do arquivo (o primeiro do shard)
+        sink.first_chunk = plan[0][0]
+    total = sum(size for _, _, size in plan)
+    done = total - pending_users(manifest, sink.checkpoint_key, plan) if skip else 0
+    if quiet:
+        progress = None
+    elif sys.stderr.isatty():
+        from tqdm import tqdm
+        progress = tqdm(total=total, initial=done, desc="Gerando Usuários")
+    else:
+        progress = LiveSummary(stats, total - done, summary_interval)
+    try:
+        for chunk in generate_chunks(config, docs_count, chunk_size, seed, workers,
+                                     reference_time=reference_time, skip=skip, shard=shard, **encoding):
+            stats.add_chunk(chunk)
+            yield chunk
+            if progress is not None:
+                progress.update(len(chunk))
+    finally:
+        if progress is not None:
+            progress.close()
+
+def parse_shard(value):
+    """
+    Converte o argumento --shard 'i/N' (i de 1 a N) em (índice a partir de 0, total).
+    """
+    try:
+        shard, shards = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard {value!r}, expected i/N") from None
+    if not 1 <= shard <= shards:
+        raise argparse.ArgumentTypeError(f"invalid shard {value!r}, i must be between 1 and N")
+    return shard - 1, shards
+
+def parse_rate(value):
+    """
+    Converte o argumento --rate 'N/s' (também N/m, N/h, ou apenas N por segundo) em eventos por segundo.
+    """
+    number, _, unit = value.partition('/')
+    try:
+        rate = float(number) / RATE_UNITS[unit or 's']
+    except (KeyError, ValueError):
+        raise argparse.ArgumentTypeError(f"invalid rate {value!r}, expected N/s") from None
+    if not rate > 0:
+        raise argparse.ArgumentTypeError(f"invalid rate {value!r}, it must be positive")
+    return rate
+
+def args_shard(args, manifest=None):
+    """
+    Retorna o shard da execução: o gravado no checkpoint, ao retomar, ou o de --shard.
+
+    Retorno:
+    tuple ou None: (índice a partir de 0, total), ou None sem shards.
+    """
+    if manifest is not None and manifest.params.get('shard'):
+        return tuple(manifest.params['shard'])
+    return getattr(args, 'shard', None)
+
+def shard_name(name, shard):
+    """
+    Acrescenta a um nome de arquivo o sufixo do shard (ex.: dados-00002-of-00004),
+    que ordena as partes na ordem do conjunto de dados.
+    """
+    if shard is None:
+        return name
+    return f'{name}-{shard[0] + 1:05d}-of-{shard[1]:05d}'
+
+def args_chunks(args, config, sink=None, manifest=None, stats=None):
+    """
+    Cria a fonte de chunks a partir dos argumentos da linha de comando.
+
+    Parâmetros:
+    args: Argumentos da linha de comando.
+    config: Configurações carregadas do arquivo config.json.
+    sink (opcional): Destino que serializa os chunks.
+    manifest (Manifest, opcional): Checkpoint da execução, que fixa a semente e a data de referência.
+    stats (RunStats, opcional): Estatísticas da execução.
+
+    Retorno:
+    Iterator[list]: Chunks de usuários gerados.
+    """
+    if manifest is not None:
+        seed, reference_time = manifest.params['seed'], manifest.params['reference_time']
+    else:
+        seed, reference_time = getattr(args, 'seed', None), getattr(args, 'reference_time', None)
+    return user_chunks(
+        config,
+        args.generate,
+        getattr(args, 'chunk_size', None) or DEFAULT_CHUNK_SIZE,
+        seed,
+        getattr(args, 'workers', 1),
+        sink,
+        reference_time,
+        manifest,
+        stats,
+        getattr(args, 'stats_interval', None) or DEFAULT_SUMMARY_INTERVAL,
+        getattr(args, 'quiet', False),
+        args_shard(args, manifest),
+    )
+
+def open_checkpoint(args):
+    """
+    Abre o manifesto de checkpoint pedido na linha de comando (--checkpoint/--resume).
+
+    Numa execução nova, a semente e a data de referência são sorteadas aqui e
+    gravadas no manifesto, para que uma retomada regere exatamente os mesmos chunks.
+
+    Parâmetros:
+    args: Argumentos da linha de comando.
+
+    Retorno:
+    Manifest ou None: Manifesto, ou None se o checkpoint não foi pedido.
+    """
+    resume = getattr(args, 'resume', False)
+    path = getattr(args, 'checkpoint', None) or (DEFAULT_MANIFEST if resume else None)
+    if path is None:
+        return None
+    params = {
+        'docs_count': args.generate,
+        'chunk_size': getattr(args, 'chunk_size', None) or DEFAULT_CHUNK_SIZE,
+        'seed': getattr(args, 'seed', None),
+        'reference_time': getattr(args, 'reference_time', None),
+        'shard': list(args.shard) if getattr(args, 'shard', None) else None,
+    }
+    if params['reference_time'] is not None:
+        params['reference_time'] = to_timestamp(params['reference_time'])
+    manifest = Manifest.open(path, params, resume)
+    if manifest.params['seed'] is None:
+        manifest.params['seed'] = resolve_seed(None)
+    if manifest.params['reference_time'] is None:
+        manifest.params['reference_time'] = to_timestamp(None)
+    manifest.save()
+    return manifest
+
+async def save_to_mongo(chunks, mongo_handler, batch_size=None, concurrency=None, manifest=None, stats=None):
+    """
+    Insere no MongoDB, chunk a chunk, os usuários gerados.
+
+    A geração roda em uma thread produtora com fila limitada, sobrepondo-se às
+    inserções, que são feitas em lotes sem ordem e em paralelo; apenas alguns
+    chunks ficam em memória, qualquer que seja o total.
+
+    Parâmetros:
+    chunks (Iterable[list]): Fonte dos chunks de usuários.
+    mongo_handler (MongoDBHandler): Handler já conectado ao MongoDB.
+    batch_size (int, opcional): Documentos por chamada de insert_many (padrão: 1000).
+    concurrency (int, opcional): Número máximo de lotes em andamento (padrão: 8).
+    manifest (Manifest, opcional): Checkpoint onde cada chunk gravado é registrado.
+    stats (RunStats, opcional): Estatísticas da execução (espera na fila e latência das inserções).
+    """
+    from mongodb_handler import DEFAULT_BATCH_SIZE, DEFAULT_CONCURRENCY
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    on_chunk_done = None
+    if manifest is not None:
+        def on_chunk_done(index):
+            manifest.commit(mongo_handler.checkpoint_key, index)
+    await mongo_handler.insert_chunks(aprefetch(chunks, DEFAULT_QUEUE_SIZE, stats), batch_size, concurrency,
+                                      on_chunk_done=on_chunk_done, stats=stats)
+
+async def bulk_load(args, config, mongo_handler, options, manifest=None, stats=None):
+    """
+    Carrega os usuários em massa com os índices secundários adiados, e grava a coleção de vendedores.
+
+    Os índices existentes são registrados e removidos (ou a coleção é recriada,
+    com --drop); após a carga, eles e os de BULK_LOAD_INDEXES (seller_id,
+    transactions.date e transactions.mcc) são construídos uma única vez. Com
+    checkpoint, as definições ficam no manifesto para que uma retomada as
+    recrie. Os vendedores da mesma execução vão para config["MONGO_SELLERS_COLLECTION"]
+    (padrão: 'sellers'), com o seller_id como `_id`.
+
+    Parâmetros:
+    args: Argumentos da linha de comando.
+    config: Configurações carregadas do arquivo config.json.
+    mongo_handler (MongoDBHandler): Handler já conectado à coleção dos usuários.
+    options (dict): Opções de `mongo_options`.
+    manifest (Manifest, opcional): Checkpoint da execução.
+    stats (RunStats, opcional): Estatísticas da execução; a construção dos índices é a etapa 'index'.
+    """
+    from mongodb_handler import MongoDBHandler, BULK_LOAD_INDEXES, DEFAULT_SELLERS_COLLECTION, merge_indexes
+    stats = stats if stats is not None else RunStats()
+    if manifest is not None:
+        seed = manifest.params['seed']
+    else:
+        # Os usuários e os vendedores precisam da mesma semente
+        seed = resolve_seed(getattr(args, 'seed', None))
+        args = argparse.Namespace(**dict(vars(args), seed=seed))
+    recorded = await mongo_handler.drop_indexes(getattr(args, 'drop', False))
+    # Ao retomar, os índices já foram removidos: as definições vêm do manifesto
+    stored = manifest.state(mongo_handler.checkpoint_key).get('indexes') if manifest is not None else None
+    indexes = stored or merge_indexes(recorded, BULK_LOAD_INDEXES)
+    if manifest is not None:
+        manifest.update(mongo_handler.checkpoint_key, indexes=indexes)
+    sellers = MongoDBHandler(args.connection, config["MONGO_DATABASE"],
+                             config.get("MONGO_SELLERS_COLLECTION", DEFAULT_SELLERS_COLLECTION),
+                             options['max_pool_size'], options['write_concern'], id_field='seller_id')
+    await sellers.connect()
+    try:
+        await save_to_mongo(args_chunks(args, config, mongo_handler, manifest, stats), mongo_handler,
+                            options['batch_size'], options['concurrency'], manifest, stats)
+        seller_chunks = generate_seller_chunks(config, args.generate,
+                                               getattr(args, 'chunk_size', None) or DEFAULT_CHUNK_SIZE,
+                                               seed, args_shard(args, manifest))
+        await sellers.insert_chunks(aprefetch(seller_chunks, DEFAULT_QUEUE_SIZE), options['batch_size'],
+                                    options['concurrency'])
+    except BaseException:
+        logging.error(f'Bulk load interrupted; indexes to rebuild on {mongo_handler.collection}: {json.dumps(indexes)}')
+        raise
+    with stats.timer('index'):
+        await mongo_handler.create_indexes(indexes)
+
+def mongo_options(args, config):
+    """
+    Combina as opções de carga do MongoDB de config["MONGO_BULK"] com as da linha de comando.
+
+    Parâmetros:
+    args: Argumentos da linha de comando.
+    config: Configurações carregadas do arquivo config.json.
 
     Retorno:
-    list: Lista de usuários gerados.
+    dict: Opções batch_size, concurrency, max_pool_size e write_concern.
+    """
+    from mongodb_handler import DEFAULT_BATCH_SIZE, DEFAULT_CONCURRENCY
+    options = {
+        'batch_size': DEFAULT_BATCH_SIZE,
+        'concurrency': DEFAULT_CONCURRENCY,
+        'max_pool_size': None,
+        'write_concern': None,
+    }
+    options.update(config.get("MONGO_BULK", {}))
+    for name in options:
+        value = getattr(args, name, None)
+        if value is not None:
+            options[name] = value
+    return options
+
+def save_to_json(chunks, sink, manifest=None, stats=None):
+    """
+    Grava em um arquivo, chunk a chunk, os usuários gerados.
+
+    Parâmetros:
+    chunks (Iterable): Fonte dos chunks de usuários.
+    sink (JsonFileSink): Destino de arquivo ainda não aberto.
+    manifest (Manifest, opcional): Checkpoint onde cada chunk gravado é registrado,
+        com a posição no arquivo para retomar a gravação.
+    stats (RunStats, opcional): Estatísticas da execução (espera na fila, latência e bytes das escritas).
     """
-    with ThreadPoolExecutor() as executor:
-        futures = [executor.submit(data_generator.generate_user) for _ in range(docs_count)]
-        return [future.result() for future in tqdm(as_completed(futures), total=docs_count, desc="Gerando Usuários")]
+    stats = stats if stats is not None else RunStats()
+    with sink:
+        for chunk in prefetch(chunks, DEFAULT_QUEUE_SIZE, stats):
+            written = sink.bytes_written
+            with stats.timer('write', histogram=True):
+                sink.write(chunk)
+            stats.count('bytes', sink.bytes_written - written)
+            if manifest is not None:
+                manifest.commit(sink.checkpoint_key, chunk.index, offset=sink.tell(), count=sink.count)
+
+def write_stats(args, stats):
+    """
+    Encerra as estatísticas da execução e as grava em --stats, se pedido.
+
+    Parâmetros:
+    args: Argumentos da linha de comando.
+    stats (RunStats): Estatísticas da execução.
+    """
+    stats.finish()
+    logging.info(stats.summary())
+    if getattr(args, 'stats', None):
+        stats.write(args.stats)
 
 async def async_main(args, config):
     """
@@ -88,25 +419,114 @@ async def async_main(args, config):
     Parâmetros:
     args: Argumentos da linha de comando.
     config: Configurações carregadas do arquivo config.json.
-    """
-    data_generator = DataGenerator(config)
-    docs_count = args.generate
 
+    Retorno:
+    int: Código de saída: 0 em caso de sucesso, 1 em caso de erro.
+    """
     if args.output == 'mongo':
         # Gera e salva os dados no MongoDB
         try:
+            from mongodb_handler import MongoDBHandler
             logging.info('Generating data and saving to MongoDB')
+            # Valida a quantidade antes de conectar (e, na carga em massa, de remover os índices)
+            DataGenerator.config_for(config, args.generate)
             connection_str = args.connection
-            mongo_handler = MongoDBHandler(connection_str, config["MONGO_DATABASE"], config["MONGO_COLLECTION"])
+            options = mongo_options(args, config)
+            manifest = open_checkpoint(args)
+            stats = RunStats()
+            # Com checkpoint, o _id determinístico torna idempotente regravar um chunk
+            mongo_handler = MongoDBHandler(connection_str, config["MONGO_DATABASE"], config["MONGO_COLLECTION"],
+                                           options['max_pool_size'], options['write_concern'],
+                                           getattr(args, 'raw_bson', False),
+                                           'consumer_id' if manifest is not None else None)
             await mongo_handler.connect()
             
-            users = generate_users_parallel(data_generator, docs_count)
-            await mongo_handler.insert_many(users)
-            sleep(1)
-            cls_message(Fore.GREEN + 'Dados inseridos com sucesso!', delay=2)
+            if getattr(args, 'bulk_load', False):
+                await bulk_load(args, config, mongo_handler, options, manifest, stats)
+            else:
+                await save_to_mongo(args_chunks(args, config, mongo_handler, manifest, stats), mongo_handler,
+                                    options['batch_size'], options['concurrency'], manifest, stats)
+            write_stats(args, stats)
+            notify(args, 'Dados inseridos com sucesso!', delay=3)
         except Exception as e:
             logging.error(f"Error: {e}")
-            cls_message(Fore.RED + f"Erro: {e}", delay=3)
+            notify(args, f"Erro: {e}", error=True, delay=3)
+            return 1
+    return 0
+
+async def stream_main(args, config):
+    """
+    Função principal do modo de transmissão (--rate), para testes de carga:
+    emite usuários ou transações continuamente, no ritmo pedido, para o
+    MongoDB, a saída padrão (NDJSON) ou um socket.
+
+    A transmissão termina após --duration segundos, --generate eventos, ou
+    com Ctrl+C; o relatório com a taxa alcançada e as latências vai para
+    stderr e, com --stats, para o relatório JSON.
+
+    Parâmetros:
+    args: Argumentos da linha de comando.
+    config: Configurações carregadas do arquivo config.json.
+
+    Retorno:
+    int: Código de saída: 0 em caso de sucesso, 1 em caso de erro.
+    """
+    from streaming import (EventSource, MongoTarget, RateProfile, SocketTarget, StdoutTarget, TokenBucket,
+                           DEFAULT_TRANSACTIONS_COLLECTION, format_report, stream, stream_chunks)
+    unit = getattr(args, 'unit', None) or 'users'
+    quiet = getattr(args, 'quiet', False)
+    stats = RunStats()
+    try:
+        logging.info(f'Streaming {unit} to {args.output} at {args.rate:g}/s')
+        if args.output == 'mongo':
+            from mongodb_handler import MongoDBHandler
+            options = mongo_options(args, config)
+            collection = config["MONGO_COLLECTION"] if unit == 'users' else \
+                config.get("MONGO_TRANSACTIONS_COLLECTION", DEFAULT_TRANSACTIONS_COLLECTION)
+            mongo_handler = MongoDBHandler(args.connection, config["MONGO_DATABASE"], collection,
+                                           options['max_pool_size'], options['write_concern'])
+            await mongo_handler.connect()
+            target = MongoTarget(mongo_handler, unit, options['concurrency'])
+        elif args.output == 'socket':
+            target = SocketTarget(args.socket, unit)
+        else:
+            target = StdoutTarget(unit)
+        profile = RateProfile(args.rate, getattr(args, 'ramp', None) or 0.0, getattr(args, 'ramp_from', None) or 0.0)
+        # Criada antes de abrir o destino: um limite acima dos IDs únicos falha antes de qualquer envio
+        source = EventSource(stream_chunks(config, args.generate, unit,
+                                           getattr(args, 'chunk_size', None) or DEFAULT_CHUNK_SIZE,
+                                           getattr(args, 'seed', None), getattr(args, 'workers', 1),
+                                           target.date_format, target.encoder,
+                                           getattr(args, 'reference_time', None), stats), unit)
+        await target.open()
+        # Ctrl+C encerra a transmissão normalmente, com o relatório
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+        try:
+            report = await stream(source, target, TokenBucket(profile),
+                                  getattr(args, 'batch_size', None) or DEFAULT_MAX_BATCH,
+                                  getattr(args, 'duration', None), args.generate, stats, stop,
+                                  None if quiet else getattr(args, 'stats_interval', None) or DEFAULT_SUMMARY_INTERVAL)
+        finally:
+            try:
+                loop.remove_signal_handler(signal.SIGINT)
+            except (NotImplementedError, RuntimeError):
+                pass
+            await source.aclose()
+            await target.close()
+        stats.sections['stream'] = report
+        write_stats(args, stats)
+        if not quiet:
+            print(format_report(report), file=sys.stderr)
+    except Exception as e:
+        logging.error(f"Error streaming data: {e}")
+        print(f'Erro: {e}', file=sys.stderr)
+        return 1
+    return 0
 
 def sync_main(args, config):
     """
@@ -115,52 +535,129 @@ def sync_main(args, config):
     Parâmetros:
     args: Argumentos da linha de comando.
     config: Configurações carregadas do arquivo config.json.
-    """
-    data_generator = DataGenerator(config)
-    docs_count = args.generate
 
+    Retorno:
+    int: Código de saída: 0 em caso de sucesso, 1 em caso de erro.
+    """
     if args.output == 'json':
         # Gera e salva os dados em um arquivo JSON
         try:
             logging.info('Generating data and saving to JSON file')
-            users = generate_users_parallel(data_generator, docs_count)
+            # Valida a quantidade antes de criar o arquivo de saída
+            DataGenerator.config_for(config, args.generate)
             directory = "output_json"
             if not exists(directory):
                 makedirs(directory)
-            file_name = args.filename if args.filename else 'dados.json'
-            file_path = join(directory, file_name)
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(users, f, ensure_ascii=False, indent=4, default=data_generator.json_serial)
-            cls_message(Fore.GREEN + f'Dados salvos com sucesso em {file_path}!', delay=2)
+            file_format = getattr(args, 'format', None) or 'json'
+            compression = {'compress': getattr(args, 'compress', None), 'level': getattr(args, 'compress_level', None)}
+            manifest = open_checkpoint(args)
+            base_name = shard_name('dados', args_shard(args, manifest))
+            if file_format in COLUMNAR_FORMATS:
+                # Tabelas de usuários e transações em um diretório
+                file_path = join(directory, args.filename if args.filename else base_name)
+                sink = ColumnarSink(file_path, file_format, dictionary_fields(config), **compression,
+                                    ordinals=ordinal_fields(config))
+            else:
+                file_name = args.filename if args.filename else f'{base_name}.{file_format}'
+                if compression['compress'] and not file_name.endswith(EXTENSIONS[compression['compress']]):
+                    file_name += EXTENSIONS[compression['compress']]
+                file_path = join(directory, file_name)
+                resume_state = manifest.state(f'file:{file_path}') if manifest is not None else {}
+                sink = JsonFileSink(file_path, file_format, getattr(args, 'indent', None), **resume_state,
+                                    **compression)
+            stats = RunStats()
+            save_to_json(args_chunks(args, config, sink, manifest, stats), sink, manifest, stats)
+            write_stats(args, stats)
+            notify(args, f'Dados salvos com sucesso em {file_path}!')
         except Exception as e:
             logging.error(f"Error saving to JSON file: {e}")
-            cls_message(Fore.RED + f'Erro ao salvar o arquivo JSON: {e}', delay=3)
+            notify(args, f'Erro ao salvar o arquivo JSON: {e}', error=True, delay=3)
+            return 1
+    return 0
 
 def run_main(args=None):
     """
     Função principal para o menu interativo ou execução com argumentos.
+
+    Retorno:
+    int: Código de saída da execução com argumentos (0 em caso de sucesso).
     """
     global config
 
     if args is None:
         parser = argparse.ArgumentParser(description='Gerador de Dados de Usuários e Vendedores')
         parser.add_argument('--generate', type=int, help='Número de documentos a serem gerados')
-        parser.add_argument('--output', choices=['mongo', 'json'], help='Destino da saída dos dados')
+        parser.add_argument('--output', choices=['mongo', 'json', 'stdout', 'socket'], help='Destino da saída dos dados (stdout e socket apenas com --rate)')
         parser.add_argument('--connection', type=str, help='String de conexão para o MongoDB')
         parser.add_argument('--filename', type=str, help='Nome do arquivo JSON (sem extensão)')
+        parser.add_argument('--format', choices=FILE_FORMATS + COLUMNAR_FORMATS, default='json', help='Formato do arquivo: array JSON, NDJSON (um documento por linha), ou tabelas de usuários e transações em CSV ou colunas .npy')
+        parser.add_argument('--indent', type=int, help='Indentação do JSON (padrão: compacto)')
+        parser.add_argument('--compress', choices=CODECS, help='Comprime a saída em arquivo, um membro por chunk comprimido nos workers (zstd requer o pacote zstandard)')
+        parser.add_argument('--compress-level', type=int, help='Nível de compressão (padrão: o do codec)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Número de usuários gerados e gravados por chunk')
+        parser.add_argument('--workers', type=int, default=1, help='Número de processos geradores (0 para usar todos os núcleos)')
+        parser.add_argument('--batch-size', type=int, help='Documentos por insert_many no MongoDB (padrão: 1000)')
+        parser.add_argument('--concurrency', type=int, help='Lotes inseridos simultaneamente no MongoDB (padrão: 8)')
+        parser.add_argument('--max-pool-size', type=int, help='Tamanho máximo do pool de conexões do MongoDB')
+        parser.add_argument('--write-concern', type=str, help='Write concern das inserções (ex.: 0, 1, majority)')
+        parser.add_argument('--bulk-load', action='store_true', help='Remove os índices secundários da coleção, carrega os usuários, grava a coleção de vendedores e recria os índices (com seller_id, transactions.date e transactions.mcc) ao final')
+        parser.add_argument('--drop', action='store_true', help='Com --bulk-load, remove a coleção antes da carga (não aceito com --shard)')
+        parser.add_argument('--raw-bson', action='store_true', help='Codifica os documentos em BSON junto com a geração (nos workers) e os insere sem recodificar')
+        parser.add_argument('--reference-time', type=str, help='Data final (ISO 8601) da janela de 60 dias das transações; padrão: o início da execução')
+        parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], type=str.upper, help='Nível de log (padrão: LOG_LEVEL do config.json ou INFO)')
+        parser.add_argument('--seed', type=int, help='Semente global para gerar dados reproduzíveis')
+        parser.add_argument('--shard', type=parse_shard, help='Gera apenas a parte i de N (ex.: 2/4) do conjunto de dados; requer os mesmos --generate, --chunk-size, --seed e --reference-time em todos os shards')
+        parser.add_argument('--rate', type=parse_rate, help='Modo de transmissão para testes de carga: emite eventos continuamente nesta taxa (ex.: 50000/s) para mongo, stdout ou socket; --generate limita o total de eventos')
+        parser.add_argument('--duration', type=float, help='Com --rate, duração da transmissão em segundos (padrão: até --generate eventos ou Ctrl+C)')
+        parser.add_argument('--ramp', type=float, help='Com --rate, segundos de rampa linear até a taxa alvo')
+        parser.add_argument('--ramp-from', type=parse_rate, help='Com --ramp, taxa no início da rampa (padrão: 0)')
+        parser.add_argument('--unit', choices=STREAM_UNITS, default='users', help='Com --rate, emite um evento por usuário ou por transação')
+        parser.add_argument('--socket', type=str, help='Com --output socket, endereço host:porta (TCP) ou caminho de um socket Unix')
+        parser.add_argument('--checkpoint', type=str, help='Arquivo de checkpoint onde cada chunk gravado é registrado')
+        parser.add_argument('--stats', type=str, help='Grava ao final um relatório JSON com tempos por etapa, latências e vazão')
+        parser.add_argument('--stats-interval', type=float, default=DEFAULT_SUMMARY_INTERVAL, help='Segundos entre os resumos exibidos no lugar da barra de progresso quando não há terminal')
+        parser.add_argument('--profile', type=str, help='Executa sob o cProfile e grava o perfil do processo principal neste arquivo')
+        parser.add_argument('--resume', action='store_true', help=f'Retoma a execução registrada no checkpoint (padrão: {DEFAULT_MANIFEST})')
+        parser.add_argument('--quiet', action='store_true', help='Modo headless: sem barra de progresso, cores, pausas ou limpeza da tela; o resultado é dado pelo código de saída')
         args = parser.parse_args()
+        if (args.generate or args.rate) and not args.output:
+            parser.error('--output is required with --generate or --rate')
+        if args.output in ('stdout', 'socket') and not args.rate:
+            parser.error(f'--output {args.output} requires --rate')
+        if args.rate and args.output == 'json':
+            parser.error('--rate streams to mongo, stdout or socket; use --output json without --rate for files')
+        if args.rate and (args.checkpoint or args.resume or args.shard or args.bulk_load):
+            parser.error('--checkpoint, --resume, --shard and --bulk-load are not supported with --rate')
+        if (args.output == 'socket') != bool(args.socket):
+            parser.error('--socket is required with --output socket, and only used with it')
+        if (args.duration or args.ramp or args.ramp_from) and not args.rate:
+            parser.error('--duration, --ramp and --ramp-from require --rate')
+        if args.shard and not args.resume and (args.seed is None or args.reference_time is None):
+            parser.error('--shard requires --seed and --reference-time, so that all shards generate the same dataset')
+        if args.bulk_load and args.output != 'mongo':
+            parser.error('--bulk-load requires --output mongo')
+        if args.drop and (not args.bulk_load or args.resume or args.shard):
+            # Cada shard apagaria a coleção, com os usuários já carregados pelos demais
+            parser.error('--drop requires --bulk-load and cannot be used with --resume or --shard')
+        if args.format in COLUMNAR_FORMATS and (args.checkpoint or args.resume):
+            parser.error(f'--checkpoint and --resume are not supported with --format {args.format}')
 
     # Carrega as configurações do arquivo config.json
     with open('config.json', 'r', encoding='utf-8') as config_file:
         config = json.load(config_file)
 
-    if args.generate:
-        if args.output == 'mongo':
-            asyncio.run(async_main(args, config))
-        else:
-            sync_main(args, config)
+    # Configuração de logging
+    setup_logging(getattr(args, 'log_level', None) or config.get("LOG_LEVEL", DEFAULT_LOG_LEVEL))
+
+    if args.generate or getattr(args, 'rate', None):
+        with profiled(getattr(args, 'profile', None)):
+            if getattr(args, 'rate', None):
+                return asyncio.run(stream_main(args, config))
+            if args.output == 'mongo':
+                return asyncio.run(async_main(args, config))
+            return sync_main(args, config)
     else:
-        data_generator = DataGenerator(config)
+        Fore, Style = colors()
         while True:
             try:
                 print_main_menu()
@@ -177,11 +674,14 @@ def run_main(args=None):
                             try:
                                 logging.info('Generating data and saving to MongoDB')
                                 connection_str = input(Fore.YELLOW + 'String de conexão com o MongoDB: ' + Style.RESET_ALL)
+                                from mongodb_handler import MongoDBHandler
                                 mongo_handler = MongoDBHandler(connection_str, config["MONGO_DATABASE"], config["MONGO_COLLECTION"])
-                                asyncio.run(mongo_handler.connect())
-                                
-                                users = generate_users_parallel(data_generator, docs_count)
-                                asyncio.run(mongo_handler.insert_many(users))
+
+                                async def connect_and_save():
+                                    await mongo_handler.connect()
+                                    await save_to_mongo(user_chunks(config, docs_count), mongo_handler)
+
+                                asyncio.run(connect_and_save())
                                 sleep(1)
                                 cls_message(Fore.GREEN + 'Dados inseridos com sucesso!', delay=2)
                             except Exception as e:
@@ -191,14 +691,13 @@ def run_main(args=None):
                             # Gera e salva os dados em um arquivo JSON
                             try:
                                 logging.info('Generating data and saving to JSON file')
-                                users = generate_users_parallel(data_generator, docs_count)
                                 directory = "output_json"
                                 if not exists(directory):
                                     makedirs(directory)
                                 file_name = input(Fore.YELLOW + 'Nome do arquivo JSON (sem extensão): ' + Style.RESET_ALL) + '.json'
                                 file_path = join(directory, file_name)
-                                with open(file_path, 'w', encoding='utf-8') as f:
-                                    json.dump(users, f, ensure_ascii=False, indent=4, default=data_generator.json_serial)
+                                sink = JsonFileSink(file_path, indent=4)
+                                save_to_json(user_chunks(config, docs_count, sink=sink), sink)
                                 cls_message(Fore.GREEN + f'Dados salvos com sucesso em {file_path}!', delay=2)
                             except Exception as e:
                                 logging.error(f"Error saving to JSON file: {e}")
@@ -223,4 +722,4 @@ def run_main(args=None):
                 cls_message(Fore.RED + f'Ocorreu um erro inesperado: {e}', delay=3)
 
 if __name__ == "__main__":
-    run_main()
+    sys.exit(run_main())
@@ -0,0 +1,211 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+from typing import Dict, List, Optional
+import numpy as np
+from columnar import NpyColumnWriter, DICTIONARY_FILE, load_dictionary
+from compression import EXTENSIONS, INDEX_SUFFIX, load_index
+
+# Linhas lidas por vez ao copiar as colunas .npy
+COPY_ROWS = 1 << 20
+
+
+def codec_of(path: str) -> Optional[str]:
+    """
+    Identifica o codec de compressão pela extensão do arquivo.
+
+    Retorno:
+    str ou None: Um de compression.CODECS, ou None se o arquivo não for comprimido.
+    """
+    for codec, extension in EXTENSIONS.items():
+        if path.endswith(extension):
+            return codec
+    return None
+
+
+def _copy(path: str, output, start: int = 0):
+    with open(path, 'rb') as source:
+        source.seek(start)
+        shutil.copyfileobj(source, output, 1 << 20)
+
+
+def concat_files(paths: List[str], output_path: str, skip_header: bool = False) -> int:
+    """
+    Concatena arquivos de texto, comprimidos ou não, sem reprocessar o conteúdo.
+
+    Os arquivos comprimidos são sequências de membros independentes (ver
+    compression.CompressedWriter), e a concatenação deles é um arquivo válido;
+    os índices são combinados com as posições deslocadas.
+
+    Parâmetros:
+    paths (list): Arquivos, na ordem do conjunto de dados.
+    output_path (str): Arquivo de saída, com a mesma extensão de compressão das entradas.
+    skip_header (bool): Descarta a primeira linha (ou, se comprimido, o primeiro membro)
+        de todos os arquivos, exceto o primeiro (cabeçalhos CSV).
+
+    Retorno:
+    int: Bytes gravados.
+
+    Lança:
+    ValueError: Se as entradas usarem codecs diferentes, ou faltar o índice de um
+        arquivo comprimido cujo cabeçalho precisa ser descartado.
+    """
+    codecs = {codec_of(path) for path in paths} | {codec_of(output_path)}
+    if len(codecs) != 1:
+        raise ValueError(f'Cannot merge files with different compression: {sorted(map(str, codecs))}')
+    codec = codecs.pop()
+    indexes = [load_index(path + INDEX_SUFFIX) for path in paths] if codec is not None else []
+    if codec is not None and skip_header and not all(indexes):
+        raise ValueError('Merging compressed tables needs the .idx index of every part')
+    merged = []
+    offset = raw_offset = 0
+    with open(output_path, 'wb') as output:
+        for position, path in enumerate(paths):
+            start = 0
+            if skip_header and position:
+                if codec is None:
+                    with open(path, 'rb') as source:
+                        start = len(source.readline())
+                else:
+                    start = indexes[position][1]['offset'] if len(indexes[position]) > 1 else os.path.getsize(path)
+            _copy(path, output, start)
+            if codec is not None:
+                entries = [entry for entry in indexes[position] if entry['offset'] >= start]
+                base = entries[0]['raw_offset'] if entries else 0
+                for entry in entries:
+                    merged.append({'offset': entry['offset'] - start + offset, 'size': entry['size'],
+                                   'raw_offset': entry['raw_offset'] - base + raw_offset,
+                                   'raw_size': entry['raw_size']})
+                raw_offset += sum(entry['raw_size'] for entry in entries)
+            offset += os.path.getsize(path) - start
+    if codec is not None:
+        if all(indexes):
+            with open(output_path + INDEX_SUFFIX, 'w', encoding='utf-8') as index:
+                index.writelines(json.dumps(entry) + '\n' for entry in merged)
+        else:
+            logging.warning(f'Some parts have no {INDEX_SUFFIX} index; {output_path} was written without one')
+    return offset
+
+
+def _tables(directory: str) -> Dict[str, str]:
+    # Tabelas CSV de uma exportação: {tabela: nome do arquivo}
+    tables = {}
+    for name in sorted(os.listdir(directory)):
+        stem = os.path.splitext(name)[0] if codec_of(name) is not None else name
+        if stem.endswith('.csv'):
+            tables[stem[:-len('.csv')]] = name
+    return tables
+
+
+def merge_npy(directories: List[str], output: str) -> int:
+    """
+    Concatena exportações npy, coluna a coluna.
+
+    As colunas de dicionário de cada parte têm códigos próprios: o dicionário
+    combinado mantém os textos da primeira parte, acrescenta os novos das
+    seguintes, e os códigos de cada parte são traduzidos por uma tabela.
+
+    Parâmetros:
+    directories (list): Exportações, na ordem do conjunto de dados.
+    output (str): Diretório de saída.
+
+    Retorno:
+    int: Linhas gravadas na tabela raiz.
+    """
+    dictionaries = [load_dictionary(directory) for directory in directories]
+    merged_dictionary = {}
+    for dictionary in dictionaries:
+        for key, values in dictionary.items():
+            lookup = merged_dictionary.setdefault(key, {})
+            for value in values:
+                lookup.setdefault(value, len(lookup))
+    columns = {}
+    for directory in directories:
+        for table in sorted(os.listdir(directory)):
+            if os.path.isdir(os.path.join(directory, table)):
+                for name in sorted(os.listdir(os.path.join(directory, table))):
+                    if name.endswith('.npy'):
+                        columns.setdefault((table, name[:-len('.npy')]), None)
+    rows = {}
+    for table, column in columns:
+        key = f'{table}.{column}'
+        parts = []
+        for directory, dictionary in zip(directories, dictionaries):
+            path = os.path.join(directory, table, f'{column}.npy')
+            if os.path.exists(path):
+                values = np.load(path, mmap_mode='r')
+                mapping = None
+                if key in dictionary:
+                    mapping = np.array([merged_dictionary[key][value] for value in dictionary[key]], dtype=np.int32)
+                parts.append((values, mapping))
+        # Textos de largura fixa podem variar entre as partes: vale a maior largura
+        dtype = np.result_type(*[values.dtype for values, _ in parts if len(values)] or [parts[0][0].dtype])
+        os.makedirs(os.path.join(output, table), exist_ok=True)
+        writer = NpyColumnWriter(os.path.join(output, table, f'{column}.npy'), dtype=dtype)
+        for values, mapping in parts:
+            for start in range(0, len(values), COPY_ROWS):
+                block = np.asarray(values[start:start + COPY_ROWS])
+                writer.write(mapping[block] if mapping is not None else block.astype(dtype, copy=False))
+        writer.close()
+        rows[table] = writer.rows
+    with open(os.path.join(output, DICTIONARY_FILE), 'w', encoding='utf-8') as f:
+        json.dump({key: list(lookup) for key, lookup in merged_dictionary.items()}, f, ensure_ascii=False)
+    return rows.get('users', 0)
+
+
+def merge(paths: List[str], output: str):
+    """
+    Combina as saídas dos shards de uma execução (--shard i/N) em uma só,
+    sem reordenar nem deduplicar: como os shards são faixas disjuntas e
+    contíguas dos chunks, basta concatená-los na ordem dos shards.
+
+    Aceita arquivos NDJSON (comprimidos ou não) e diretórios da exportação em
+    colunas (CSV, comprimido ou não, ou npy).
+
+    Parâmetros:
+    paths (list): Saídas dos shards, na ordem (1/N, 2/N, ...).
+    output (str): Arquivo ou diretório de saída.
+
+    Lança:
+    ValueError: Se as entradas forem de tipos diferentes ou arrays JSON.
+    """
+    if not paths:
+        raise ValueError('Nothing to merge')
+    if all(os.path.isdir(path) for path in paths):
+        os.makedirs(output, exist_ok=True)
+        if all(os.path.exists(os.path.join(path, DICTIONARY_FILE)) for path in paths):
+            merge_npy(paths, output)
+        else:
+            tables = {}
+            for path in paths:
+                for table, name in _tables(path).items():
+                    tables.setdefault(table, (name, []))[1].append(os.path.join(path, name))
+            for table, (name, parts) in tables.items():
+                concat_files(parts, os.path.join(output, name), skip_header=True)
+    elif any(os.path.isdir(path) for path in paths):
+        raise ValueError('Cannot merge files with columnar directories')
+    elif any('.ndjson' not in os.path.basename(path) for path in paths):
+        raise ValueError('Only NDJSON files can be concatenated; generate the shards with --format ndjson')
+    else:
+        concat_files(paths, output)
+    logging.info(f'Merged {len(paths)} parts into {output}')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Combina as saídas dos shards (--shard i/N) em um único conjunto de dados')
+    parser.add_argument('parts', nargs='+', help='Saídas dos shards (arquivos NDJSON ou diretórios CSV/npy), na ordem dos shards')
+    parser.add_argument('--output', required=True, help='Arquivo ou diretório de saída')
+    args = parser.parse_args(argv)
+    try:
+        merge(args.parts, args.output)
+    except (OSError, ValueError) as e:
+        print(f'Erro: {e}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
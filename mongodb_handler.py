@@ -1,8 +1,101 @@
+import asyncio
+import time
 import motor.motor_asyncio
 import logging
+from typing import AsyncIterable, Callable, Dict, List, Optional, Union
+import bson
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+from pymongo import IndexModel
+from pymongo.errors import BulkWriteError, ConnectionFailure, OperationFailure
+from pipeline import EncodedChunk
+from records import Records
+from stats import RunStats
+
+# Documentos por chamada de insert_many no carregamento em massa
+DEFAULT_BATCH_SIZE = 1000
+
+# Lotes enviados simultaneamente no carregamento em massa
+DEFAULT_CONCURRENCY = 8
+
+# Novas tentativas de um lote que falhou e o atraso inicial entre elas (segundos)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Índices secundários criados ao final do carregamento em massa, além dos que a coleção já tinha
+BULK_LOAD_INDEXES = [
+    {'key': [['seller_id', 1]], 'name': 'seller_id_1'},
+    {'key': [['transactions.date', 1]], 'name': 'transactions.date_1'},
+    {'key': [['transactions.mcc', 1]], 'name': 'transactions.mcc_1'},
+]
+
+# Coleção dos vendedores gravada pelo carregamento em massa
+DEFAULT_SELLERS_COLLECTION = 'sellers'
+
+
+def merge_indexes(*groups: List[Dict]) -> List[Dict]:
+    """
+    Combina definições de índices, descartando as de chaves repetidas (vale a primeira).
+
+    Parâmetros:
+    *groups (list): Listas de definições {'key': [[campo, direção], ...], 'name': ..., opções}.
+
+    Retorno:
+    list: Definições com chaves distintas.
+    """
+    merged = {}
+    for group in groups:
+        for spec in group:
+            merged.setdefault(tuple(map(tuple, spec['key'])), spec)
+    return list(merged.values())
+
+
+class BsonChunkEncoder:
+    """
+    Serializa chunks de usuários em BSON, um buffer por documento.
+
+    A instância é picklable: nos workers, cada chunk chega ao processo principal
+    já codificado e o loop asyncio apenas repassa os bytes ao socket. Cada
+    documento recebe o seu `_id` na codificação, o que mantém idempotentes as
+    novas tentativas de um lote.
+    """
+
+    def __init__(self, id_field: Optional[str] = None):
+        """
+        Parâmetros:
+        id_field (str, opcional): Campo do usuário usado como `_id`; se ausente, um novo ObjectId.
+        """
+        self.id_field = id_field
+
+    def __call__(self, users: Union[List[Dict], Records]) -> List[bytes]:
+        """
+        Codifica um chunk de usuários.
+
+        Parâmetros:
+        users (list ou Records): Chunk de dicionários representando usuários, ou os
+            mesmos usuários em colunas; neste caso os dicionários são montados
+            aos poucos, só para o bson.encode.
+
+        Retorno:
+        list: Documentos codificados em BSON.
+        """
+        encode = bson.encode
+        if isinstance(users, Records):
+            users = users.iter_dicts()
+        if self.id_field is not None:
+            return [encode({'_id': user[self.id_field], **user}) for user in users]
+        return [encode({'_id': ObjectId(), **user}) for user in users]
+
 
 class MongoDBHandler:
-    def __init__(self, connection_str: str, database: str, collection: str):
+    # O MongoDB armazena datetime nativamente
+    date_format = 'datetime'
+
+    def __init__(self, connection_str: str, database: str, collection: str,
+                 max_pool_size: Optional[int] = None, write_concern: Union[int, str, None] = None,
+                 raw_bson: bool = False, id_field: Optional[str] = None):
         """
         Inicializa a classe MongoDBHandler com as configurações fornecidas.
 
@@ -10,14 +103,41 @@ class MongoDBHandler:
         connection_str (str): String de conexão para o MongoDB.
         database (str): Nome do banco de dados.
         collection (str): Nome da coleção.
+        max_pool_size (int, opcional): Número máximo de conexões do pool do cliente.
+        write_concern (int ou str, opcional): Write concern `w` (ex.: 0, 1, 'majority').
+        raw_bson (bool): Se True, os chunks são codificados em BSON por `self.encoder`
+            junto com a geração e inseridos sem nova codificação.
+        id_field (str, opcional): Campo usado como `_id` (ex.: 'consumer_id'). Com um `_id`
+            determinístico, regravar um chunk já inserido (ao retomar uma execução) só
+            gera chaves duplicadas, tratadas como sucesso.
         """
         self.connection_str = connection_str
         self.database = database
         self.collection = collection
+        self.max_pool_size = max_pool_size
+        self.write_concern = write_concern
+        self.id_field = id_field
+        self.encoder = BsonChunkEncoder(id_field) if raw_bson else None
         self.client = None
         self.db = None
         self.coll = None
 
+    @property
+    def checkpoint_key(self) -> str:
+        """
+        Chave do destino no manifesto de checkpoint.
+        """
+        return f'mongo:{self.database}.{self.collection}'
+
+    def _client_options(self) -> dict:
+        options = {}
+        if self.max_pool_size is not None:
+            options['maxPoolSize'] = self.max_pool_size
+        if self.write_concern is not None:
+            w = self.write_concern
+            options['w'] = int(w) if isinstance(w, str) and w.isdigit() else w
+        return options
+
     async def connect(self):
         """
         Conecta ao MongoDB usando a string de conexão fornecida.
@@ -26,7 +146,7 @@ class MongoDBHandler:
         ConnectionError: Se a conexão ao MongoDB falhar.
         """
         try:
-            self.client = motor.motor_asyncio.AsyncIOMotorClient(self.connection_str)
+            self.client = motor.motor_asyncio.AsyncIOMotorClient(self.connection_str, **self._client_options())
             self.db = self.client[self.database]
             self.coll = self.db[self.collection]
             logging.info("Connected to MongoDB.")
@@ -34,6 +154,49 @@ class MongoDBHandler:
             logging.error(f"Error connecting to MongoDB: {e}")
             raise
 
+    async def drop_indexes(self, drop_collection: bool = False) -> List[Dict]:
+        """
+        Registra as definições dos índices secundários da coleção e os remove,
+        para que o carregamento em massa não os mantenha documento a documento.
+
+        Parâmetros:
+        drop_collection (bool): Se True, remove a coleção inteira (carga do zero).
+
+        Retorno:
+        list: Definições removidas, no formato aceito por `create_indexes`
+            ({'key': [[campo, direção], ...], 'name': ..., e as opções, como 'unique'}).
+        """
+        information = await self.coll.index_information()
+        indexes = []
+        for name, options in information.items():
+            if name == '_id_':
+                continue
+            spec = {option: value for option, value in options.items() if option not in ('v', 'ns', 'key')}
+            indexes.append(dict(spec, key=[list(field) for field in options['key']], name=name))
+        if drop_collection:
+            await self.coll.drop()
+            logging.info(f'Dropped collection {self.collection}')
+        elif indexes:
+            await self.coll.drop_indexes()
+            logging.info(f'Dropped indexes {[spec["name"] for spec in indexes]} of {self.collection}')
+        return indexes
+
+    async def create_indexes(self, indexes: List[Dict]):
+        """
+        Cria os índices de uma só vez, após a carga (uma construção por índice
+        em vez de uma atualização por documento).
+
+        Parâmetros:
+        indexes (list): Definições no formato retornado por `drop_indexes`.
+        """
+        if not indexes:
+            return
+        models = [IndexModel([tuple(field) for field in spec['key']],
+                             **{option: value for option, value in spec.items() if option != 'key'})
+                  for spec in indexes]
+        await self.coll.create_indexes(models)
+        logging.info(f'Created indexes {[spec["name"] for spec in indexes]} on {self.collection}')
+
     async def insert_many(self, data: list):
         """
         Insere múltiplos documentos na coleção MongoDB.
@@ -50,3 +213,138 @@ class MongoDBHandler:
         except Exception as e:
             logging.error(f"Error inserting data into MongoDB: {e}")
             raise
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, BulkWriteError):
+            return False
+        if isinstance(error, ConnectionFailure):
+            return True
+        return isinstance(error, OperationFailure) and error.has_error_label('RetryableWriteError')
+
+    @staticmethod
+    def _only_duplicates(error: BulkWriteError) -> bool:
+        details = error.details or {}
+        write_errors = details.get('writeErrors', [])
+        return bool(write_errors) and not details.get('writeConcernErrors') and \
+            all(e.get('code') == DUPLICATE_KEY_ERROR for e in write_errors)
+
+    async def _insert_batch(self, batch: List, retries: int, backoff: float) -> int:
+        """
+        Insere um lote sem ordem, repetindo-o com backoff exponencial em falhas transitórias.
+
+        Como o insert_many atribui o `_id` aos documentos na primeira tentativa,
+        uma nova tentativa que encontra apenas chaves duplicadas significa que o
+        lote já havia sido gravado. Com `id_field`, o mesmo vale já na primeira
+        tentativa, pois o `_id` não muda entre execuções.
+
+        Parâmetros:
+        batch (list): Documentos do lote.
+        retries (int): Número máximo de novas tentativas.
+        backoff (float): Atraso antes da primeira nova tentativa; dobra a cada tentativa.
+
+        Retorno:
+        int: Número de documentos do lote.
+        """
+        for attempt in range(retries + 1):
+            try:
+                await self.coll.insert_many(batch, ordered=False)
+                return len(batch)
+            except BulkWriteError as e:
+                if (attempt or self.id_field is not None) and self._only_duplicates(e):
+                    return len(batch)
+                logging.error(f"Error inserting batch into MongoDB: {e}")
+                raise
+            except Exception as e:
+                if attempt == retries or not self._is_retryable(e):
+                    logging.error(f"Error inserting batch into MongoDB: {e}")
+                    raise
+                delay = backoff * 2 ** attempt
+                logging.warning(f"Retrying batch of {len(batch)} documents in {delay}s after error: {e}")
+                await asyncio.sleep(delay)
+
+    async def insert_chunks(self, chunks: AsyncIterable, batch_size: int = DEFAULT_BATCH_SIZE,
+                            concurrency: int = DEFAULT_CONCURRENCY, retries: int = DEFAULT_RETRIES,
+                            backoff: float = DEFAULT_BACKOFF,
+                            on_chunk_done: Optional[Callable[[int], None]] = None,
+                            stats: Optional[RunStats] = None) -> int:
+        """
+        Carrega em massa os chunks de documentos, com vários lotes em paralelo.
+
+        Cada chunk é dividido em lotes de `batch_size` documentos, inseridos com
+        `ordered=False`; no máximo `concurrency` lotes ficam em andamento, o que
+        também limita quantos chunks são consumidos à frente das inserções.
+
+        Parâmetros:
+        chunks (AsyncIterable): Fonte dos chunks: listas de documentos ou EncodedChunk
+            com documentos já codificados por `BsonChunkEncoder`.
+        batch_size (int): Documentos por chamada de insert_many.
+        concurrency (int): Número máximo de lotes em andamento.
+        retries (int): Novas tentativas de um lote após falhas transitórias.
+        backoff (float): Atraso inicial, em segundos, entre as tentativas.
+        on_chunk_done (Callable, opcional): Chamada com o índice de cada chunk cujos
+            lotes foram todos gravados (ex.: para registrar um checkpoint).
+        stats (RunStats, opcional): Recebe a latência de cada lote ('insert'), os documentos
+            inseridos e, para chunks em BSON, os bytes enviados.
+
+        Retorno:
+        int: Número de documentos inseridos.
+
+        Lança:
+        PyMongoError: Se um lote falhar definitivamente; os lotes em andamento são cancelados.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        pending = set()
+        outstanding = {}
+        inserted = 0
+
+        def batch_done(task, index, started):
+            semaphore.release()
+            if stats is not None and not task.cancelled() and task.exception() is None:
+                stats.add_time('insert', time.perf_counter() - started, histogram=True)
+                stats.count('documents', task.result())
+            if on_chunk_done is None or task.cancelled() or task.exception() is not None:
+                return
+            outstanding[index] -= 1
+            if not outstanding[index]:
+                del outstanding[index]
+                on_chunk_done(index)
+
+        def collect():
+            nonlocal inserted
+            for task in [task for task in pending if task.done()]:
+                pending.discard(task)
+                inserted += task.result()
+
+        try:
+            async for chunk in chunks:
+                index = getattr(chunk, 'index', -1)
+                if isinstance(chunk, EncodedChunk):
+                    if stats is not None:
+                        stats.count('bytes', sum(len(raw) for raw in chunk.payload))
+                    chunk = [RawBSONDocument(raw) for raw in chunk.payload]
+                elif self.id_field is not None:
+                    for doc in chunk:
+                        doc.setdefault('_id', doc[self.id_field])
+                if not chunk:
+                    if on_chunk_done is not None:
+                        on_chunk_done(index)
+                    continue
+                outstanding[index] = outstanding.get(index, 0) + -(-len(chunk) // batch_size)
+                for start in range(0, len(chunk), batch_size):
+                    await semaphore.acquire()
+                    collect()
+                    task = asyncio.create_task(self._insert_batch(chunk[start:start + batch_size], retries, backoff))
+                    task.add_done_callback(lambda task, index=index, started=time.perf_counter():
+                                           batch_done(task, index, started))
+                    pending.add(task)
+            while pending:
+                await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+                collect()
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+        logging.info(f"Inserted {inserted} documents into MongoDB.")
+        return inserted
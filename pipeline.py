@@ -0,0 +1,390 @@
+import os
+import queue
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, AsyncIterator, List, Dict, Optional, Tuple, Callable, Union, Set
+import numpy as np
+from data_generator import DataGenerator
+from time_window import to_timestamp
+from logger import worker_logging_args, init_worker_logging
+from stats import RunStats
+
+# Quantidade padrão de usuários por chunk
+DEFAULT_CHUNK_SIZE = 10_000
+
+# Quantidade máxima de chunks prontos aguardando o consumidor
+DEFAULT_QUEUE_SIZE = 4
+
+_DONE = object()
+
+
+class _Failure:
+    """
+    Transporta para o consumidor uma exceção lançada pela thread produtora.
+    """
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+# Configuração recebida por cada processo do pool no initializer
+_worker_config = None
+
+
+class UserChunk(list):
+    """
+    Chunk de usuários (lista de dicionários) que conhece o próprio índice.
+
+    Atributos:
+    index (int): Índice do chunk.
+    timings (dict): Segundos gastos em cada etapa da produção do chunk (ex.: 'generate').
+    """
+    __slots__ = ('index', 'timings')
+
+    def __init__(self, users: Iterable = (), index: int = -1, timings: Optional[Dict[str, float]] = None):
+        super().__init__(users)
+        self.index = index
+        self.timings = timings
+
+
+class EncodedChunk:
+    """
+    Chunk de usuários já serializado para o formato de um destino.
+
+    Atributos:
+    index (int): Índice do chunk.
+    count (int): Número de usuários contidos no payload.
+    payload: Dados serializados, prontos para o destino.
+    timings (dict): Segundos gastos em cada etapa da produção do chunk ('generate', 'encode').
+    """
+    __slots__ = ('index', 'count', 'payload', 'timings')
+
+    def __init__(self, index: int, count: int, payload, timings: Optional[Dict[str, float]] = None):
+        self.index = index
+        self.count = count
+        self.payload = payload
+        self.timings = timings
+
+    def __len__(self):
+        return self.count
+
+
+def resolve_seed(seed: Optional[int] = None) -> int:
+    """
+    Define a semente global da execução.
+
+    Parâmetros:
+    seed (int, opcional): Semente informada pelo usuário; se ausente, uma é sorteada.
+
+    Retorno:
+    int: Semente usada, registrada no log para permitir reproduzir a execução.
+    """
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % 2 ** 63)
+    logging.info(f'Using seed {seed}')
+    return seed
+
+
+def chunk_seed(seed: int, index: int) -> np.random.SeedSequence:
+    """
+    Deriva a semente independente de um chunk a partir da semente global.
+
+    Parâmetros:
+    seed (int): Semente global da execução.
+    index (int): Índice do chunk.
+
+    Retorno:
+    SeedSequence: Fluxo de números aleatórios exclusivo do chunk.
+    """
+    return np.random.SeedSequence(seed, spawn_key=(index,))
+
+
+def chunk_plan(docs_count: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Tuple[int, int, int]]:
+    """
+    Divide a quantidade de usuários em chunks de tamanho fixo.
+
+    Parâmetros:
+    docs_count (int): Número total de usuários.
+    chunk_size (int): Número máximo de usuários por chunk.
+
+    Retorno:
+    list: Tuplas (índice do chunk, posição do primeiro usuário, quantidade de usuários).
+    """
+    return [(index, start, min(chunk_size, docs_count - start))
+            for index, start in enumerate(range(0, docs_count, chunk_size))]
+
+
+def shard_chunks(chunks: int, shard: int, shards: int) -> range:
+    """
+    Seleciona os chunks de um shard: uma faixa contígua dos índices, disjunta
+    das faixas dos demais shards, que juntas cobrem todos os chunks.
+
+    Como a semente e os IDs de cada chunk dependem apenas do seu índice e da sua
+    posição, os shards gerados em máquinas diferentes (com a mesma semente e os
+    mesmos parâmetros) formam, concatenados em ordem, o mesmo conjunto de dados
+    de uma execução única.
+
+    Parâmetros:
+    chunks (int): Número total de chunks.
+    shard (int): Índice do shard, de 0 a `shards` - 1.
+    shards (int): Número de shards.
+
+    Retorno:
+    range: Índices dos chunks do shard.
+
+    Lança:
+    ValueError: Se o shard não existir.
+    """
+    if not 0 <= shard < shards:
+        raise ValueError(f'Invalid shard {shard} of {shards}')
+    return range(chunks * shard // shards, chunks * (shard + 1) // shards)
+
+
+def generate_chunk(config: dict, seed: int, index: int, start: int, size: int, date_format: str = 'datetime',
+                   encoder: Optional[Callable] = None,
+                   reference_time: Optional[int] = None) -> Union[UserChunk, EncodedChunk]:
+    """
+    Gera um chunk de usuários com o fluxo aleatório próprio do chunk.
+
+    O resultado depende apenas de (`seed`, `index`, `start`, `size`,
+    `reference_time`), e não de qual processo gerou o chunk nem dos chunks
+    gerados antes dele; por isso um chunk pode ser regerado de forma idêntica
+    ao retomar uma execução. Os IDs vêm do intervalo de contadores que começa
+    em `start`, disjunto do intervalo de qualquer outro chunk.
+
+    Parâmetros:
+    config (dict): Dicionário de configuração carregado do arquivo config.json.
+    seed (int): Semente global da execução.
+    index (int): Índice do chunk.
+    start (int): Posição global do primeiro usuário do chunk.
+    size (int): Número de usuários do chunk.
+    date_format (str): Formato das datas das transações ('datetime' ou 'iso').
+    encoder (Callable, opcional): Serializador do destino; quando informado, o
+        chunk é serializado aqui mesmo (no worker, em modo multiprocesso), a
+        partir das colunas (Records), sem dicionários intermediários.
+    reference_time (int, opcional): Fim da janela de datas, como timestamp Unix.
+
+    Retorno:
+    UserChunk ou EncodedChunk: Chunk de usuários, serializado se houver `encoder`.
+    """
+    started = time.perf_counter()
+    generator = DataGenerator(config, seed=chunk_seed(seed, index), id_key=seed, user_offset=start,
+                              reference_time=reference_time)
+    records = generator.generate_records(size, date_format)
+    if encoder is None:
+        users = records.to_dicts()
+    generator.flush_counters()
+    generated = time.perf_counter()
+    timings = {'generate': generated - started}
+    if encoder is None:
+        return UserChunk(users, index, timings)
+    # O encoder serializa as colunas direto, sem montar os dicionários
+    # Encoders `positional` recebem também o índice do chunk (ex.: a abertura ou o separador do array JSON)
+    payload = encoder(records, index) if getattr(encoder, 'positional', False) else encoder(records)
+    timings['encode'] = time.perf_counter() - generated
+    return EncodedChunk(index, len(records), payload, timings)
+
+
+def _init_worker(config: dict, log_queue, log_level: int):
+    global _worker_config
+    _worker_config = config
+    init_worker_logging(log_queue, log_level)
+
+
+def _generate_chunk_worker(seed: int, index: int, start: int, size: int, date_format: str,
+                           encoder: Optional[Callable], reference_time: int) -> Union[UserChunk, EncodedChunk]:
+    return generate_chunk(_worker_config, seed, index, start, size, date_format, encoder, reference_time)
+
+
+def generate_chunks(config: dict, docs_count: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    seed: Optional[int] = None, workers: int = 1,
+                    max_queue: int = DEFAULT_QUEUE_SIZE, date_format: str = 'datetime',
+                    encoder: Optional[Callable] = None, reference_time=None,
+                    skip: Optional[Set[int]] = None,
+                    shard: Optional[Tuple[int, int]] = None) -> Iterator[Union[UserChunk, EncodedChunk]]:
+    """
+    Gera usuários em chunks de tamanho fixo, sob demanda.
+
+    Com `workers` maior que 1 os chunks são gerados em um pool de processos,
+    limitado a `workers + max_queue` chunks em andamento, e entregues na ordem
+    dos índices. A saída é a mesma para qualquer número de workers.
+
+    Parâmetros:
+    config (dict): Dicionário de configuração carregado do arquivo config.json.
+    docs_count (int): Número total de usuários a serem gerados.
+    chunk_size (int): Número máximo de usuários por chunk.
+    seed (int, opcional): Semente global; se ausente, uma é sorteada.
+    workers (int): Número de processos geradores; 0 usa todos os núcleos.
+    max_queue (int): Chunks prontos além dos que estão em geração.
+    date_format (str): Formato das datas das transações ('datetime' ou 'iso').
+    encoder (Callable, opcional): Serializador do destino, aplicado a cada chunk
+        no próprio worker; o processo principal recebe apenas os bytes.
+    reference_time (datetime, str ou int, opcional): Fim da janela de datas das transações;
+        se ausente, o instante atual, fixado uma única vez para toda a execução.
+    skip (Set[int], opcional): Índices de chunks já gravados, que não são gerados de novo.
+    shard (tuple, opcional): (índice, total) de shards; gera apenas os chunks de `shard_chunks`.
+
+    Retorno:
+    Iterator: Chunks de usuários (UserChunk ou EncodedChunk); apenas alguns ficam em memória por vez.
+
+    Lança:
+    ValueError: Se `docs_count` exceder a quantidade de IDs únicos disponíveis (ver DataGenerator.config_for).
+    """
+    config = DataGenerator.config_for(config, docs_count)
+    seed = resolve_seed(seed)
+    reference_time = to_timestamp(reference_time)
+    logging.info(f'Using reference time {reference_time}')
+    plan = chunk_plan(docs_count, chunk_size)
+    if shard is not None:
+        plan = [plan[index] for index in shard_chunks(len(plan), *shard)]
+    plan = [task for task in plan if not skip or task[0] not in skip]
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        for index, start, size in plan:
+            yield generate_chunk(config, seed, index, start, size, date_format, encoder, reference_time)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(config, *worker_logging_args())) as executor:
+        pending = deque()
+        tasks = iter(plan)
+
+        def submit(index, start, size):
+            pending.append(executor.submit(_generate_chunk_worker, seed, index, start, size,
+                                           date_format, encoder, reference_time))
+
+        try:
+            for task in tasks:
+                submit(*task)
+                if len(pending) >= workers + max_queue:
+                    break
+            while pending:
+                chunk = pending.popleft().result()
+                for task in tasks:
+                    submit(*task)
+                    break
+                yield chunk
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def generate_seller_chunks(config: dict, docs_count: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                           seed: Optional[int] = None,
+                           shard: Optional[Tuple[int, int]] = None) -> Iterator[UserChunk]:
+    """
+    Gera os vendedores de uma execução, chunk a chunk, com os mesmos
+    seller_id e seller_name dos usuários gerados com os mesmos parâmetros.
+
+    Parâmetros:
+    config (dict): Dicionário de configuração carregado do arquivo config.json.
+    docs_count (int): Número total de usuários da execução.
+    chunk_size (int): Número máximo de usuários por chunk.
+    seed (int): Semente global da execução (a mesma de `generate_chunks`).
+    shard (tuple, opcional): (índice, total) de shards; apenas os vendedores dos chunks do shard.
+
+    Retorno:
+    Iterator: Chunks de documentos de vendedores (dicionários com os campos SELLER_FIELDS).
+    """
+    if seed is None:
+        raise ValueError('Sellers can only be regenerated with the seed of the run')
+    config = DataGenerator.config_for(config, docs_count)
+    generator = DataGenerator(config, seed=seed, id_key=seed)
+    plan = chunk_plan(docs_count, chunk_size)
+    if shard is not None:
+        plan = [plan[index] for index in shard_chunks(len(plan), *shard)]
+    for index, start, size in plan:
+        yield UserChunk(generator.generate_seller_records(start, size).to_dicts(), index)
+
+
+def prefetch(chunks: Iterable, max_queue: int = DEFAULT_QUEUE_SIZE, stats: Optional[RunStats] = None) -> Iterator:
+    """
+    Consome `chunks` em uma thread produtora ligada a uma fila limitada.
+
+    A fila aplica contrapressão: a produção pausa quando `max_queue` chunks
+    aguardam o consumidor, mantendo a memória constante e sobrepondo a geração
+    com a escrita dos chunks anteriores.
+
+    Parâmetros:
+    chunks (Iterable): Fonte dos chunks, normalmente `generate_chunks`.
+    max_queue (int): Número máximo de chunks prontos em memória.
+    stats (RunStats, opcional): Recebe o tempo do consumidor aguardando chunks ('queue_wait')
+        e o da produção aguardando espaço na fila ('queue_full').
+
+    Retorno:
+    Iterator: Os mesmos chunks, na mesma ordem.
+
+    Lança:
+    Exception: Qualquer exceção lançada pela fonte é relançada no consumidor.
+    """
+    buffer = queue.Queue(maxsize=max_queue)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        started = time.perf_counter()
+        try:
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            if stats is not None:
+                stats.add_time('queue_full', time.perf_counter() - started)
+
+    def producer():
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    return
+        except BaseException as e:
+            put(_Failure(e))
+        finally:
+            put(_DONE)
+
+    thread = threading.Thread(target=producer, name='chunk-producer', daemon=True)
+    thread.start()
+    try:
+        while True:
+            started = time.perf_counter()
+            item = buffer.get()
+            if stats is not None:
+                stats.add_time('queue_wait', time.perf_counter() - started)
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+async def aprefetch(chunks: Iterable, max_queue: int = DEFAULT_QUEUE_SIZE,
+                    stats: Optional[RunStats] = None) -> AsyncIterator:
+    """
+    Versão assíncrona de `prefetch`, para consumidores rodando no loop asyncio.
+
+    Parâmetros:
+    chunks (Iterable): Fonte dos chunks, normalmente `generate_chunks`.
+    max_queue (int): Número máximo de chunks prontos em memória.
+    stats (RunStats, opcional): Recebe os tempos de espera da fila, como em `prefetch`.
+
+    Retorno:
+    AsyncIterator: Os mesmos chunks, na mesma ordem.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = prefetch(chunks, max_queue, stats)
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, next, iterator, _DONE)
+            if chunk is _DONE:
+                break
+            yield chunk
+    finally:
+        iterator.close()
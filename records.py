@@ -0,0 +1,126 @@
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, Union
+
+
+class Nested:
+    """
+    Coluna de um campo array: os itens de todos os documentos em um único
+    Records, e a fatia [starts[i], ends[i]) de cada documento.
+    """
+    __slots__ = ('records', 'starts', 'ends')
+
+    def __init__(self, records: 'Records', starts: List[int], ends: List[int]):
+        self.records = records
+        self.starts = starts
+        self.ends = ends
+
+
+class Records:
+    """
+    Lote de documentos em colunas (struct-of-arrays).
+
+    Cada campo é uma única lista com o valor de todos os documentos, e os
+    arrays aninhados são um Records dos itens mais os limites de cada
+    documento; nenhum dicionário é criado por documento. Os destinos
+    convertem as colunas direto para o seu formato, e `to_dicts` monta os
+    dicionários quando necessário.
+
+    Atributos:
+    keys (tuple): Nomes dos campos, na ordem do documento.
+    columns (list): Uma lista de valores (ou um Nested) por campo.
+    size (int): Número de documentos.
+    """
+    __slots__ = ('keys', 'columns', 'size')
+
+    def __init__(self, keys: Sequence[str], columns: List[Union[List, Nested]], size: int):
+        self.keys = tuple(keys)
+        self.columns = columns
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def column(self, key: str) -> Union[List, Nested]:
+        """
+        Retorna a coluna de um campo.
+        """
+        return self.columns[self.keys.index(key)]
+
+    def slice(self, start: int, stop: int) -> 'Records':
+        """
+        Retorna os documentos [start, stop) como um novo Records, sem copiar os valores.
+
+        Parâmetros:
+        start (int): Primeiro documento.
+        stop (int): Fim (exclusivo).
+
+        Retorno:
+        Records: Os documentos da fatia.
+        """
+        stop = min(stop, self.size)
+        columns = []
+        for column in self.columns:
+            if isinstance(column, Nested):
+                first = column.starts[start] if start < stop else 0
+                last = column.ends[stop - 1] if start < stop else 0
+                columns.append(Nested(column.records.slice(first, last),
+                                      [s - first for s in column.starts[start:stop]],
+                                      [e - first for e in column.ends[start:stop]]))
+            else:
+                columns.append(column[start:stop])
+        return Records(self.keys, columns, max(stop - start, 0))
+
+    def to_dicts(self) -> List[Dict]:
+        """
+        Monta os documentos como dicionários.
+
+        Retorno:
+        list: Um dicionário por documento, com as chaves na ordem de `keys`.
+        """
+        args = []
+        for column in self.columns:
+            if isinstance(column, Nested):
+                args += [column.records.to_dicts(), column.starts, column.ends]
+            else:
+                args.append(column)
+        return builder(self.keys, tuple(isinstance(column, Nested) for column in self.columns))(*args)
+
+    def iter_dicts(self, batch_size: int = 1024) -> Iterator[Dict]:
+        """
+        Monta os dicionários aos poucos, `batch_size` documentos por vez, para
+        destinos que precisam de um dicionário por documento (ex.: bson.encode)
+        sem manter a árvore do lote inteiro em memória.
+        """
+        for start in range(0, self.size, batch_size):
+            yield from self.slice(start, start + batch_size).to_dicts()
+
+
+@lru_cache(maxsize=32)
+def builder(keys: Tuple[str, ...], arrays: Tuple[bool, ...]) -> Callable[..., List[Dict]]:
+    """
+    Gera, com exec, a função que monta os dicionários de documentos com as chaves `keys`.
+
+    A função tem um literal de dicionário com as chaves, como o código escrito à
+    mão, e recebe uma lista de valores por campo; para os arrays, a lista de
+    itens já montados e o início e o fim da fatia de cada documento.
+    """
+    params, loop_vars, iterables, entries = [], [], [], []
+    for position, (key, is_array) in enumerate(zip(keys, arrays)):
+        if is_array:
+            params += [f'items{position}', f'starts{position}', f'ends{position}']
+            loop_vars += [f's{position}', f'e{position}']
+            iterables += [f'starts{position}', f'ends{position}']
+            entries.append(f'{key!r}: items{position}[s{position}:e{position}]')
+        else:
+            params.append(f'column{position}')
+            loop_vars.append(f'v{position}')
+            iterables.append(f'column{position}')
+            entries.append(f'{key!r}: v{position}')
+    source = (
+        f'def build({", ".join(params)}):\n'
+        f'    return [{{{", ".join(entries)}}}\n'
+        f'            for {", ".join(loop_vars)} in zip({", ".join(iterables)})]\n'
+    )
+    namespace = {}
+    exec(compile(source, '<records>', 'exec'), namespace)
+    return namespace['build']
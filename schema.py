@@ -0,0 +1,314 @@
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+from records import Records, Nested
+
+FIELD_TYPES = ('int', 'decimal', 'choice', 'lookup', 'id', 'seller', 'datetime', 'constant', 'array')
+
+# Schema equivalente ao documento gerado por DataGenerator.generate_users_batch
+DEFAULT_SCHEMA = {
+    "consumer_id": {"type": "id", "sequence": "consumer"},
+    "age": {"type": "int", "min": 16, "max": 99},
+    "exact_distance": {"type": "int", "min": 1000, "max": 10000},
+    "score": {"type": "int", "min": 100, "max": 1000},
+    "seller_id": {"type": "seller", "new": True},
+    "transactions": {
+        "type": "array", "min": 0, "max": 4,
+        "items": {
+            "transactionId": {"type": "id", "sequence": "transaction"},
+            "seller_id": {"type": "seller", "field": "id"},
+            "seller_name": {"type": "seller", "field": "name"},
+            "mcc": {"type": "lookup", "source": "MCC_DICT", "field": "mcc"},
+            "mccCategory": {"type": "lookup", "source": "MCC_DICT", "field": "category"},
+            "value": {"type": "decimal", "min": 10, "max": 200, "digits": 2},
+            "date": {"type": "datetime"},
+            "type": {"type": "choice", "source": "TRANSACTION_TYPES"}
+        }
+    }
+}
+
+# Uma coluna recebe (gerador, n, date_format, sorteios compartilhados do nível) e retorna n valores
+Column = Callable[[object, int, str, Dict], List]
+
+
+def _object_array(values: List) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _indices(rng: np.random.Generator, size: int, n: int, weights) -> np.ndarray:
+    if weights is None:
+        return rng.integers(0, size, size=n)
+    return rng.choice(size, size=n, p=weights)
+
+
+def _weights(spec: Dict, size: int, name: str):
+    weights = spec.get('weights')
+    if weights is None:
+        return None
+    if len(weights) != size:
+        raise ValueError(f'Field {name} has {len(weights)} weights for {size} values')
+    weights = np.asarray(weights, dtype=np.float64)
+    return weights / weights.sum()
+
+
+def _required(spec: Dict, name: str, *keys: str):
+    for key in keys:
+        if key not in spec:
+            raise ValueError(f'Field {name} needs "{key}"')
+
+
+def _source(spec: Dict, config: dict, name: str) -> List:
+    if 'values' in spec:
+        values = spec['values']
+    elif spec.get('source') in config:
+        values = config[spec['source']]
+    else:
+        raise ValueError(f'Field {name} needs "values" or a "source" present in the config')
+    if not values:
+        raise ValueError(f'Field {name} has no values')
+    return values
+
+
+def categorical_fields(schema: Dict, config: dict) -> Tuple[str, ...]:
+    """
+    Lista os campos de texto sorteados de um conjunto pequeno de valores: 'choice'
+    e 'lookup' com valores de texto. A largura desses textos varia de documento
+    para documento, ao contrário dos IDs.
+
+    Parâmetros:
+    schema (dict): Campos do documento raiz.
+    config (dict): Dicionário de configuração, fonte das listas referenciadas.
+
+    Retorno:
+    tuple: Nomes dos campos, incluindo os dos itens de arrays.
+    """
+    fields = []
+    for name, spec in schema.items():
+        kind = spec.get('type')
+        if kind == 'array':
+            _required(spec, name, 'items')
+            fields.extend(field for field in categorical_fields(spec['items'], config) if field not in fields)
+            continue
+        if kind == 'choice':
+            values = _source(spec, config, name)
+        elif kind == 'lookup':
+            _required(spec, name, 'field')
+            values = [row[spec['field']] for row in _source(spec, config, name)]
+        else:
+            continue
+        if all(isinstance(value, str) for value in values) and name not in fields:
+            fields.append(name)
+    return tuple(fields)
+
+
+def seller_name_fields(schema: Dict) -> Tuple[str, ...]:
+    """
+    Lista os campos com o 'name' de um vendedor ('SELLER<ordinal>'), incluindo os dos itens de arrays.
+    """
+    fields = []
+    for name, spec in schema.items():
+        if spec.get('type') == 'array':
+            _required(spec, name, 'items')
+            fields.extend(field for field in seller_name_fields(spec['items']) if field not in fields)
+        elif spec.get('type') == 'seller' and spec.get('field') == 'name' and name not in fields:
+            fields.append(name)
+    return tuple(fields)
+
+
+class _Level:
+    def __init__(self, fields: Dict, config: dict, id_limits: Dict[str, int], multiplicity: int, root: bool):
+        """
+        Compila um nível do schema (o documento raiz ou os itens de um array).
+
+        Parâmetros:
+        fields (dict): Campos do nível, na ordem em que aparecem no documento.
+        config (dict): Dicionário de configuração, fonte das listas referenciadas.
+        id_limits (dict): IDs reservados por documento raiz em cada sequência.
+            O total usado pelo plano inteiro é validado em GenerationPlan, a partir de `id_usage`.
+        multiplicity (int): Máximo de ocorrências deste nível por documento raiz.
+        root (bool): Se este é o nível do documento raiz.
+        """
+        if not fields:
+            raise ValueError('Schema levels need at least one field')
+        self.keys = tuple(fields)
+        self.columns = []
+        self.arrays = []
+        self.new_sellers = False
+        # Máximo de IDs de cada sequência usados por documento raiz, somando este nível e os filhos
+        self.id_usage: Dict[str, int] = {}
+        for key, spec in fields.items():
+            kind = spec.get('type')
+            if kind not in FIELD_TYPES:
+                raise ValueError(f'Unknown field type {kind!r} for {key}')
+            if kind == 'array':
+                _required(spec, key, 'max', 'items')
+                low, high = int(spec.get('min', 0)), int(spec['max'])
+                if not 0 <= low <= high:
+                    raise ValueError(f'Invalid item count range for {key}')
+                child = _Level(spec['items'], config, id_limits, multiplicity * high, root=False)
+                self.new_sellers |= child.new_sellers
+                for sequence, used in child.id_usage.items():
+                    self.id_usage[sequence] = self.id_usage.get(sequence, 0) + used
+                self.arrays.append((key, low, high, _weights(spec, high - low + 1, key), child))
+            else:
+                self.columns.append(self._column(key, spec, config, id_limits, multiplicity, root))
+
+    def _column(self, name: str, spec: Dict, config: dict, id_limits: Dict[str, int], multiplicity: int,
+                root: bool) -> Column:
+        kind = spec['type']
+        if kind in ('int', 'decimal'):
+            _required(spec, name, 'min', 'max')
+        if kind == 'int':
+            low, high = int(spec['min']), int(spec['max'])
+            if spec.get('distribution', 'uniform') == 'normal':
+                mean = spec.get('mean', (low + high) / 2)
+                std = spec.get('std', (high - low) / 6)
+
+                def normal(g, n, f, s):
+                    return np.clip(np.rint(g.rng.normal(mean, std, n)), low, high).astype(np.int64).tolist()
+                return normal
+            return lambda g, n, f, s: g.rng.integers(low, high + 1, size=n).tolist()
+        if kind == 'decimal':
+            low, high, digits = int(spec['min']), int(spec['max']), int(spec.get('digits', 2))
+
+            def decimal(g, n, f, s):
+                return (g.rng.integers(low, high + 1, size=n) + np.round(g.rng.random(n), digits)).tolist()
+            return decimal
+        if kind == 'constant':
+            _required(spec, name, 'value')
+            value = spec['value']
+            return lambda g, n, f, s: [value] * n
+        if kind == 'datetime':
+            return lambda g, n, f, s: g.format_timestamps(g.time_window.sample(g.rng, n), f)
+        if kind == 'choice':
+            values = _source(spec, config, name)
+            table = _object_array(values)
+            weights = _weights(spec, len(values), name)
+            return lambda g, n, f, s: table[_indices(g.rng, len(table), n, weights)].tolist()
+        if kind == 'lookup':
+            _required(spec, name, 'field')
+            rows = _source(spec, config, name)
+            # Coluna pré-calculada; os campos do mesmo grupo reaproveitam o sorteio da linha
+            table = _object_array([row[spec['field']] for row in rows])
+            group = ('lookup', spec.get('group', spec.get('source', name)))
+            weights = _weights(spec, len(rows), name)
+
+            def lookup(g, n, f, shared):
+                if group not in shared:
+                    shared[group] = _indices(g.rng, len(table), n, weights)
+                return table[shared[group]].tolist()
+            return lookup
+        if kind == 'id':
+            sequence = spec.get('sequence')
+            if sequence not in id_limits:
+                raise ValueError(f'Unknown id sequence {sequence!r} for {name}')
+            self.id_usage[sequence] = self.id_usage.get(sequence, 0) + multiplicity
+
+            def allocate(g, n, f, s):
+                allocator = g.consumer_allocator if sequence == 'consumer' else g.transaction_allocator
+                return allocator.format(allocator.allocate(n))
+            return allocate
+        # seller
+        if spec.get('new'):
+            if not root:
+                raise ValueError(f'Field {name}: new sellers can only be created by root documents')
+            if self.new_sellers:
+                # O gerador reserva um seller_id por documento raiz
+                raise ValueError(f'Field {name}: only one field can create new sellers')
+            self.new_sellers = True
+
+            def new_seller(g, n, f, s):
+                sellers = g.seller_allocator.allocate(n)
+                g.seller_registry.add(sellers.astype(np.int64))
+                return g.seller_allocator.format(sellers)
+            return new_seller
+        field = spec.get('field', 'id')
+        if field not in ('id', 'name'):
+            raise ValueError(f'Unknown seller field {field!r} for {name}')
+        group = ('seller', spec.get('group', 'seller'))
+
+        def seller(g, n, f, shared):
+            if group not in shared:
+                shared[group] = g.seller_registry.sample(n)
+            slots = shared[group]
+            return g.seller_registry.seller_ids(slots) if field == 'id' else g.seller_registry.seller_names(slots)
+        return seller
+
+    def generate(self, generator, n: int, date_format: str) -> Records:
+        shared = {}
+        # Os campos simples vêm antes dos arrays, para que os vendedores criados
+        # pelo documento já possam ser referenciados pelos seus itens
+        values = iter([column(generator, n, date_format, shared) for column in self.columns])
+        nested = {}
+        for key, low, high, weights, child in self.arrays:
+            counts = low + _indices(generator.rng, high - low + 1, n, weights)
+            ends = np.cumsum(counts)
+            total = int(ends[-1]) if n else 0
+            generator.counters[key] += total
+            ends = ends.tolist()
+            nested[key] = Nested(child.generate(generator, total, date_format), [0] + ends[:-1], ends)
+        return Records(self.keys, [nested[key] if key in nested else next(values) for key in self.keys], n)
+
+
+class GenerationPlan:
+    def __init__(self, schema: Dict, config: dict, id_limits: Dict[str, int]):
+        """
+        Compila o schema de documento declarado em config["SCHEMA"] em um plano de geração.
+
+        Cada campo vira uma coluna sorteada em lote (listas de consulta como
+        MCC_DICT viram arrays indexados pelos sorteios), e o lote sai em colunas
+        (Records), cujos dicionários são montados por uma função gerada para as
+        chaves do schema, com o custo de um gerador escrito à mão.
+
+        Tipos de campo:
+        - int: {"min", "max"}, com "distribution" 'uniform' (padrão) ou 'normal' ("mean", "std").
+        - decimal: parte inteira em [min, max] mais uma fração com "digits" casas.
+        - choice: um de "values" ou da lista config[source], com "weights" opcionais.
+        - lookup: a chave "field" de uma linha de config[source]; campos do mesmo "group"
+          (padrão: a fonte) usam a mesma linha.
+        - id: ID único da "sequence" 'consumer' ou 'transaction'; somando todos os campos da
+          mesma sequência, no máximo `id_limits` por documento.
+        - seller: {"new": true} cria o vendedor do documento (em um único campo); nos demais níveis, o "field"
+          'id' ou 'name' de um vendedor sorteado do registro.
+        - datetime: data da janela de transações.
+        - constant: sempre "value".
+        - array: entre "min" e "max" (e "weights" opcionais) documentos com os campos de "items".
+
+        Parâmetros:
+        schema (dict): Campos do documento raiz.
+        config (dict): Dicionário de configuração carregado do arquivo config.json.
+        id_limits (dict): Quantos IDs de cada sequência o gerador reserva por documento raiz
+            (ex.: {'consumer': 1, 'transaction': 4}); garante que chunks distintos não colidam.
+
+        Lança:
+        ValueError: Se o schema for inválido.
+        """
+        self.root = _Level(schema, config, id_limits, multiplicity=1, root=True)
+        # Cada chunk reserva id_limits[sequência] IDs por documento: passar disso invadiria o chunk seguinte
+        for sequence, used in self.root.id_usage.items():
+            if used > id_limits[sequence]:
+                raise ValueError(f'Schema needs up to {used} {sequence} ids per document; '
+                                 f'at most {id_limits[sequence]} are reserved')
+
+    @property
+    def new_sellers(self) -> bool:
+        """
+        Se cada documento raiz registra um novo vendedor.
+        """
+        return self.root.new_sellers
+
+    def generate(self, generator, n: int, date_format: str = 'datetime') -> Records:
+        """
+        Gera um lote de documentos.
+
+        Parâmetros:
+        generator (DataGenerator): Fonte dos sorteios, alocadores de IDs, registro de vendedores e janela de datas.
+        n (int): Número de documentos.
+        date_format (str): 'datetime' ou 'iso', como em `DataGenerator.generate_users_batch`.
+
+        Retorno:
+        Records: Documentos no formato do schema, em colunas.
+        """
+        generator.counters['users'] += n
+        return self.root.generate(generator, n, date_format)
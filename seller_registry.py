@@ -0,0 +1,240 @@
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+
+# Capacidade padrão do registro de vendedores
+DEFAULT_CAPACITY = 100_000
+
+# Quantidade padrão de dígitos do seller_id, substituível por config["SELLER_ID_LENGTH"]
+SELLER_ID_LENGTH = 6
+
+# Prefixo do seller_name, seguido do ordinal do vendedor
+SELLER_NAME_PREFIX = 'SELLER'
+
+# Até este tamanho, formatar em Python é mais rápido que o np.char
+SMALL_BATCH = 16
+
+EVICTIONS = ('ring', 'reservoir')
+DISTRIBUTIONS = ('uniform', 'zipf')
+
+
+def seller_id_length(config: dict) -> int:
+    """
+    Quantidade de dígitos do seller_id: config["SELLER_ID_LENGTH"] ou SELLER_ID_LENGTH.
+    """
+    return int(config.get("SELLER_ID_LENGTH", SELLER_ID_LENGTH))
+
+
+@lru_cache(maxsize=8)
+def alias_table(capacity: int, exponent: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Monta a tabela de alias (método de Vose) de uma distribuição Zipf sobre as posições.
+
+    A posição k recebe peso 1 / (k + 1) ** exponent. A tabela é calculada uma vez
+    por processo para cada (capacity, exponent) e permite sortear em O(1).
+
+    Parâmetros:
+    capacity (int): Número de posições.
+    exponent (float): Expoente da distribuição; quanto maior, mais concentrada.
+
+    Retorno:
+    tuple: Arrays (probabilidade, alias) de tamanho `capacity`.
+    """
+    weights = 1.0 / np.arange(1, capacity + 1, dtype=np.float64) ** exponent
+    scaled = (weights * (capacity / weights.sum())).tolist()
+    prob = [1.0] * capacity
+    alias = list(range(capacity))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        s, l = small.pop(), large[-1]
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] -= 1.0 - scaled[s]
+        if scaled[l] < 1.0:
+            small.append(large.pop())
+    return np.array(prob), np.array(alias, dtype=np.int64)
+
+
+class SellerRegistry:
+    def __init__(self, sellers: Iterable = (), capacity: int = DEFAULT_CAPACITY, eviction: str = 'ring',
+                 distribution: str = 'uniform', zipf_exponent: float = 1.1,
+                 rng: Optional[np.random.Generator] = None, id_length: int = SELLER_ID_LENGTH):
+        """
+        Inicializa o registro de vendedores, armazenado em arrays de inteiros de tamanho fixo.
+
+        Cada posição guarda o seller_id e o ordinal do vendedor (a ordem em que foi
+        registrado, usada no seller_name). Ao atingir a capacidade, novos vendedores
+        substituem os antigos conforme a política de `eviction`.
+
+        Parâmetros:
+        sellers (Iterable): Vendedores iniciais (ex.: config["SELLERS"]).
+        capacity (int): Número máximo de vendedores mantidos em memória.
+        eviction (str): 'ring' substitui o mais antigo; 'reservoir' mantém uma amostra uniforme de todos.
+        distribution (str): 'uniform' ou 'zipf', a distribuição dos vendedores sorteados para as transações.
+        zipf_exponent (float): Expoente da distribuição 'zipf'; as primeiras posições são os vendedores populares.
+        rng (Generator, opcional): Gerador NumPy usado nos sorteios.
+        id_length (int): Quantidade de dígitos dos seller_ids formatados.
+        """
+        if capacity < 1:
+            raise ValueError('Seller registry capacity must be positive')
+        if eviction not in EVICTIONS:
+            raise ValueError(f'Unknown seller eviction {eviction}')
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f'Unknown seller distribution {distribution}')
+        self.capacity = capacity
+        self.eviction = eviction
+        self.distribution = distribution
+        self.zipf_exponent = zipf_exponent
+        self.id_length = id_length
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.ordinals = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+        self.total = 0
+        self._alias_lists = None
+        self.add(np.array([int(seller) for seller in sellers], dtype=np.int64))
+
+    @classmethod
+    def from_config(cls, config: dict, rng: Optional[np.random.Generator] = None) -> 'SellerRegistry':
+        """
+        Cria o registro a partir de config["SELLERS"], das opções de config["SELLER_REGISTRY"]
+        e da largura dos seller_ids (`seller_id_length`).
+
+        Parâmetros:
+        config (dict): Dicionário de configuração carregado do arquivo config.json.
+        rng (Generator, opcional): Gerador NumPy usado nos sorteios.
+
+        Retorno:
+        SellerRegistry: Registro com os vendedores iniciais.
+        """
+        return cls(config["SELLERS"], rng=rng, id_length=seller_id_length(config), **config.get("SELLER_REGISTRY", {}))
+
+    def __len__(self):
+        return self.size
+
+    def add(self, seller_ids: np.ndarray):
+        """
+        Registra novos vendedores, em lote.
+
+        Parâmetros:
+        seller_ids (ndarray): seller_ids numéricos, na ordem de registro.
+        """
+        count = len(seller_ids)
+        if not count:
+            return
+        ordinals = np.arange(self.total, self.total + count, dtype=np.int64)
+        if self.eviction == 'ring':
+            slots = ordinals % self.capacity
+        else:
+            # Algoritmo R: o vendedor de ordinal t entra com probabilidade capacity / (t + 1)
+            slots = np.where(ordinals < self.capacity, ordinals,
+                             (self.rng.random(count) * (ordinals + 1)).astype(np.int64))
+        keep = slots < self.capacity
+        slots, seller_ids, ordinals = slots[keep], seller_ids[keep], ordinals[keep]
+        # Uma posição sorteada mais de uma vez no lote fica com o vendedor mais recente
+        reversed_slots = slots[::-1]
+        _, last = np.unique(reversed_slots, return_index=True)
+        last = len(slots) - 1 - last
+        self.ids[slots[last]] = seller_ids[last]
+        self.ordinals[slots[last]] = ordinals[last]
+        self.total += count
+        self.size = min(self.total, self.capacity)
+
+    def add_one(self, seller_id: int):
+        """
+        Registra um vendedor, com o mesmo resultado (e os mesmos sorteios) de
+        `add` com um único vendedor, sem o custo fixo das operações NumPy.
+
+        Parâmetros:
+        seller_id (int): seller_id numérico.
+        """
+        ordinal = self.total
+        if self.eviction == 'ring':
+            slot = ordinal % self.capacity
+        else:
+            # `add` sorteia um número por vendedor mesmo enquanto o registro não está cheio
+            draw = self.rng.random()
+            slot = ordinal if ordinal < self.capacity else int(draw * (ordinal + 1))
+        if slot < self.capacity:
+            self.ids[slot] = seller_id
+            self.ordinals[slot] = ordinal
+        self.total += 1
+        self.size = min(self.total, self.capacity)
+
+    def sample(self, n: int) -> np.ndarray:
+        """
+        Sorteia posições de vendedores registrados, em O(1) por sorteio.
+
+        Parâmetros:
+        n (int): Quantidade de sorteios.
+
+        Retorno:
+        ndarray: Posições sorteadas, para uso em `seller_ids` e `seller_names`.
+        """
+        if not self.size:
+            raise ValueError('Seller registry is empty')
+        if self.distribution == 'uniform':
+            return self.rng.integers(0, self.size, size=n)
+        prob, alias = alias_table(self.capacity, self.zipf_exponent)
+        slots = np.empty(n, dtype=np.int64)
+        pending = np.arange(n)
+        # Enquanto o registro não está cheio, descarta as posições ainda vazias
+        while len(pending):
+            drawn = self.rng.integers(0, self.capacity, size=len(pending))
+            drawn = np.where(self.rng.random(len(pending)) < prob[drawn], drawn, alias[drawn])
+            valid = drawn < self.size
+            slots[pending[valid]] = drawn[valid]
+            pending = pending[~valid]
+        return slots
+
+    def sample_one(self) -> int:
+        """
+        Sorteia a posição de um vendedor, com os mesmos sorteios de `sample(1)`,
+        sem o custo fixo das operações NumPy.
+
+        Retorno:
+        int: Posição sorteada.
+        """
+        if not self.size:
+            raise ValueError('Seller registry is empty')
+        if self.distribution == 'uniform':
+            return int(self.rng.integers(0, self.size))
+        if self._alias_lists is None:
+            prob, alias = alias_table(self.capacity, self.zipf_exponent)
+            self._alias_lists = prob.tolist(), alias.tolist()
+        prob, alias = self._alias_lists
+        while True:
+            drawn = int(self.rng.integers(0, self.capacity))
+            if not self.rng.random() < prob[drawn]:
+                drawn = alias[drawn]
+            if drawn < self.size:
+                return drawn
+
+    def seller_ids(self, slots: Optional[np.ndarray] = None) -> List[str]:
+        """
+        Formata os seller_ids das posições informadas.
+
+        Parâmetros:
+        slots (ndarray, opcional): Posições; se ausente, todos os vendedores registrados.
+
+        Retorno:
+        list: seller_ids como strings completadas com zeros à esquerda.
+        """
+        ids = self.ids[:self.size] if slots is None else self.ids[slots]
+        if len(ids) <= SMALL_BATCH:
+            # Poucos vendedores (ex.: as transações de um usuário): formatados sem o np.char
+            return [str(seller_id).zfill(self.id_length) for seller_id in ids.tolist()]
+        return np.char.zfill(ids.astype(str), self.id_length).tolist()
+
+    def seller_names(self, slots: np.ndarray) -> List[str]:
+        """
+        Monta os seller_names das posições informadas.
+
+        Parâmetros:
+        slots (ndarray): Posições dos vendedores.
+
+        Retorno:
+        list: Nomes no formato 'SELLER<ordinal>'.
+        """
+        return [f'{SELLER_NAME_PREFIX}{ordinal}' for ordinal in self.ordinals[slots].tolist()]
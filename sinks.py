@@ -0,0 +1,296 @@
+import json
+import logging
+from functools import lru_cache
+from json.encoder import encode_basestring
+from typing import Callable, List, Dict, Optional, Tuple, Union
+from data_generator import DataGenerator
+from pipeline import EncodedChunk
+from records import Records, Nested
+from compression import CompressedWriter, CompressingEncoder, check_codec
+
+# Tamanho do buffer de escrita dos arquivos de saída
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Formatos de arquivo suportados
+FILE_FORMATS = ('json', 'ndjson')
+
+
+def json_column(values: List, encoder: json.JSONEncoder) -> List[str]:
+    """
+    Serializa em JSON, de uma vez, os valores de uma coluna.
+
+    Colunas só de strings usam o escape em C do json; colunas numéricas são
+    serializadas como um único array. O resultado é idêntico ao de serializar
+    cada valor com `encoder`.
+
+    Parâmetros:
+    values (list): Valores da coluna.
+    encoder (JSONEncoder): Encoder compacto usado pelos demais tipos.
+
+    Retorno:
+    list: O texto JSON de cada valor.
+    """
+    kinds = set(map(type, values))
+    if kinds == {str}:
+        return list(map(encode_basestring, values))
+    if values and kinds <= {int, float}:
+        return encoder.encode(values)[1:-1].split(',')
+    return [encoder.encode(value) for value in values]
+
+
+@lru_cache(maxsize=32)
+def _json_row_builder(keys: Tuple[str, ...]) -> Callable[..., List[str]]:
+    """
+    Gera, com exec, a função que concatena os valores já serializados de cada
+    documento com as chaves `keys`, no layout compacto do json.
+    """
+    prefixes = [('{' if position == 0 else ',') + encode_basestring(key) + ':' for position, key in enumerate(keys)]
+    names = [f'v{position}' for position in range(len(keys))]
+    body = ' + '.join(f'{prefix!r} + {name}' for prefix, name in zip(prefixes, names))
+    source = (
+        f'def rows({", ".join(names)}):\n'
+        f'    return [{body} + "}}" for {", ".join(names)} in zip({", ".join(names)})]\n'
+    )
+    namespace = {}
+    exec(compile(source, '<json_rows>', 'exec'), namespace)
+    return namespace['rows']
+
+
+def json_rows(records: Records, encoder: json.JSONEncoder) -> List[str]:
+    """
+    Serializa documentos em colunas para JSON compacto, sem montar dicionários.
+
+    Parâmetros:
+    records (Records): Documentos em colunas.
+    encoder (JSONEncoder): Encoder compacto para os valores que não são strings nem números.
+
+    Retorno:
+    list: O texto de cada documento, idêntico a `encoder.encode(documento)`.
+    """
+    columns = []
+    for column in records.columns:
+        if isinstance(column, Nested):
+            items = json_rows(column.records, encoder)
+            columns.append(['[' + ','.join(items[start:end]) + ']' for start, end in zip(column.starts, column.ends)])
+        else:
+            columns.append(json_column(column, encoder))
+    return _json_row_builder(records.keys)(*columns)
+
+
+class JsonChunkEncoder:
+    def __init__(self, fmt: str = 'json', indent: Optional[int] = None):
+        """
+        Inicializa o serializador de chunks de usuários em JSON.
+
+        A instância é picklable, podendo ser enviada aos workers para que cada
+        chunk chegue ao processo principal já serializado.
+
+        Parâmetros:
+        fmt (str): 'json' para elementos de um array, 'ndjson' para um documento por linha.
+        indent (int, opcional): Indentação dos documentos; None para saída compacta.
+            Ignorado em 'ndjson', que é sempre compacto.
+        """
+        if fmt not in FILE_FORMATS:
+            raise ValueError(f'Unknown file format {fmt}')
+        self.fmt = fmt
+        self.indent = indent if fmt == 'json' else None
+        # Índice do chunk que abre o array; None quando o arquivo já foi iniciado (ver JsonFileSink)
+        self.first_index: Optional[int] = 0
+
+    @property
+    def positional(self) -> bool:
+        """
+        No formato 'json', cada chunk traz a abertura do array ou o separador,
+        conforme o seu índice; assim um chunk comprimido é um único membro.
+        """
+        return self.fmt == 'json'
+
+    def _encoder(self) -> json.JSONEncoder:
+        if self.indent is None:
+            # Sem indentação o json usa o encoder em C
+            return json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(',', ':'),
+                                    default=DataGenerator.json_serial)
+        return json.JSONEncoder(ensure_ascii=False, check_circular=False, indent=self.indent,
+                                default=DataGenerator.json_serial)
+
+    @property
+    def separator(self) -> str:
+        """
+        Separador entre documentos consecutivos no arquivo.
+        """
+        if self.fmt == 'ndjson':
+            return ''
+        return ',\n' + ' ' * self.indent if self.indent is not None else ','
+
+    @property
+    def opening(self) -> str:
+        """
+        Abertura do array, antes do primeiro documento do arquivo.
+        """
+        return '[\n' + ' ' * self.indent if self.indent is not None else '['
+
+    def __call__(self, users: Union[List[Dict], Records], index: Optional[int] = None) -> bytes:
+        """
+        Serializa um chunk de usuários.
+
+        Parâmetros:
+        users (list ou Records): Chunk de dicionários representando usuários, ou os
+            mesmos usuários em colunas, serializados sem dicionários intermediários.
+        index (int, opcional): Índice do chunk; no formato 'json', o chunk `first_index`
+            começa com a abertura do array e os demais com o separador.
+
+        Retorno:
+        bytes: Documentos em UTF-8; sem `index`, sem a abertura ou o separador inicial.
+        """
+        if index is not None and self.fmt == 'json':
+            prefix = self.opening if index == self.first_index else self.separator
+            return prefix.encode('utf-8') + self._documents(users)
+        return self._documents(users)
+
+    def _documents(self, users: Union[List[Dict], Records]) -> bytes:
+        if isinstance(users, Records):
+            if self.indent is None:
+                rows = json_rows(users, self._encoder())
+                if self.fmt == 'ndjson':
+                    return ''.join([row + '\n' for row in rows]).encode('utf-8')
+                return ','.join(rows).encode('utf-8')
+            users = users.to_dicts()
+        encode = self._encoder().encode
+        if self.fmt == 'ndjson':
+            return ''.join([encode(user) + '\n' for user in users]).encode('utf-8')
+        if self.indent is None:
+            # Um único encode do chunk inteiro, sem os colchetes
+            return encode(users)[1:-1].encode('utf-8')
+        # Reproduz o layout de json.dump(lista, indent=...): cada documento é
+        # deslocado um nível para dentro do array
+        pad = '\n' + ' ' * self.indent
+        return self.separator.join([encode(user).replace('\n', pad) for user in users]).encode('utf-8')
+
+
+class JsonFileSink:
+    # As datas chegam pré-formatadas em ISO 8601, dispensando o `default` do json
+    date_format = 'iso'
+
+    def __init__(self, file_path: str, fmt: str = 'json', indent: Optional[int] = None,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, offset: Optional[int] = None, count: int = 0,
+                 compress: Optional[str] = None, level: Optional[int] = None):
+        """
+        Inicializa um destino que grava chunks de usuários em um arquivo JSON ou NDJSON.
+
+        Com `compress`, cada chunk é comprimido junto com a serialização (nos
+        workers) e gravado como um membro independente do arquivo, com um
+        índice dos membros ao lado (ver `CompressedWriter`).
+
+        Parâmetros:
+        file_path (str): Caminho do arquivo de saída.
+        fmt (str): 'json' para um único array JSON válido, 'ndjson' para um documento por linha.
+        indent (int, opcional): Indentação do JSON; None para saída compacta.
+        buffer_size (int): Tamanho do buffer de escrita, em bytes.
+        offset (int, opcional): Para retomar uma gravação interrompida: posição, obtida de
+            `tell`, após o último chunk gravado; o que vier depois é descartado.
+        count (int): Usuários já gravados até `offset`.
+        compress (str, opcional): Codec de compressão ('gzip', 'bz2', 'xz' ou 'zstd').
+        level (int, opcional): Nível de compressão.
+        """
+        self.file_path = file_path
+        self.json_encoder = JsonChunkEncoder(fmt, indent)
+        self.encoder = self.json_encoder
+        self.compress = compress
+        self.level = level
+        if compress is not None:
+            check_codec(compress)
+            self.encoder = CompressingEncoder(self.json_encoder, compress, level)
+        self.buffer_size = buffer_size
+        self.offset = offset
+        self.count = count if offset is not None else 0
+        if self.count:
+            # Arquivo retomado: o array já foi aberto, e todo chunk começa com o separador
+            self.json_encoder.first_index = None
+        self.bytes_written = 0
+        self._file = None
+
+    @property
+    def first_chunk(self) -> Optional[int]:
+        """
+        Índice do chunk que abre o array JSON no arquivo (o primeiro do plano ou do
+        shard); None ao continuar um arquivo já iniciado.
+        """
+        return self.json_encoder.first_index
+
+    @first_chunk.setter
+    def first_chunk(self, index: int):
+        if not self.count:
+            self.json_encoder.first_index = index
+
+    def open(self):
+        """
+        Abre o arquivo. No formato 'json', a abertura do array e os separadores
+        vêm no início de cada chunk (ver `JsonChunkEncoder`).
+
+        Ao retomar (com `offset`), o arquivo é truncado em `offset` e a escrita continua a partir dali.
+        """
+        if self.compress is not None:
+            self._file = CompressedWriter(self.file_path, self.compress, self.level, self.buffer_size, self.offset)
+        elif self.offset is not None:
+            self._file = open(self.file_path, 'r+b', buffering=self.buffer_size)
+            self._file.truncate(self.offset)
+            self._file.seek(self.offset)
+        else:
+            self._file = open(self.file_path, 'wb', buffering=self.buffer_size)
+
+    @property
+    def checkpoint_key(self) -> str:
+        """
+        Chave do destino no manifesto de checkpoint.
+        """
+        return f'file:{self.file_path}'
+
+    def tell(self) -> int:
+        """
+        Descarrega o buffer e retorna a posição atual no arquivo.
+
+        Retorno:
+        int: Posição após o último chunk escrito, usada como `offset` ao retomar.
+        """
+        self._file.flush()
+        return self._file.tell()
+
+    def write(self, chunk: Union[List[Dict], EncodedChunk]):
+        """
+        Escreve um chunk de usuários no arquivo.
+
+        Parâmetros:
+        chunk (list ou EncodedChunk): Chunk de usuários, ou chunk já serializado por `self.encoder`.
+        """
+        if not len(chunk):
+            return
+        if not isinstance(chunk, EncodedChunk):
+            # Chunk local: abre o array se for o primeiro do arquivo
+            index = self.first_chunk if not self.count else -1
+            chunk = EncodedChunk(-1, len(chunk), self.encoder(chunk, index))
+        self.bytes_written += self._file.write(chunk.payload)
+        self.count += chunk.count
+
+    def close(self):
+        """
+        Fecha o array, quando houver, e o arquivo.
+        """
+        if self._file is None:
+            return
+        if self.json_encoder.fmt == 'json':
+            # Um único write, que no arquivo comprimido vira um único membro
+            if not self.count:
+                closing = b'[]'
+            else:
+                closing = b'\n]' if self.json_encoder.indent is not None else b']'
+            self.bytes_written += self._file.write(closing)
+        self._file.close()
+        self._file = None
+        logging.info(f'Wrote {self.count} users to {self.file_path}')
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
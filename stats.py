@@ -0,0 +1,255 @@
+import cProfile
+import io
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, TextIO
+
+# Intervalo, em segundos, entre os resumos exibidos em execuções sem terminal
+DEFAULT_SUMMARY_INTERVAL = 10.0
+
+# Limites superiores das faixas dos histogramas de latência: 0,1 ms a ~28 min, dobrando
+LATENCY_BUCKETS = tuple(0.0001 * 2 ** k for k in range(25))
+
+
+class Histogram:
+    def __init__(self):
+        """
+        Inicializa um histograma de latências com faixas exponenciais fixas.
+        """
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        """
+        Registra uma latência.
+
+        Parâmetros:
+        seconds (float): Duração, em segundos.
+        """
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """
+        Estima um percentil pelo limite superior da faixa que o contém.
+
+        Parâmetros:
+        q (float): Percentil, entre 0 e 100.
+
+        Retorno:
+        float: Latência estimada, em segundos (limitada ao máximo observado).
+        """
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                upper = LATENCY_BUCKETS[bucket] if bucket < len(LATENCY_BUCKETS) else self.max
+                return min(upper, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': {f'le_{upper:g}': count for upper, count in zip(LATENCY_BUCKETS + (float('inf'),), self.buckets)
+                        if count},
+        }
+
+
+class RunStats:
+    def __init__(self):
+        """
+        Inicializa as estatísticas de uma execução: tempo acumulado por etapa,
+        contadores e histogramas de latência.
+
+        As etapas medidas são 'generate' e 'encode' (nos workers, informadas com
+        cada chunk), 'queue_wait' (o destino aguardando a geração), 'queue_full'
+        (a geração aguardando o destino) e 'write' ou 'insert' (gravação).
+        Pode ser usada por várias threads.
+        """
+        self.started = time.perf_counter()
+        self.finished = None
+        self.timers = defaultdict(float)
+        self.counters = Counter()
+        self.histograms = defaultdict(Histogram)
+        # Seções adicionais do relatório (ex.: 'stream'), gravadas como estão
+        self.sections = {}
+        self._lock = threading.Lock()
+
+    def add_time(self, stage: str, seconds: float, histogram: bool = False):
+        """
+        Acumula o tempo gasto em uma etapa.
+
+        Parâmetros:
+        stage (str): Nome da etapa.
+        seconds (float): Duração, em segundos.
+        histogram (bool): Se True, registra a duração também no histograma da etapa.
+        """
+        with self._lock:
+            self.timers[stage] += seconds
+            if histogram:
+                self.histograms[stage].record(seconds)
+
+    @contextmanager
+    def timer(self, stage: str, histogram: bool = False) -> Iterator[None]:
+        """
+        Mede o bloco como tempo gasto na etapa `stage`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start, histogram)
+
+    def count(self, name: str, n: int = 1):
+        """
+        Incrementa um contador (ex.: 'users', 'bytes').
+        """
+        with self._lock:
+            self.counters[name] += n
+
+    def add_chunk(self, chunk):
+        """
+        Contabiliza um chunk recebido da geração, com os tempos medidos no worker.
+
+        Parâmetros:
+        chunk (UserChunk ou EncodedChunk): Chunk gerado.
+        """
+        for stage, seconds in (getattr(chunk, 'timings', None) or {}).items():
+            self.add_time(stage, seconds, histogram=True)
+        self.count('chunks')
+        self.count('users', len(chunk))
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def finish(self):
+        """
+        Marca o fim da execução.
+        """
+        self.finished = time.perf_counter()
+
+    def summary(self, total: Optional[int] = None) -> str:
+        """
+        Resume o andamento em uma linha.
+
+        Parâmetros:
+        total (int, opcional): Total de usuários esperado, para exibir a porcentagem.
+
+        Retorno:
+        str: Resumo com usuários, vazão, tempo por etapa e bytes gravados.
+        """
+        with self._lock:
+            users = self.counters['users']
+            timers = dict(self.timers)
+            written = self.counters['bytes']
+        elapsed = self.elapsed
+        progress = f'{users}/{total} ({users / total:.1%})' if total else str(users)
+        rate = users / elapsed if elapsed else 0.0
+        stages = ' '.join(f'{stage}={seconds:.1f}s' for stage, seconds in timers.items())
+        return f'[{elapsed:.1f}s] users {progress} {rate:,.0f} users/s | {stages} | {written / 1e6:.1f} MB'
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            elapsed = self.elapsed
+            return {
+                'elapsed': elapsed,
+                'stages': dict(self.timers),
+                'counters': dict(self.counters),
+                'rates': {f'{name}_per_sec': value / elapsed for name, value in self.counters.items() if elapsed},
+                'latency': {stage: histogram.to_dict() for stage, histogram in self.histograms.items()},
+                **self.sections,
+            }
+
+    def write(self, path: str):
+        """
+        Grava o relatório da execução em JSON.
+
+        Parâmetros:
+        path (str): Arquivo de destino.
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        logging.info(f'Run statistics written to {path}')
+
+
+class LiveSummary:
+    def __init__(self, stats: RunStats, total: Optional[int] = None, interval: float = DEFAULT_SUMMARY_INTERVAL,
+                 stream: TextIO = None):
+        """
+        Substitui a barra de progresso em execuções sem terminal: escreve
+        `RunStats.summary` a cada `interval` segundos, em vez de redesenhar a barra.
+
+        Parâmetros:
+        stats (RunStats): Estatísticas da execução.
+        total (int, opcional): Total de usuários esperado.
+        interval (float): Intervalo mínimo, em segundos, entre os resumos.
+        stream (TextIO, opcional): Destino dos resumos; padrão sys.stderr.
+        """
+        self.stats = stats
+        self.total = total
+        self.interval = interval
+        self.stream = stream if stream is not None else sys.stderr
+        self._last = time.perf_counter()
+
+    def update(self, n: int = 1):
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            print(self.stats.summary(self.total), file=self.stream, flush=True)
+
+    def close(self):
+        print(self.stats.summary(self.total), file=self.stream, flush=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+@contextmanager
+def profiled(path: Optional[str], top: int = 25) -> Iterator[None]:
+    """
+    Executa o bloco sob o cProfile, gravando o perfil em `path` e as funções
+    mais custosas no log. Apenas o processo principal é medido.
+
+    Parâmetros:
+    path (str, opcional): Arquivo do perfil (legível por pstats/snakeviz); None desativa.
+    top (int): Quantidade de funções listadas no log.
+    """
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(top)
+        logging.info(f'Profile written to {path}\n{report.getvalue()}')
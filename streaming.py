@@ -0,0 +1,614 @@
+import asyncio
+import logging
+import math
+import sys
+import time
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, TextIO, Tuple, Union
+import numpy as np
+from data_generator import DataGenerator
+from pipeline import EncodedChunk, generate_chunks, aprefetch, resolve_seed, DEFAULT_CHUNK_SIZE, DEFAULT_QUEUE_SIZE
+from records import Records
+from sinks import JsonChunkEncoder
+from stats import RunStats, DEFAULT_SUMMARY_INTERVAL
+from time_window import to_timestamp
+
+# Eventos que podem ser emitidos: usuários inteiros ou transações avulsas
+STREAM_UNITS = ('users', 'transactions')
+
+# Eventos por micro-lote, no máximo
+DEFAULT_MAX_BATCH = 1000
+
+# Intervalo mínimo, em segundos, entre micro-lotes: em taxas altas os tokens
+# acumulados nesse intervalo saem juntos, em vez de um evento por despertar
+DEFAULT_TICK = 0.001
+
+# Atraso, em segundos de eventos na taxa alvo, que ainda é recuperado depois de uma pausa
+DEFAULT_BURST_SECONDS = 1.0
+
+# Coleção das transações emitidas avulsas no MongoDB
+DEFAULT_TRANSACTIONS_COLLECTION = 'transactions'
+
+
+class RateProfile:
+    def __init__(self, rate: float, ramp: float = 0.0, start_rate: float = 0.0):
+        """
+        Perfil da taxa de eventos ao longo do tempo: uma rampa linear de
+        `start_rate` até `rate` em `ramp` segundos, e depois a taxa constante.
+
+        Parâmetros:
+        rate (float): Taxa alvo, em eventos por segundo.
+        ramp (float): Duração da rampa, em segundos; 0 começa direto em `rate`.
+        start_rate (float): Taxa no início da rampa.
+
+        Lança:
+        ValueError: Se a taxa alvo não for positiva, ou a rampa ou a taxa inicial forem negativas.
+        """
+        if not rate > 0:
+            raise ValueError(f'The rate must be positive, got {rate}')
+        if ramp < 0 or start_rate < 0:
+            raise ValueError('The ramp and its start rate cannot be negative')
+        self.rate = float(rate)
+        self.ramp = float(ramp)
+        self.start_rate = float(start_rate) if ramp else self.rate
+
+    @property
+    def _slope(self) -> float:
+        return (self.rate - self.start_rate) / self.ramp if self.ramp else 0.0
+
+    def rate_at(self, t: float) -> float:
+        """
+        Taxa, em eventos por segundo, `t` segundos após o início.
+        """
+        if t >= self.ramp:
+            return self.rate
+        return self.start_rate + self._slope * max(t, 0.0)
+
+    def allowed(self, t: float) -> float:
+        """
+        Eventos permitidos desde o início até `t` segundos (a integral da taxa).
+        """
+        t = max(t, 0.0)
+        ramp = min(t, self.ramp)
+        return self.start_rate * ramp + self._slope * ramp * ramp / 2 + self.rate * (t - ramp)
+
+    def time_of(self, events: float) -> float:
+        """
+        Instante, em segundos após o início, em que o evento de número `events` é devido.
+        Inversa de `allowed`.
+        """
+        if events <= 0:
+            return 0.0
+        in_ramp = self.allowed(self.ramp)
+        if events >= in_ramp:
+            return self.ramp + (events - in_ramp) / self.rate
+        a, b = self._slope / 2, self.start_rate
+        if abs(a) < 1e-12:
+            return events / b
+        # Raiz de a·t² + b·t = events na forma estável para a de qualquer sinal
+        return 2 * events / (b + math.sqrt(b * b + 4 * a * events))
+
+
+class TokenBucket:
+    def __init__(self, profile: RateProfile, burst: Optional[float] = None, tick: float = DEFAULT_TICK,
+                 clock: Callable[[], float] = time.perf_counter):
+        """
+        Token bucket que libera eventos segundo um RateProfile.
+
+        Os tokens não são somados a cada despertar, o que acumularia os erros
+        do relógio: o total liberado até o instante t é sempre
+        `profile.allowed(t)`, contado a partir de um início fixo. Assim um
+        despertar atrasado é compensado no seguinte e a taxa média não deriva.
+        Um atraso maior que `burst` tokens não é recuperado: o excesso é
+        descartado e contado em `dropped`.
+
+        Parâmetros:
+        profile (RateProfile): Taxa ao longo do tempo.
+        burst (float, opcional): Tokens acumuláveis; padrão DEFAULT_BURST_SECONDS na taxa alvo.
+        tick (float): Intervalo mínimo, em segundos, entre micro-lotes.
+        clock (Callable): Relógio monotônico, em segundos.
+        """
+        self.profile = profile
+        self.burst = burst if burst is not None else max(1.0, profile.rate * DEFAULT_BURST_SECONDS)
+        self.tick = tick
+        self.clock = clock
+        self.started = None
+        self.granted = 0.0
+        self.dropped = 0.0
+
+    def start(self):
+        """
+        Fixa o início do perfil de taxa.
+        """
+        self.started = self.clock()
+        self.granted = 0.0
+        self.dropped = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        return self.clock() - self.started if self.started is not None else 0.0
+
+    def available(self) -> float:
+        """
+        Tokens disponíveis agora, após descartar o que exceder `burst`.
+        """
+        available = self.profile.allowed(self.elapsed) - self.granted
+        if available > self.burst:
+            self.dropped += available - self.burst
+            self.granted += available - self.burst
+            available = self.burst
+        return available
+
+    def due(self) -> float:
+        """
+        Instante do relógio em que o último token concedido era devido.
+        """
+        return self.started + self.profile.time_of(self.granted)
+
+    async def take(self, max_tokens: int) -> int:
+        """
+        Aguarda e retira de 1 a `max_tokens` tokens: todos os disponíveis, até o limite.
+
+        Parâmetros:
+        max_tokens (int): Tamanho máximo do micro-lote.
+
+        Retorno:
+        int: Tokens retirados.
+        """
+        if self.started is None:
+            self.start()
+        while True:
+            available = int(self.available())
+            if available >= 1:
+                taken = min(available, max_tokens)
+                self.granted += taken
+                return taken
+            delay = self.started + self.profile.time_of(self.granted + 1) - self.clock()
+            await asyncio.sleep(max(delay, self.tick))
+
+
+def stream_documents(users: List[Dict], unit: str = 'users') -> List[Dict]:
+    """
+    Converte um chunk de usuários nos eventos emitidos.
+
+    Parâmetros:
+    users (list): Usuários gerados.
+    unit (str): 'users' para um evento por usuário; 'transactions' para um por
+        transação, com o consumer_id do usuário.
+
+    Retorno:
+    list: Documentos dos eventos, na ordem dos usuários.
+    """
+    if unit == 'users':
+        return list(users)
+    if unit == 'transactions':
+        return [{'consumer_id': user['consumer_id'], **transaction}
+                for user in users for transaction in user['transactions']]
+    raise ValueError(f'Unknown stream unit {unit}')
+
+
+def stream_records(users: Records, unit: str = 'users') -> Records:
+    """
+    Versão em colunas de `stream_documents`.
+
+    Parâmetros:
+    users (Records): Usuários gerados, com as transações de cada um contíguas.
+    unit (str): Um de STREAM_UNITS.
+
+    Retorno:
+    Records: Os eventos, na ordem dos usuários.
+    """
+    if unit == 'users':
+        return users
+    if unit != 'transactions':
+        raise ValueError(f'Unknown stream unit {unit}')
+    transactions = users.column('transactions')
+    consumers = [consumer for consumer, start, end in
+                 zip(users.column('consumer_id'), transactions.starts, transactions.ends)
+                 for _ in range(end - start)]
+    items = transactions.records
+    return Records(('consumer_id',) + items.keys, [consumers] + items.columns, len(consumers))
+
+
+class EventEncoder:
+    """
+    Serializa os eventos de um chunk, um buffer por evento, para que cada
+    micro-lote seja apenas a junção dos buffers. É picklable e roda junto com
+    a geração (nos workers), fora do loop asyncio.
+    """
+
+    def __init__(self, unit: str = 'users', fmt: str = 'ndjson'):
+        """
+        Parâmetros:
+        unit (str): Um de STREAM_UNITS.
+        fmt (str): 'ndjson' para uma linha JSON por evento, 'bson' para um documento BSON.
+        """
+        if unit not in STREAM_UNITS:
+            raise ValueError(f'Unknown stream unit {unit}')
+        if fmt not in ('ndjson', 'bson'):
+            raise ValueError(f'Unknown stream format {fmt}')
+        self.unit = unit
+        self.fmt = fmt
+
+    def __call__(self, users: Union[List[Dict], Records]) -> List[bytes]:
+        if isinstance(users, Records):
+            events = stream_records(users, self.unit)
+        else:
+            events = stream_documents(users, self.unit)
+        if self.fmt == 'bson':
+            from mongodb_handler import BsonChunkEncoder
+            return BsonChunkEncoder()(events)
+        # O JSON escapa as quebras de linha dos textos: cada linha é um evento
+        return JsonChunkEncoder('ndjson')(events).splitlines(keepends=True)
+
+
+class EventSource:
+    def __init__(self, chunks: AsyncIterator, unit: str = 'users'):
+        """
+        Fila de eventos alimentada por chunks de usuários gerados em segundo plano.
+
+        Parâmetros:
+        chunks (AsyncIterator): Chunks de usuários, normalmente `stream_chunks`; os chunks
+            serializados por um EventEncoder já trazem um item por evento.
+        unit (str): Um de STREAM_UNITS, para os chunks de dicionários.
+        """
+        if unit not in STREAM_UNITS:
+            raise ValueError(f'Unknown stream unit {unit}')
+        self.chunks = chunks
+        self.unit = unit
+        self.exhausted = False
+        self._events = []
+        self._position = 0
+
+    async def _fill(self) -> bool:
+        while self._position >= len(self._events):
+            try:
+                chunk = await self.chunks.__anext__()
+            except StopAsyncIteration:
+                self.exhausted = True
+                return False
+            if isinstance(chunk, EncodedChunk):
+                self._events = chunk.payload
+            else:
+                self._events = stream_documents(chunk, self.unit)
+            self._position = 0
+        return True
+
+    async def prime(self) -> bool:
+        """
+        Aguarda o primeiro chunk, para que a geração inicial não conte como atraso.
+
+        Retorno:
+        bool: False se a fonte não tiver eventos.
+        """
+        return await self._fill()
+
+    async def take(self, n: int) -> List[Dict]:
+        """
+        Retira até `n` eventos; menos apenas se a fonte se esgotar.
+        """
+        batch = []
+        while len(batch) < n and await self._fill():
+            end = self._position + n - len(batch)
+            batch.extend(self._events[self._position:end])
+            self._position = min(end, len(self._events))
+        return batch
+
+    async def aclose(self):
+        await self.chunks.aclose()
+
+
+class StdoutTarget:
+    # Texto NDJSON: datas em ISO 8601
+    date_format = 'iso'
+    concurrency = 1
+
+    def __init__(self, unit: str = 'users', stream=None):
+        """
+        Emite os eventos em NDJSON, um micro-lote por escrita.
+
+        Parâmetros:
+        unit (str): Um de STREAM_UNITS.
+        stream (opcional): Arquivo binário de destino; padrão sys.stdout.buffer.
+        """
+        self.stream = stream
+        self.encoder = EventEncoder(unit, 'ndjson')
+
+    async def open(self):
+        if self.stream is None:
+            self.stream = sys.stdout.buffer
+
+    async def send(self, events: List[bytes]) -> int:
+        data = b''.join(events)
+        self.stream.write(data)
+        self.stream.flush()
+        return len(data)
+
+    async def close(self):
+        pass
+
+
+class SocketTarget:
+    date_format = 'iso'
+    concurrency = 1
+
+    def __init__(self, address: str, unit: str = 'users'):
+        """
+        Emite os eventos em NDJSON por uma conexão TCP ('host:porta') ou um
+        socket Unix (caminho do arquivo).
+
+        Parâmetros:
+        address (str): Endereço do socket.
+        unit (str): Um de STREAM_UNITS.
+        """
+        self.address = address
+        self.encoder = EventEncoder(unit, 'ndjson')
+        self._writer = None
+
+    @staticmethod
+    def parse_address(address: str) -> Tuple[Optional[str], Optional[int], Optional[str]]:
+        """
+        Interpreta o endereço do socket.
+
+        Retorno:
+        tuple: (host, porta, None) para TCP ou (None, None, caminho) para um socket Unix.
+        """
+        host, _, port = address.rpartition(':')
+        if host and port.isdigit() and '/' not in address:
+            return host.strip('[]'), int(port), None
+        return None, None, address
+
+    async def open(self):
+        host, port, path = self.parse_address(self.address)
+        if path is not None:
+            _, self._writer = await asyncio.open_unix_connection(path)
+        else:
+            _, self._writer = await asyncio.open_connection(host, port)
+        logging.info(f'Connected to {self.address}')
+
+    async def send(self, events: List[bytes]) -> int:
+        data = b''.join(events)
+        self._writer.write(data)
+        # Contrapressão: aguarda o buffer do socket esvaziar
+        await self._writer.drain()
+        return len(data)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+
+class MongoTarget:
+    date_format = 'datetime'
+
+    def __init__(self, handler, unit: str = 'users', concurrency: int = 1):
+        """
+        Insere cada micro-lote com um insert_many sem ordem. Os eventos chegam
+        codificados em BSON pela geração e são enviados sem nova codificação.
+
+        Parâmetros:
+        handler (MongoDBHandler): Handler da coleção de destino, já conectado.
+        unit (str): Um de STREAM_UNITS.
+        concurrency (int): Micro-lotes em andamento ao mesmo tempo.
+        """
+        self.handler = handler
+        self.concurrency = concurrency
+        self.encoder = EventEncoder(unit, 'bson')
+
+    async def open(self):
+        pass
+
+    async def send(self, events: List[bytes]) -> int:
+        from bson.raw_bson import RawBSONDocument
+        await self.handler.coll.insert_many([RawBSONDocument(raw) for raw in events], ordered=False)
+        return sum(map(len, events))
+
+    async def close(self):
+        pass
+
+
+def cycle_seed(seed: int, cycle: int) -> int:
+    """
+    Semente do ciclo `cycle` de uma transmissão: a própria `seed` no primeiro
+    ciclo e, nos seguintes, uma semente derivada, que muda a chave dos IDs.
+    """
+    if not cycle:
+        return seed
+    return int(np.random.SeedSequence([seed, cycle]).generate_state(1, np.uint64)[0] % 2 ** 63)
+
+
+def _cycles(config: dict, chunk_size: int, seed: int, workers: int, date_format: str,
+            encoder: Optional[EventEncoder], reference_time: int) -> Iterator:
+    cycle_users = DataGenerator.max_users(config)
+    cycle = 0
+    while True:
+        if cycle:
+            logging.info(f'Stream used {cycle * cycle_users} users; restarting the id sequences with a new key')
+        yield from generate_chunks(config, cycle_users, chunk_size, cycle_seed(seed, cycle), workers,
+                                   date_format=date_format, encoder=encoder, reference_time=reference_time)
+        cycle += 1
+
+
+def stream_chunks(config: dict, limit: Optional[int] = None, unit: str = 'users',
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, seed: Optional[int] = None, workers: int = 1,
+                  date_format: str = 'datetime', encoder: Optional[EventEncoder] = None, reference_time=None,
+                  stats: Optional[RunStats] = None) -> AsyncIterator:
+    """
+    Gera, em segundo plano, os usuários de uma transmissão.
+
+    Com `limit` de usuários, a execução tem exatamente esse tamanho, com IDs
+    únicos (o seller_id é alargado como em DataGenerator.config_for). Sem
+    limite, ou quando os eventos são transações, a geração não termina: a cada
+    DataGenerator.max_users usuários as sequências de IDs recomeçam com uma
+    nova chave (`cycle_seed`), e os IDs são únicos dentro de cada ciclo.
+
+    Parâmetros:
+    config (dict): Dicionário de configuração carregado do arquivo config.json.
+    limit (int, opcional): Total de eventos; limita os usuários gerados quando os eventos são usuários.
+    unit (str): Um de STREAM_UNITS.
+    chunk_size (int): Usuários por chunk gerado.
+    seed (int, opcional): Semente global.
+    workers (int): Número de processos geradores.
+    date_format (str): Formato das datas ('datetime' ou 'iso').
+    encoder (EventEncoder, opcional): Serializador dos eventos do destino, aplicado nos workers.
+    reference_time (opcional): Fim da janela de datas das transações.
+    stats (RunStats, opcional): Estatísticas da execução.
+
+    Retorno:
+    AsyncIterator: Chunks de usuários, ou EncodedChunk com um item por evento se houver `encoder`.
+
+    Lança:
+    ValueError: Se `limit` usuários não couberem nos IDs únicos (ver DataGenerator.config_for).
+    """
+    seed = resolve_seed(seed)
+    # Fixada uma única vez, para que todos os ciclos usem a mesma janela de datas
+    reference_time = to_timestamp(reference_time)
+    if limit is not None and unit == 'users':
+        # Valida o limite já aqui, antes de a transmissão começar
+        DataGenerator.config_for(config, limit)
+        chunks = generate_chunks(config, limit, chunk_size, seed, workers, date_format=date_format,
+                                 encoder=encoder, reference_time=reference_time)
+    else:
+        chunks = _cycles(config, chunk_size, seed, workers, date_format, encoder, reference_time)
+    return aprefetch(chunks, DEFAULT_QUEUE_SIZE, stats)
+
+
+def stream_summary(stats: RunStats, bucket: TokenBucket) -> str:
+    """
+    Resume o andamento de uma transmissão em uma linha.
+    """
+    elapsed = bucket.elapsed
+    events = stats.counters['events']
+    rate = events / elapsed if elapsed else 0.0
+    target = bucket.profile.rate_at(elapsed)
+    send = stats.histograms['send'].percentile(99) * 1000
+    lag = stats.histograms['lag'].percentile(99) * 1000
+    return (f'[{elapsed:.1f}s] events {events} {rate:,.0f}/s (target {target:,.0f}/s) | '
+            f'send p99 {send:.1f} ms | lag p99 {lag:.1f} ms | errors {stats.counters["errors"]}')
+
+
+def stream_report(stats: RunStats, bucket: TokenBucket) -> Dict:
+    """
+    Compara a taxa alcançada com a pedida ao fim de uma transmissão.
+
+    Retorno:
+    dict: Eventos enviados e esperados pelo perfil no mesmo tempo, taxas alvo
+        e alcançada, tokens descartados, erros e latências (em segundos) dos
+        envios ('send') e do atraso dos micro-lotes em relação ao perfil ('lag').
+    """
+    elapsed = bucket.elapsed
+    events = stats.counters['events']
+    expected = bucket.profile.allowed(elapsed)
+    send, lag = stats.histograms['send'].to_dict(), stats.histograms['lag'].to_dict()
+    return {
+        'elapsed': elapsed,
+        'events': events,
+        'expected_events': int(expected),
+        'target_rate': bucket.profile.rate,
+        'expected_rate': expected / elapsed if elapsed else 0.0,
+        'achieved_rate': events / elapsed if elapsed else 0.0,
+        'achieved_ratio': events / expected if expected else 0.0,
+        'dropped': int(bucket.dropped),
+        'batches': stats.counters['batches'],
+        'errors': stats.counters['errors'],
+        'send': {key: send[key] for key in ('mean', 'p50', 'p90', 'p99', 'max')},
+        'lag': {key: lag[key] for key in ('mean', 'p50', 'p90', 'p99', 'max')},
+    }
+
+
+async def stream(source: EventSource, target, bucket: TokenBucket, max_batch: int = DEFAULT_MAX_BATCH,
+                 duration: Optional[float] = None, limit: Optional[int] = None,
+                 stats: Optional[RunStats] = None, stop: Optional[asyncio.Event] = None,
+                 summary_interval: Optional[float] = DEFAULT_SUMMARY_INTERVAL,
+                 summary_stream: Optional[TextIO] = None) -> Dict:
+    """
+    Emite eventos no ritmo do token bucket até o fim da duração, do limite,
+    da fonte ou de `stop`.
+
+    Cada micro-lote leva os tokens disponíveis no momento (até `max_batch`);
+    até `target.concurrency` micro-lotes são enviados ao mesmo tempo. Falhas de
+    envio são contadas em 'errors' e não interrompem a transmissão.
+
+    Parâmetros:
+    source (EventSource): Fonte dos eventos.
+    target: Destino (StdoutTarget, SocketTarget ou MongoTarget), já aberto.
+    bucket (TokenBucket): Limitador da taxa; iniciado aqui, após o primeiro chunk.
+    max_batch (int): Eventos por micro-lote, no máximo.
+    duration (float, opcional): Duração, em segundos.
+    limit (int, opcional): Total de eventos.
+    stats (RunStats, opcional): Recebe os contadores 'events', 'batches', 'errors' e 'bytes'
+        e os histogramas 'send' e 'lag'.
+    stop (asyncio.Event, opcional): Encerra a transmissão quando sinalizado.
+    summary_interval (float, opcional): Segundos entre os resumos de andamento; None não os exibe.
+    summary_stream (TextIO, opcional): Destino dos resumos; padrão sys.stderr.
+
+    Retorno:
+    dict: O relatório de `stream_report`.
+    """
+    stats = stats if stats is not None else RunStats()
+    stop = stop if stop is not None else asyncio.Event()
+    summary_stream = summary_stream if summary_stream is not None else sys.stderr
+    slots = asyncio.Semaphore(target.concurrency)
+    pending = set()
+    taken = 0
+
+    async def send(batch):
+        started = time.perf_counter()
+        try:
+            written = await target.send(batch)
+        except Exception as e:
+            if not stats.counters['errors']:
+                logging.error(f'Error sending {len(batch)} events: {e}')
+            stats.count('errors')
+        else:
+            stats.count('events', len(batch))
+            stats.count('bytes', written or 0)
+        finally:
+            stats.add_time('send', time.perf_counter() - started, histogram=True)
+            slots.release()
+
+    if not await source.prime():
+        bucket.start()
+        return stream_report(stats, bucket)
+    bucket.start()
+    last_summary = bucket.clock()
+    try:
+        while not stop.is_set():
+            if duration is not None and bucket.elapsed >= duration:
+                break
+            size = max_batch if limit is None else min(max_batch, limit - taken)
+            if size <= 0:
+                break
+            size = await bucket.take(size)
+            batch = await source.take(size)
+            if not batch:
+                break
+            taken += len(batch)
+            await slots.acquire()
+            stats.add_time('lag', max(bucket.clock() - bucket.due(), 0.0), histogram=True)
+            stats.count('batches')
+            task = asyncio.ensure_future(send(batch))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            if summary_interval is not None and bucket.clock() - last_summary >= summary_interval:
+                last_summary = bucket.clock()
+                print(stream_summary(stats, bucket), file=summary_stream, flush=True)
+    finally:
+        if pending:
+            await asyncio.gather(*pending)
+    report = stream_report(stats, bucket)
+    logging.info(f'Stream finished: {report}')
+    return report
+
+
+def format_report(report: Dict) -> str:
+    """
+    Resume em uma linha o relatório de `stream_report`, com as latências em milissegundos.
+    """
+    send, lag = report['send'], report['lag']
+    return (f"{report['events']} events in {report['elapsed']:.1f}s: {report['achieved_rate']:,.0f}/s achieved, "
+            f"{report['expected_rate']:,.0f}/s expected ({report['achieved_ratio']:.1%}), "
+            f"target {report['target_rate']:,.0f}/s | send p50 {send['p50'] * 1000:.1f} ms "
+            f"p99 {send['p99'] * 1000:.1f} ms max {send['max'] * 1000:.1f} ms | "
+            f"lag p99 {lag['p99'] * 1000:.1f} ms | dropped {report['dropped']} | errors {report['errors']}")
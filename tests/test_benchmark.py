@@ -0,0 +1,56 @@
+import unittest
+import unittest.mock
+import json
+import os
+import tempfile
+import benchmark
+
+class TestBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD']
+        }
+
+    def test_run_benchmarks(self):
+        results = benchmark.run_benchmarks(self.config, users=20, repeat=1)
+        self.assertEqual(set(results['benchmarks']), set(benchmark.BENCHMARKS))
+        sink = results['benchmarks']['json_sink']
+        self.assertGreater(sink['users_per_sec'], 0)
+        self.assertGreater(sink['bytes_per_sec'], 0)
+        self.assertGreater(sink['peak_rss_mb'], 0)
+        self.assertIn('calls_per_sec', results['benchmarks']['create_number'])
+
+    def test_peak_memory_is_per_benchmark(self):
+        results = benchmark.run_benchmarks(self.config, users=50_000, repeat=1,
+                                           names=['generate_users_batch', 'generate_transactions'])
+        # Rodando depois de um benchmark pesado, o pico do leve continua sendo só o dele
+        self.assertLess(results['benchmarks']['generate_transactions']['peak_rss_mb'],
+                        results['benchmarks']['generate_users_batch']['peak_rss_mb'])
+
+    def test_compare(self):
+        baseline = {'benchmarks': {'json_sink': {'users_per_sec': 100.0, 'seconds': 1.0, 'peak_rss_mb': 10}}}
+        results = {'benchmarks': {'json_sink': {'users_per_sec': 85.0, 'seconds': 2.0, 'peak_rss_mb': 20}}}
+        self.assertEqual(benchmark.compare(results, baseline, threshold=20), [])
+        regressions = benchmark.compare(results, baseline, threshold=10)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith('json_sink.users_per_sec'))
+
+    def test_main_fails_on_regression(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, 'config.json')
+            baseline_path = os.path.join(directory, 'baseline.json')
+            with open(config_path, 'w', encoding='utf-8') as f:
+                json.dump(self.config, f)
+            with open(baseline_path, 'w', encoding='utf-8') as f:
+                json.dump({'benchmarks': {'generate_users_batch': {'users_per_sec': float('1e12')}}}, f)
+            argv = ['--config', config_path, '--users', '10', '--repeat', '1', '--only', 'generate_users_batch',
+                    '--output', os.path.join(directory, 'results.json')]
+            with unittest.mock.patch('builtins.print'):
+                self.assertEqual(benchmark.main(argv), 0)
+                self.assertEqual(benchmark.main(argv + ['--compare', baseline_path]), 1)
+
+if __name__ == '__main__':
+    unittest.main()
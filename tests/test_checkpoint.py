@@ -0,0 +1,105 @@
+import unittest
+import json
+import os
+import tempfile
+from argparse import Namespace
+from checkpoint import Manifest, pending_users
+from pipeline import chunk_plan, generate_chunks
+from sinks import JsonFileSink
+import main
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'checkpoint.json')
+        self.params = {'docs_count': 25, 'chunk_size': 10, 'seed': 7, 'reference_time': 1700000000}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_commit_and_resume(self):
+        manifest = Manifest.open(self.path, self.params)
+        for index in (0, 1, 3):
+            manifest.commit('file:x', index, offset=index * 100)
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['sinks']['file:x']['chunks'], [[0, 2], [3, 4]])
+        resumed = Manifest.open(self.path, dict(self.params, seed=None), resume=True)
+        self.assertEqual(resumed.params['seed'], 7)
+        self.assertEqual(resumed.committed('file:x'), {0, 1, 3})
+        self.assertEqual(resumed.state('file:x'), {'offset': 300})
+        self.assertEqual(resumed.committed('mongo:db.coll'), set())
+
+    def test_update_keeps_state(self):
+        manifest = Manifest.open(self.path, self.params)
+        manifest.update('mongo:db.coll', indexes=[{'key': [['seller_id', 1]], 'name': 'seller_id_1'}])
+        manifest.commit('mongo:db.coll', 0)
+        resumed = Manifest.open(self.path, self.params, resume=True)
+        self.assertEqual(resumed.state('mongo:db.coll')['indexes'][0]['name'], 'seller_id_1')
+        self.assertEqual(resumed.committed('mongo:db.coll'), {0})
+
+    def test_resume_with_other_params(self):
+        Manifest.open(self.path, self.params)
+        with self.assertRaises(ValueError):
+            Manifest.open(self.path, dict(self.params, docs_count=30), resume=True)
+
+    def test_pending_users(self):
+        manifest = Manifest(self.path, self.params)
+        manifest.sinks['file:x'] = {'chunks': {0, 2}}
+        self.assertEqual(pending_users(manifest, 'file:x', chunk_plan(25, 10)), 10)
+        self.assertEqual(pending_users(None, 'file:x', chunk_plan(25, 10)), 25)
+
+class TestResume(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD']
+        }
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.directory.name, 'dados.json')
+        self.args = Namespace(generate=25, chunk_size=10, seed=3, reference_time=None, workers=1,
+                              checkpoint=os.path.join(self.directory.name, 'checkpoint.json'), resume=False)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self):
+        with open(self.file_path, encoding='utf-8') as f:
+            return f.read()
+
+    def test_skip_chunks(self):
+        chunks = list(generate_chunks(self.config, 25, 10, seed=3, reference_time=0, skip={0, 2}))
+        self.assertEqual([chunk.index for chunk in chunks], [1])
+        full = list(generate_chunks(self.config, 25, 10, seed=3, reference_time=0))
+        self.assertEqual(chunks[0], full[1])
+
+    def test_interrupted_file_is_resumed(self):
+        for indent in (None, 2):
+            manifest = main.open_checkpoint(self.args)
+            sink = JsonFileSink(self.file_path, indent=indent)
+            chunks = main.args_chunks(self.args, self.config, sink, manifest)
+            with self.assertRaises(KeyboardInterrupt):
+                def interrupted():
+                    for chunk in chunks:
+                        yield chunk
+                        if chunk.index == 1:
+                            raise KeyboardInterrupt
+                main.save_to_json(interrupted(), sink, manifest)
+
+            args = Namespace(**dict(vars(self.args), seed=None, resume=True))
+            manifest = main.open_checkpoint(args)
+            self.assertEqual(manifest.committed(sink.checkpoint_key), {0, 1})
+            sink = JsonFileSink(self.file_path, indent=indent, **manifest.state(sink.checkpoint_key))
+            main.save_to_json(main.args_chunks(args, self.config, sink, manifest), sink, manifest)
+            resumed = self.read()
+
+            full = Namespace(**dict(vars(self.args), reference_time=manifest.params['reference_time']))
+            sink = JsonFileSink(self.file_path, indent=indent)
+            main.save_to_json(main.args_chunks(full, self.config, sink), sink)
+            self.assertEqual(resumed, self.read())
+            self.assertEqual(len(json.loads(resumed)), 25)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import csv
+import os
+import tempfile
+import unittest
+import numpy as np
+from columnar import (ColumnarSink, DICTIONARY_FIELDS, ORDINAL_FIELDS, dictionary_fields, ordinal_fields, flatten,
+                      load_table, load_dictionary, npy_header, NPY_HEADER_SIZE)
+from pipeline import generate_chunks
+from records import Records, Nested
+
+class TestFlatten(unittest.TestCase):
+
+    def test_child_table_keyed_by_parent(self):
+        items = Records(('id',), [[10, 11, 12]], 3)
+        records = Records(('key', 'age', 'items'), [['a', 'b'], [1, 2], Nested(items, [0, 0], [0, 3])], 2)
+        tables = flatten(records)
+        self.assertEqual(tables['users'], (('key', 'age'), [['a', 'b'], [1, 2]]))
+        self.assertEqual(tables['items'], (('key', 'id'), [['b', 'b', 'b'], [10, 11, 12]]))
+
+    def test_nested_arrays_rejected(self):
+        inner = Records(('x',), [[1]], 1)
+        items = Records(('inner',), [Nested(inner, [0], [1])], 1)
+        with self.assertRaises(ValueError):
+            flatten(Records(('key', 'items'), [['a'], Nested(items, [0], [1])], 1))
+
+    def test_npy_header_size(self):
+        self.assertEqual(len(npy_header(np.dtype('S18'), 10 ** 12)), NPY_HEADER_SIZE)
+
+class TestColumnarSink(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}, {'mcc': 5462, 'category': 'PADARIA'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD']
+        }
+        self.directory = tempfile.TemporaryDirectory()
+        self.users = [user for chunk in generate_chunks(self.config, 250, 60, seed=2, reference_time=1_700_000_000)
+                      for user in chunk]
+        self.transactions = [(user['consumer_id'], t) for user in self.users for t in user['transactions']]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, fmt):
+        sink = ColumnarSink(os.path.join(self.directory.name, fmt), fmt)
+        with sink:
+            for chunk in generate_chunks(self.config, 250, 60, seed=2, date_format=sink.date_format,
+                                         encoder=sink.encoder, reference_time=1_700_000_000):
+                sink.write(chunk)
+        self.assertEqual(sink.count, 250)
+        return sink.directory
+
+    def test_csv(self):
+        directory = self._write('csv')
+        with open(os.path.join(directory, 'users.csv'), encoding='utf-8') as f:
+            users = list(csv.DictReader(f))
+        with open(os.path.join(directory, 'transactions.csv'), encoding='utf-8') as f:
+            transactions = list(csv.DictReader(f))
+        self.assertEqual([user['consumer_id'] for user in users], [user['consumer_id'] for user in self.users])
+        self.assertEqual(users[0]['age'], str(self.users[0]['age']))
+        self.assertNotIn('transactions', users[0])
+        self.assertEqual([(t['consumer_id'], t['transactionId'], t['mccCategory']) for t in transactions],
+                         [(key, t['transactionId'], t['mccCategory']) for key, t in self.transactions])
+
+    def test_npy_memory_mapped(self):
+        directory = self._write('npy')
+        users = load_table(directory, 'users')
+        transactions = load_table(directory, 'transactions')
+        self.assertIsInstance(users['age'], np.memmap)
+        self.assertEqual(users['age'].tolist(), [user['age'] for user in self.users])
+        self.assertEqual(len(transactions['consumer_id']), len(self.transactions))
+        self.assertEqual(transactions['consumer_id'][0].decode(), self.transactions[0][0])
+        self.assertEqual(transactions['value'].tolist(), [t['value'] for _, t in self.transactions])
+        self.assertEqual(transactions['date'].astype(object).tolist(), [t['date'] for _, t in self.transactions])
+        dictionary = load_dictionary(directory)
+        categories = [dictionary['transactions.mccCategory'][code] for code in transactions['mccCategory']]
+        self.assertEqual(categories, [t['mccCategory'] for _, t in self.transactions])
+        self.assertNotIn('transactions.seller_name', dictionary)
+        self.assertEqual(transactions['seller_name'].dtype, np.int64)
+        names = [f'SELLER{ordinal}' for ordinal in transactions['seller_name'].tolist()]
+        self.assertEqual(names, [t['seller_name'] for _, t in self.transactions])
+
+    def test_dictionary_fields_from_schema(self):
+        self.assertEqual(set(dictionary_fields(self.config)), set(DICTIONARY_FIELDS))
+        schema = {
+            "id": {"type": "id", "sequence": "consumer"},
+            "tier": {"type": "choice", "values": ["A", "PLATINUM"]},
+            "level": {"type": "choice", "values": [1, 2]},
+            "orders": {"type": "array", "max": 2, "items": {
+                "mcc": {"type": "lookup", "source": "MCC_DICT", "field": "mcc"},
+                "seller": {"type": "seller", "field": "name"}
+            }}
+        }
+        self.assertEqual(dictionary_fields(dict(self.config, SCHEMA=schema)), ('tier',))
+        self.assertEqual(ordinal_fields(self.config), ORDINAL_FIELDS)
+        self.assertEqual(ordinal_fields(dict(self.config, SCHEMA=schema)), ('seller',))
+
+    def test_npy_variable_width_text(self):
+        schema = {"id": {"type": "id", "sequence": "consumer"}, "tier": {"type": "choice", "values": ["A", "PLATINUM"]}}
+        directory = os.path.join(self.directory.name, 'tiers')
+        with ColumnarSink(directory, 'npy', dictionary_fields(dict(self.config, SCHEMA=schema))) as sink:
+            # O primeiro chunk só tem o texto curto; o segundo, o longo
+            sink.write(Records(('id', 'tier'), [['01', '02'], ['A', 'A']], 2))
+            sink.write(Records(('id', 'tier'), [['03'], ['PLATINUM']], 1))
+        tiers = load_dictionary(directory)['users.tier']
+        self.assertEqual([tiers[code] for code in load_table(directory, 'users')['tier']], ['A', 'A', 'PLATINUM'])
+
+if __name__ == '__main__':
+    unittest.main()
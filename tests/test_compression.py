@@ -0,0 +1,125 @@
+import unittest
+import csv
+import gzip
+import json
+import os
+import tempfile
+from argparse import Namespace
+from columnar import ColumnarSink
+from compression import CompressedWriter, compress, decompress, load_index, INDEX_SUFFIX
+from pipeline import generate_chunks
+from sinks import JsonFileSink
+import main
+
+class TestCodecs(unittest.TestCase):
+
+    def test_concatenated_members_roundtrip(self):
+        for codec in ('gzip', 'bz2', 'xz'):
+            data = compress(b'abc' * 100, codec) + compress(b'def', codec, level=1)
+            self.assertEqual(decompress(data, codec), b'abc' * 100 + b'def', codec)
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            JsonFileSink('dados.json', compress='rar')
+
+class TestCompressedSinks(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD']
+        }
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, sink, workers=1):
+        with sink:
+            for chunk in generate_chunks(self.config, 45, 10, seed=5, workers=workers, reference_time=0,
+                                         date_format=sink.date_format, encoder=sink.encoder):
+                sink.write(chunk)
+
+    def test_gzip_matches_plain_output(self):
+        plain = os.path.join(self.directory.name, 'dados.json')
+        compressed = plain + '.gz'
+        for indent in (None, 2):
+            self._write(JsonFileSink(plain, indent=indent))
+            self._write(JsonFileSink(compressed, indent=indent, compress='gzip'), workers=2)
+            with open(plain, 'rb') as f:
+                expected = f.read()
+            with gzip.open(compressed, 'rb') as f:
+                self.assertEqual(f.read(), expected)
+
+    def test_json_chunks_are_single_members(self):
+        path = os.path.join(self.directory.name, 'dados.json.gz')
+        for indent in (None, 4):
+            sink = JsonFileSink(path, indent=indent, compress='gzip')
+            self._write(sink, workers=2)
+            # Um membro por chunk, mais o fechamento do array
+            self.assertEqual(len(load_index(path + INDEX_SUFFIX)), 6)
+            self.assertEqual(sink.bytes_written, os.path.getsize(path))
+            with gzip.open(path, 'rb') as f:
+                self.assertEqual(len(json.loads(f.read())), 45)
+
+    def test_index_members_decompress_independently(self):
+        path = os.path.join(self.directory.name, 'dados.ndjson.bz2')
+        self._write(JsonFileSink(path, fmt='ndjson', compress='bz2'))
+        with open(path, 'rb') as f:
+            data = f.read()
+        entries = load_index(path + INDEX_SUFFIX)
+        self.assertEqual(len(entries), 5)
+        raw = b''.join(decompress(data[e['offset']:e['offset'] + e['size']], 'bz2') for e in entries)
+        self.assertEqual(raw, decompress(data, 'bz2'))
+        self.assertEqual(entries[-1]['raw_offset'] + entries[-1]['raw_size'], len(raw))
+        self.assertEqual(len(raw.splitlines()), 45)
+
+    def test_resume_truncates_members_and_index(self):
+        path = os.path.join(self.directory.name, 'dados.json.gz')
+        writer = CompressedWriter(path, 'gzip')
+        writer.write(b'[1')
+        writer.flush()
+        offset = writer.tell()
+        writer.write(b',2')
+        writer.close()
+        writer = CompressedWriter(path, 'gzip', offset=offset)
+        writer.write(b',3]')
+        writer.close()
+        with gzip.open(path, 'rb') as f:
+            self.assertEqual(json.loads(f.read()), [1, 3])
+        self.assertEqual([e['raw_offset'] for e in load_index(path + INDEX_SUFFIX)], [0, 2])
+
+    def test_checkpointed_compressed_run_resumes(self):
+        path = os.path.join(self.directory.name, 'dados.json.gz')
+        args = Namespace(generate=45, chunk_size=10, seed=3, reference_time=None, workers=1,
+                         checkpoint=os.path.join(self.directory.name, 'checkpoint.json'), resume=False)
+        manifest = main.open_checkpoint(args)
+        sink = JsonFileSink(path, compress='gzip')
+
+        def interrupted():
+            for chunk in main.args_chunks(args, self.config, sink, manifest):
+                yield chunk
+                if chunk.index == 1:
+                    raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            main.save_to_json(interrupted(), sink, manifest)
+        args = Namespace(**dict(vars(args), seed=None, resume=True))
+        manifest = main.open_checkpoint(args)
+        sink = JsonFileSink(path, compress='gzip', **manifest.state(sink.checkpoint_key))
+        main.save_to_json(main.args_chunks(args, self.config, sink, manifest), sink, manifest)
+        with gzip.open(path, 'rb') as f:
+            users = json.loads(f.read())
+        self.assertEqual(len({user['consumer_id'] for user in users}), 45)
+
+    def test_columnar_csv(self):
+        directory = os.path.join(self.directory.name, 'tables')
+        self._write(ColumnarSink(directory, 'csv', compress='gzip'), workers=2)
+        with gzip.open(os.path.join(directory, 'users.csv.gz'), 'rt', encoding='utf-8') as f:
+            self.assertEqual(len(list(csv.DictReader(f))), 45)
+        self.assertTrue(os.path.exists(os.path.join(directory, 'transactions.csv.gz' + INDEX_SUFFIX)))
+        with self.assertRaises(ValueError):
+            ColumnarSink(directory, 'npy', compress='gzip')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,11 @@
 import unittest
 from data_generator import DataGenerator
+from pipeline import generate_chunks
 from datetime import datetime
 import json
+import os
+import time
+import numpy as np
 
 class TestDataGenerator(unittest.TestCase):
 
@@ -39,11 +43,81 @@ class TestDataGenerator(unittest.TestCase):
         self.assertIn('consumer_id', user)
         self.assertIn('transactions', user)
 
+    def test_generate_users_batch(self):
+        users = self.generator.generate_users_batch(50)
+        self.assertEqual(len(users), 50)
+        self.assertEqual(len(self.generator.seller_registry), 51)
+        sellers = set(self.generator.seller_registry.seller_ids())
+        for user in users:
+            self.assertEqual(len(user['consumer_id']), 18)
+            self.assertTrue(user['consumer_id'].isdigit())
+            self.assertEqual(len(user['seller_id']), 6)
+            self.assertTrue(16 <= user['age'] <= 99)
+            self.assertTrue(0 <= len(user['transactions']) <= 4)
+            for transaction in user['transactions']:
+                self.assertIn(transaction['seller_id'], sellers)
+                self.assertIsInstance(transaction['date'], datetime)
+                self.assertIsInstance(transaction['value'], float)
+
+    def test_generate_users_batch_seeded(self):
+        first = DataGenerator(dict(self.config, SELLERS=["221512"]), seed=7).generate_users_batch(10)
+        second = DataGenerator(dict(self.config, SELLERS=["221512"]), seed=7).generate_users_batch(10)
+        self.assertEqual([u['consumer_id'] for u in first], [u['consumer_id'] for u in second])
+
+    def test_counters(self):
+        self.generator.generate_user()
+        self.generator.generate_users_batch(3)
+        self.assertEqual(self.generator.counters['users'], 4)
+        with self.assertLogs('data_generator', level='INFO') as logs:
+            self.generator.flush_counters()
+        self.assertIn('users=4', logs.output[0])
+        self.assertFalse(self.generator.counters)
+
+    def test_seller_records_match_generated_sellers(self):
+        for registry in ({}, {'eviction': 'reservoir', 'capacity': 20}):
+            config = dict(self.config, SELLER_REGISTRY=registry)
+            users = [user for chunk in generate_chunks(config, 130, 50, seed=2, reference_time=0) for user in chunk]
+            generator = DataGenerator(config, seed=2, id_key=2)
+            sellers = {}
+            for start in range(0, 130, 50):
+                sellers.update(zip(*generator.generate_seller_records(start, min(50, 130 - start)).columns))
+            self.assertEqual(len(sellers), 130 + len(config['SELLERS']))
+            self.assertTrue(all(user['seller_id'] in sellers for user in users))
+            for transaction in (t for user in users for t in user['transactions']):
+                self.assertEqual(sellers[transaction['seller_id']], transaction['seller_name'])
+
     def test_json_serial(self):
         now = datetime.now()
         serial = self.generator.json_serial(now)
         self.assertEqual(serial, now.isoformat())
 
+    @unittest.skipUnless(hasattr(time, 'tzset'), 'requires time.tzset')
+    def test_iso_timestamps_across_dst(self):
+        previous = os.environ.get('TZ')
+
+        def restore():
+            if previous is None:
+                os.environ.pop('TZ', None)
+            else:
+                os.environ['TZ'] = previous
+            time.tzset()
+
+        self.addCleanup(restore)
+        # Janela de um ano: primeira e última datas no mesmo deslocamento, com as
+        # mudanças de primavera e outono no meio (Lord Howe muda em meia hora)
+        start = int(datetime(2023, 1, 10).timestamp())
+        timestamps = np.arange(start, start + 365 * 86400, 1799, dtype=np.int64)
+        hours = timestamps - timestamps % 3600
+        for zone in ('Europe/Berlin', 'Australia/Lord_Howe', 'America/Sao_Paulo'):
+            os.environ['TZ'] = zone
+            time.tzset()
+            # Também só horas inteiras, sem a mudança de Lord Howe no meio de uma hora
+            for values in (timestamps, hours):
+                dates = DataGenerator.format_timestamps(values, 'iso')
+                wrong = [(t, date) for t, date in zip(values.tolist(), dates)
+                         if date != datetime.fromtimestamp(t).isoformat()]
+                self.assertEqual(wrong[:3], [], zone)
+
     def test_pretty_print_user(self):
         user = self.generator.generate_user()
         try:
@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+from id_allocator import IdAllocator
+
+class TestIdAllocator(unittest.TestCase):
+
+    def test_permutation_is_bijective(self):
+        allocator = IdAllocator(4, 11)
+        values = allocator.allocate(10 ** 4)
+        self.assertEqual(len(set(values.tolist())), 10 ** 4)
+        self.assertLess(int(values.max()), 10 ** 4)
+        np.testing.assert_array_equal(allocator.invert(values), np.arange(10 ** 4))
+
+    def test_same_key_same_sequence(self):
+        first = IdAllocator(18, 3).allocate(100)
+        second = IdAllocator(18, 3).allocate(100)
+        other = IdAllocator(18, 4).allocate(100)
+        np.testing.assert_array_equal(first, second)
+        self.assertFalse(np.array_equal(first, other))
+
+    def test_disjoint_ranges(self):
+        shard_a = IdAllocator(6, 1, start=0, stop=500).allocate(500)
+        shard_b = IdAllocator(6, 1, start=500, stop=1000).allocate(500)
+        self.assertFalse(set(shard_a.tolist()) & set(shard_b.tolist()))
+        np.testing.assert_array_equal(np.concatenate([shard_a, shard_b]), IdAllocator(6, 1).allocate(1000))
+
+    def test_reserved_ids_are_skipped(self):
+        allocator = IdAllocator(3, 5, reserved=['007', '123', '999'])
+        values = allocator.allocate(allocator.capacity)
+        self.assertEqual(allocator.capacity, 997)
+        self.assertFalse({7, 123, 999} & set(values.tolist()))
+        self.assertEqual(len(set(values.tolist())), 997)
+
+    def test_exhausted_range(self):
+        allocator = IdAllocator(2, 0, start=90)
+        allocator.allocate(10)
+        with self.assertRaises(OverflowError):
+            allocator.allocate(1)
+
+    def test_allocate_one_matches_allocate(self):
+        expected = IdAllocator(3, 5, reserved=['007', '123'], start=10, stop=700).allocate(690)
+        allocator = IdAllocator(3, 5, reserved=['007', '123'], start=10, stop=700)
+        values = [allocator.allocate_one() for _ in range(300)]
+        values.extend(allocator.allocate(90).tolist())
+        values.extend(allocator.allocate_one() for _ in range(300))
+        self.assertEqual(values, expected.tolist())
+        with self.assertRaises(OverflowError):
+            allocator.allocate_one()
+
+    def test_format(self):
+        allocator = IdAllocator(6, 0)
+        self.assertEqual(allocator.format(np.array([42, 123456], dtype=np.uint64)), ['000042', '123456'])
+        self.assertEqual(allocator.format_one(42), '000042')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+import logging
+import os
+import tempfile
+import logger
+
+class TestLogger(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.log_file = os.path.join(self.directory.name, 'app.log')
+        self.root = logging.getLogger()
+        self.handlers = list(self.root.handlers)
+        self.level = self.root.level
+        logger.stop_logging()
+
+    def tearDown(self):
+        logger.stop_logging()
+        self.root.handlers = self.handlers
+        self.root.setLevel(self.level)
+        self.directory.cleanup()
+
+    def test_setup_logging_writes_through_queue(self):
+        logger.setup_logging('WARNING', self.log_file)
+        logging.info('hidden')
+        logging.warning('visible')
+        logger.stop_logging()
+        with open(self.log_file, encoding='utf-8') as f:
+            content = f.read()
+        self.assertIn('WARNING - visible', content)
+        self.assertNotIn('hidden', content)
+
+    def test_set_log_level(self):
+        logger.set_log_level('debug')
+        self.assertEqual(self.root.level, logging.DEBUG)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,17 +1,25 @@
 import unittest
-from unittest.mock import patch, AsyncMock
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest.mock import patch, MagicMock
 import main
 from argparse import Namespace
 
 class TestMain(unittest.TestCase):
 
     @patch('main.asyncio.run')
-    @patch('main.async_main', new_callable=AsyncMock)
+    # MagicMock, e não o AsyncMock que patch usaria: com asyncio.run simulado, a corrotina nunca seria aguardada
+    @patch('main.async_main', new_callable=MagicMock)
     def test_main_generate_mongo(self, mock_async_main, mock_asyncio_run):
         args = Namespace(generate=10, output='mongo', connection='mongodb://localhost:27017', filename=None)
         with patch('main.config', new={"MONGO_DATABASE": "test_db", "MONGO_COLLECTION": "test_collection"}):
             main.run_main(args)
-            mock_asyncio_run.assert_called_once()
+            mock_asyncio_run.assert_called_once_with(mock_async_main.return_value)
             mock_async_main.assert_called_once_with(args, main.config)
 
     @patch('main.sync_main')
@@ -21,5 +29,153 @@ class TestMain(unittest.TestCase):
             main.run_main(args)
             mock_sync_main.assert_called_once_with(args, main.config)
 
+    def test_drop_is_rejected_with_shard(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, 'main.py', '--generate', '10', '--output', 'mongo', '--bulk-load',
+                                 '--drop', '--shard', '1/2', '--seed', '1', '--reference-time', '0'],
+                                cwd=root, capture_output=True, text=True)
+        self.assertEqual(output.returncode, 2)
+        self.assertIn('--drop', output.stderr)
+
+class TestHeadless(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD'],
+            "MONGO_DATABASE": "test_db",
+            "MONGO_COLLECTION": "test_collection"
+        }
+        # sync_main grava em output_json/ no diretório atual
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def test_import_is_lazy(self):
+        code = 'import sys, main; print(sorted(m for m in ("motor", "tqdm", "colorama") if m in sys.modules))'
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), '[]')
+
+    @patch('main.sleep')
+    @patch('main.system')
+    def test_quiet_json_has_no_delays(self, mock_system, mock_sleep):
+        args = Namespace(generate=5, output='json', filename='out.json', quiet=True)
+        self.assertEqual(main.sync_main(args, self.config), 0)
+        self.assertTrue(os.path.exists(os.path.join('output_json', 'out.json')))
+        mock_sleep.assert_not_called()
+        mock_system.assert_not_called()
+
+    def test_columnar_format_writes_tables(self):
+        args = Namespace(generate=5, output='json', filename='tables', format='csv', quiet=True)
+        self.assertEqual(main.sync_main(args, self.config), 0)
+        self.assertTrue(os.path.exists(os.path.join('output_json', 'tables', 'users.csv')))
+
+    def test_id_limit_fails_before_creating_the_file(self):
+        config = dict(self.config, SELLER_ID_LENGTH=6)
+        args = Namespace(generate=2_000_000, output='json', filename='big.ndjson', format='ndjson', quiet=True)
+        with patch('sys.stderr'):
+            self.assertEqual(main.sync_main(args, config), 1)
+        self.assertFalse(os.path.exists(os.path.join('output_json', 'big.ndjson')))
+
+    @patch('main.sleep')
+    def test_quiet_error_exit_code(self, mock_sleep):
+        args = Namespace(generate=5, output='json', filename='/nonexistent/dir/out.json', quiet=True)
+        with patch('sys.stderr') as stderr:
+            self.assertEqual(main.sync_main(args, self.config), 1)
+            stderr.write.assert_called()
+        mock_sleep.assert_not_called()
+
+class TestStreamMain(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD'],
+            "MONGO_DATABASE": "test_db",
+            "MONGO_COLLECTION": "test_collection"
+        }
+
+    def test_parse_rate(self):
+        self.assertEqual(main.parse_rate('50000/s'), 50000)
+        self.assertEqual(main.parse_rate('120/m'), 2)
+        self.assertEqual(main.parse_rate('10'), 10)
+        for value in ('10/x', 'fast', '0/s', '-5'):
+            with self.assertRaises(main.argparse.ArgumentTypeError):
+                main.parse_rate(value)
+
+    def test_stream_to_stdout(self):
+        args = Namespace(rate=100000.0, output='stdout', generate=60, unit='transactions', chunk_size=20,
+                         seed=5, reference_time=None, quiet=True, stats=None)
+        stdout = Namespace(buffer=io.BytesIO())
+        with patch('sys.stdout', stdout):
+            self.assertEqual(asyncio.run(main.stream_main(args, self.config)), 0)
+        lines = stdout.buffer.getvalue().splitlines()
+        self.assertEqual(len(lines), 60)
+        self.assertIn('consumer_id', json.loads(lines[0]))
+
+class FakeCollection:
+    """
+    Coleção em memória com a parte da interface do Motor usada pela carga em massa.
+    """
+
+    def __init__(self, indexes=None):
+        self.documents = []
+        self.indexes = dict(indexes or {})
+        self.events = []
+
+    async def index_information(self):
+        return dict(self.indexes, _id_={'v': 2, 'key': [('_id', 1)]})
+
+    async def drop_indexes(self):
+        self.events.append('drop_indexes')
+        self.indexes = {}
+
+    async def insert_many(self, documents, ordered=True):
+        self.events.append('insert')
+        self.documents.extend(documents)
+
+    async def create_indexes(self, models):
+        self.events.append('create_indexes')
+        self.indexes.update({model.document['name']: model.document for model in models})
+
+class TestBulkLoad(unittest.IsolatedAsyncioTestCase):
+
+    async def test_bulk_load_defers_indexes_and_writes_sellers(self):
+        config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD'],
+            "MONGO_DATABASE": "test_db",
+            "MONGO_COLLECTION": "test_collection"
+        }
+        from mongodb_handler import MongoDBHandler
+        users = FakeCollection({'score_1': {'v': 2, 'key': [('score', 1)]}})
+        sellers = FakeCollection()
+
+        async def connect(handler):
+            handler.coll = users if handler.collection == 'test_collection' else sellers
+        args = Namespace(generate=25, output='mongo', connection='mongodb://localhost:27017', chunk_size=10,
+                         seed=None, reference_time=None, quiet=True, bulk_load=True)
+        with patch.object(MongoDBHandler, 'connect', connect):
+            self.assertEqual(await main.async_main(args, config), 0)
+        self.assertEqual(users.events[0], 'drop_indexes')
+        self.assertEqual(users.events[-1], 'create_indexes')
+        self.assertEqual(set(users.indexes), {'score_1', 'seller_id_1', 'transactions.date_1', 'transactions.mcc_1'})
+        self.assertEqual(len(users.documents), 25)
+        names = {seller['seller_id']: seller['seller_name'] for seller in sellers.documents}
+        self.assertEqual(len(names), 26)
+        self.assertEqual({seller['_id'] for seller in sellers.documents}, set(names))
+        for user in users.documents:
+            self.assertIn(user['seller_id'], names)
+            for transaction in user['transactions']:
+                self.assertEqual(names[transaction['seller_id']], transaction['seller_name'])
+
 if __name__ == "__main__":
     unittest.main()
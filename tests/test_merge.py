@@ -0,0 +1,110 @@
+import unittest
+import gzip
+import os
+import tempfile
+from argparse import Namespace
+import numpy as np
+from columnar import load_table, load_dictionary
+from compression import INDEX_SUFFIX, decompress, load_index
+from pipeline import generate_chunks, shard_chunks
+import main
+import merge
+
+class TestShards(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}, {'mcc': 5462, 'category': 'PADARIA'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD']
+        }
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def test_shard_chunks_cover_plan(self):
+        for chunks, shards in ((10, 3), (2, 4), (7, 7)):
+            ranges = [shard_chunks(chunks, shard, shards) for shard in range(shards)]
+            self.assertEqual([index for r in ranges for index in r], list(range(chunks)))
+        with self.assertRaises(ValueError):
+            shard_chunks(10, 3, 3)
+
+    def test_shards_form_the_single_run(self):
+        full = [user for chunk in generate_chunks(self.config, 95, 10, seed=4, reference_time=0) for user in chunk]
+        parts = [user for shard in range(3)
+                 for chunk in generate_chunks(self.config, 95, 10, seed=4, reference_time=0, shard=(shard, 3))
+                 for user in chunk]
+        self.assertEqual(parts, full)
+
+    def test_parse_shard(self):
+        self.assertEqual(main.parse_shard('2/4'), (1, 4))
+        for value in ('0/4', '5/4', 'x'):
+            with self.assertRaises(Exception):
+                main.parse_shard(value)
+
+    def _run(self, shard=None, **options):
+        args = Namespace(generate=95, output='json', filename=None, chunk_size=10, seed=4,
+                         reference_time='2024-01-01T00:00:00', quiet=True, shard=shard, **options)
+        self.assertEqual(main.sync_main(args, self.config), 0)
+
+    def _shards(self, name, **options):
+        for shard in range(3):
+            self._run((shard, 3), **options)
+        return [os.path.join('output_json', f'dados-{shard:05d}-of-00003{name}') for shard in (1, 2, 3)]
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_merge_ndjson(self):
+        parts = self._shards('.ndjson', format='ndjson')
+        self._run(format='ndjson')
+        merge.merge(parts, 'merged.ndjson')
+        self.assertEqual(self.read('merged.ndjson'), self.read(os.path.join('output_json', 'dados.ndjson')))
+
+    def test_merge_compressed_ndjson(self):
+        parts = self._shards('.ndjson.gz', format='ndjson', compress='gzip')
+        self._run(format='ndjson')
+        self.assertEqual(merge.main(parts + ['--output', 'merged.ndjson.gz']), 0)
+        data = self.read('merged.ndjson.gz')
+        expected = self.read(os.path.join('output_json', 'dados.ndjson'))
+        self.assertEqual(gzip.decompress(data), expected)
+        entries = load_index('merged.ndjson.gz' + INDEX_SUFFIX)
+        raw = b''.join(decompress(data[e['offset']:e['offset'] + e['size']], 'gzip') for e in entries)
+        self.assertEqual(raw, expected)
+        self.assertEqual([e['raw_offset'] for e in entries][-1] + entries[-1]['raw_size'], len(expected))
+
+    def test_merge_csv(self):
+        for compress in (None, 'gzip'):
+            parts = self._shards('', format='csv', compress=compress)
+            self._run(format='csv', compress=compress)
+            merge.merge(parts, 'merged')
+            name = 'transactions.csv' + ('.gz' if compress else '')
+            merged, expected = self.read(os.path.join('merged', name)), self.read(os.path.join('output_json', 'dados', name))
+            if compress:
+                merged, expected = gzip.decompress(merged), gzip.decompress(expected)
+            self.assertEqual(merged, expected)
+
+    def test_merge_npy(self):
+        parts = self._shards('', format='npy')
+        self._run(format='npy')
+        merge.merge(parts, 'merged')
+        expected_dir = os.path.join('output_json', 'dados')
+        for table in ('users', 'transactions'):
+            merged, expected = load_table('merged', table), load_table(expected_dir, table)
+            self.assertEqual(sorted(merged), sorted(expected))
+            for column in expected:
+                np.testing.assert_array_equal(merged[column], expected[column])
+        self.assertEqual(load_dictionary('merged'), load_dictionary(expected_dir))
+
+    def test_json_arrays_rejected(self):
+        parts = self._shards('.json')
+        with self.assertRaises(ValueError):
+            merge.merge(parts, 'merged.json')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,15 @@
 import unittest
+import asyncio
 from unittest.mock import patch, AsyncMock, MagicMock
-from mongodb_handler import MongoDBHandler
+from pymongo.errors import AutoReconnect, BulkWriteError
+from bson import decode
+from bson.raw_bson import RawBSONDocument
+from mongodb_handler import MongoDBHandler, BsonChunkEncoder, BULK_LOAD_INDEXES, merge_indexes
+from pipeline import generate_chunk
+
+async def as_chunks(chunks):
+    for chunk in chunks:
+        yield chunk
 
 class TestMongoDBHandler(unittest.IsolatedAsyncioTestCase):
 
@@ -25,5 +34,137 @@ class TestMongoDBHandler(unittest.IsolatedAsyncioTestCase):
         await self.handler.insert_many(data)
         mock_coll.insert_many.assert_awaited_once_with(data)
 
+    @patch('motor.motor_asyncio.AsyncIOMotorClient')
+    async def test_connect_pool_options(self, mock_client):
+        handler = MongoDBHandler("mongodb://localhost:27017", "test_db", "test_collection",
+                                 max_pool_size=32, write_concern='majority')
+        await handler.connect()
+        mock_client.assert_called_with("mongodb://localhost:27017", maxPoolSize=32, w='majority')
+
+class TestMongoDBHandlerBulk(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.handler = MongoDBHandler("mongodb://localhost:27017", "test_db", "test_collection")
+        self.handler.coll = MagicMock()
+        self.batches = []
+        self.active = 0
+        self.max_active = 0
+
+        async def insert_many(batch, ordered=True):
+            self.assertFalse(ordered)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            await asyncio.sleep(0.01)
+            self.active -= 1
+            self.batches.append(batch)
+
+        self.handler.coll.insert_many = AsyncMock(side_effect=insert_many)
+
+    async def test_insert_chunks_batches(self):
+        chunks = [[{'n': i} for i in range(25)], [{'n': i} for i in range(7)]]
+        inserted = await self.handler.insert_chunks(as_chunks(chunks), batch_size=10, concurrency=2)
+        self.assertEqual(inserted, 32)
+        self.assertEqual(sorted(len(batch) for batch in self.batches), [5, 7, 10, 10])
+        self.assertLessEqual(self.max_active, 2)
+        self.assertGreater(self.max_active, 1)
+
+    async def test_retry_with_backoff(self):
+        self.handler.coll.insert_many = AsyncMock(side_effect=[AutoReconnect('down'), None])
+        inserted = await self.handler.insert_chunks(as_chunks([[{'n': 1}]]), retries=2, backoff=0)
+        self.assertEqual(inserted, 1)
+        self.assertEqual(self.handler.coll.insert_many.await_count, 2)
+
+    async def test_retry_after_partial_write(self):
+        duplicates = BulkWriteError({'writeErrors': [{'code': 11000, 'index': 0}]})
+        self.handler.coll.insert_many = AsyncMock(side_effect=[AutoReconnect('down'), duplicates])
+        inserted = await self.handler.insert_chunks(as_chunks([[{'n': 1}]]), retries=2, backoff=0)
+        self.assertEqual(inserted, 1)
+
+    async def test_permanent_failure(self):
+        self.handler.coll.insert_many = AsyncMock(side_effect=AutoReconnect('down'))
+        with self.assertRaises(AutoReconnect):
+            await self.handler.insert_chunks(as_chunks([[{'n': 1}]]), retries=1, backoff=0)
+        self.assertEqual(self.handler.coll.insert_many.await_count, 2)
+
+    async def test_non_retryable_error(self):
+        error = BulkWriteError({'writeErrors': [{'code': 121, 'index': 0}]})
+        self.handler.coll.insert_many = AsyncMock(side_effect=error)
+        with self.assertRaises(BulkWriteError):
+            await self.handler.insert_chunks(as_chunks([[{'n': 1}]]), retries=3, backoff=0)
+        self.assertEqual(self.handler.coll.insert_many.await_count, 1)
+
+    async def test_insert_raw_bson_chunks(self):
+        config = {"SELLERS": ["221512"], "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}],
+                  "TRANSACTION_TYPES": ['PIX']}
+        handler = MongoDBHandler("mongodb://localhost:27017", "test_db", "test_collection", raw_bson=True)
+        handler.coll = self.handler.coll
+        chunk = generate_chunk(config, 1, 0, 0, 5, handler.date_format, handler.encoder)
+        inserted = await handler.insert_chunks(as_chunks([chunk]), batch_size=10)
+        self.assertEqual(inserted, 5)
+        self.assertTrue(all(isinstance(doc, RawBSONDocument) for doc in self.batches[0]))
+
+    async def test_on_chunk_done(self):
+        config = {"SELLERS": ["221512"], "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}],
+                  "TRANSACTION_TYPES": ['PIX']}
+        chunks = [generate_chunk(config, 1, index, index * 5, 5) for index in range(3)]
+        done = []
+        await self.handler.insert_chunks(as_chunks(chunks), batch_size=2, concurrency=3,
+                                         on_chunk_done=done.append)
+        self.assertEqual(sorted(done), [0, 1, 2])
+
+    async def test_id_field_makes_reinsert_idempotent(self):
+        handler = MongoDBHandler("mongodb://localhost:27017", "test_db", "test_collection", id_field='consumer_id')
+        duplicates = BulkWriteError({'writeErrors': [{'code': 11000, 'index': 0}]})
+        handler.coll = MagicMock()
+        handler.coll.insert_many = AsyncMock(side_effect=duplicates)
+        inserted = await handler.insert_chunks(as_chunks([[{'consumer_id': '42'}]]), retries=0)
+        self.assertEqual(inserted, 1)
+        self.assertEqual(handler.coll.insert_many.await_args.args[0], [{'consumer_id': '42', '_id': '42'}])
+
+class TestBulkLoadIndexes(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.handler = MongoDBHandler("mongodb://localhost:27017", "test_db", "test_collection")
+        self.handler.coll = MagicMock()
+        self.handler.coll.index_information = AsyncMock(return_value={
+            '_id_': {'v': 2, 'key': [('_id', 1)]},
+            'email_1': {'v': 2, 'key': [('email', 1)], 'unique': True},
+        })
+        self.handler.coll.drop_indexes = AsyncMock()
+        self.handler.coll.drop = AsyncMock()
+        self.handler.coll.create_indexes = AsyncMock()
+
+    async def test_drop_indexes_records_definitions(self):
+        indexes = await self.handler.drop_indexes()
+        self.assertEqual(indexes, [{'unique': True, 'key': [['email', 1]], 'name': 'email_1'}])
+        self.handler.coll.drop_indexes.assert_awaited_once()
+        self.handler.coll.drop.assert_not_awaited()
+
+    async def test_drop_collection(self):
+        await self.handler.drop_indexes(drop_collection=True)
+        self.handler.coll.drop.assert_awaited_once()
+
+    async def test_create_indexes(self):
+        indexes = merge_indexes(await self.handler.drop_indexes(), BULK_LOAD_INDEXES,
+                                [{'key': [['seller_id', 1]], 'name': 'other'}])
+        await self.handler.create_indexes(indexes)
+        models = self.handler.coll.create_indexes.await_args.args[0]
+        self.assertEqual([model.document['name'] for model in models],
+                         ['email_1', 'seller_id_1', 'transactions.date_1', 'transactions.mcc_1'])
+        self.assertTrue(models[0].document['unique'])
+
+class TestBsonChunkEncoder(unittest.TestCase):
+
+    def test_encode(self):
+        users = [{'consumer_id': '1', 'transactions': [{'value': 1.5}]}]
+        raw = BsonChunkEncoder()(users)
+        document = decode(raw[0])
+        self.assertIn('_id', document)
+        self.assertEqual(document['transactions'], [{'value': 1.5}])
+
+    def test_encode_id_field(self):
+        raw = BsonChunkEncoder('consumer_id')([{'consumer_id': '1'}])
+        self.assertEqual(decode(raw[0]), {'_id': '1', 'consumer_id': '1'})
+
 if __name__ == "__main__":
     unittest.main()
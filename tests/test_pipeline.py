@@ -0,0 +1,92 @@
+import unittest
+import asyncio
+from data_generator import DataGenerator
+from pipeline import generate_chunks, prefetch, aprefetch, chunk_plan
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD']
+        }
+
+    def test_chunk_plan(self):
+        self.assertEqual(chunk_plan(25, 10), [(0, 0, 10), (1, 10, 10), (2, 20, 5)])
+        self.assertEqual(chunk_plan(0, 10), [])
+
+    def test_generate_chunks_sizes(self):
+        sizes = [len(chunk) for chunk in generate_chunks(self.config, 25, chunk_size=10)]
+        self.assertEqual(sizes, [10, 10, 5])
+        self.assertEqual(self.config["SELLERS"], ["221512"])
+
+    def test_generate_chunks_reproducible_across_workers(self):
+        def ids(workers):
+            chunks = generate_chunks(self.config, 30, chunk_size=7, seed=42, workers=workers)
+            return [(user['consumer_id'], [t['transactionId'] for t in user['transactions']])
+                    for chunk in chunks for user in chunk]
+
+        self.assertEqual(ids(1), ids(2))
+        self.assertEqual(len(ids(1)), 30)
+
+    def test_generate_chunks_reproducible_dates(self):
+        def dates():
+            chunks = generate_chunks(self.config, 10, chunk_size=4, seed=1, reference_time='2024-01-31T00:00:00')
+            return [t['date'] for chunk in chunks for user in chunk for t in user['transactions']]
+
+        self.assertEqual(dates(), dates())
+
+    def test_generate_chunks_unique_ids(self):
+        users = [user for chunk in generate_chunks(self.config, 50, chunk_size=7, seed=5) for user in chunk]
+        self.assertEqual(len({user['consumer_id'] for user in users}), 50)
+        self.assertEqual(len({user['seller_id'] for user in users} | {"221512"}), 51)
+        transaction_ids = [t['transactionId'] for user in users for t in user['transactions']]
+        self.assertEqual(len(set(transaction_ids)), len(transaction_ids))
+
+    def test_generate_chunks_matches_sequential_generator(self):
+        chunked = [user for chunk in generate_chunks(self.config, 20, chunk_size=6, seed=9) for user in chunk]
+        generator = DataGenerator(self.config, id_key=9)
+        sequential = generator.generate_users_batch(20)
+        self.assertEqual([u['consumer_id'] for u in chunked], [u['consumer_id'] for u in sequential])
+        self.assertEqual([u['seller_id'] for u in chunked], [u['seller_id'] for u in sequential])
+
+    def test_generate_chunks_id_limit(self):
+        config = dict(self.config, SELLER_ID_LENGTH=6)
+        with self.assertRaises(ValueError):
+            next(generate_chunks(config, 10 ** 6, chunk_size=10))
+
+    def test_generate_chunks_widens_seller_ids(self):
+        users = next(generate_chunks(self.config, 2 * 10 ** 6, chunk_size=10, seed=3))
+        self.assertEqual({len(user['seller_id']) for user in users}, {7})
+        sellers = {t['seller_id'] for user in users for t in user['transactions']}
+        self.assertEqual({len(seller) for seller in sellers}, {7})
+        self.assertEqual(DataGenerator.config_for(self.config, 10 ** 5), self.config)
+        self.assertEqual(DataGenerator.config_for(self.config, 10 ** 8)['SELLER_ID_LENGTH'], 9)
+        self.assertNotIn('SELLER_ID_LENGTH', self.config)
+
+    def test_prefetch_preserves_order(self):
+        self.assertEqual(list(prefetch(iter(range(100)), max_queue=2)), list(range(100)))
+
+    def test_prefetch_propagates_errors(self):
+        def failing():
+            yield 1
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            list(prefetch(failing()))
+
+    def test_prefetch_early_exit(self):
+        iterator = prefetch(iter(range(1000)), max_queue=1)
+        self.assertEqual(next(iterator), 0)
+        iterator.close()
+
+    def test_aprefetch(self):
+        async def collect():
+            return [chunk async for chunk in aprefetch(generate_chunks(self.config, 7, chunk_size=3))]
+
+        chunks = asyncio.run(collect())
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from datetime import datetime
+from data_generator import DataGenerator
+from mongodb_handler import BsonChunkEncoder
+from records import Records, Nested
+from sinks import JsonChunkEncoder, json_column
+from pipeline import generate_chunk
+
+class TestRecords(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}, {'mcc': 5462, 'category': 'PADARIA'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD']
+        }
+        items = Records(('id', 'value'), [[1, 2, 3], [0.5, 1.5, 2.5]], 3)
+        self.records = Records(('name', 'items'), [['a', 'b', 'c'], Nested(items, [0, 2, 2], [2, 2, 3])], 3)
+
+    def test_to_dicts(self):
+        self.assertEqual(self.records.to_dicts(), [
+            {'name': 'a', 'items': [{'id': 1, 'value': 0.5}, {'id': 2, 'value': 1.5}]},
+            {'name': 'b', 'items': []},
+            {'name': 'c', 'items': [{'id': 3, 'value': 2.5}]},
+        ])
+
+    def test_slice_rebases_nested(self):
+        tail = self.records.slice(1, 10)
+        self.assertEqual(len(tail), 2)
+        self.assertEqual(tail.to_dicts(), self.records.to_dicts()[1:])
+        self.assertEqual(len(self.records.slice(3, 5)), 0)
+
+    def test_iter_dicts(self):
+        self.assertEqual(list(self.records.iter_dicts(batch_size=2)), self.records.to_dicts())
+
+    def test_generate_records_matches_batch(self):
+        records = DataGenerator(self.config, seed=4, reference_time=0).generate_records(100, 'iso')
+        users = DataGenerator(self.config, seed=4, reference_time=0).generate_users_batch(100, 'iso')
+        self.assertIsInstance(records, Records)
+        self.assertEqual(records.to_dicts(), users)
+
+class TestRecordEncoders(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}, {'mcc': 5462, 'category': 'PADARIA'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD']
+        }
+
+    def _both(self, date_format):
+        generate = lambda: DataGenerator(self.config, seed=9, reference_time=0)
+        return generate().generate_records(200, date_format), generate().generate_users_batch(200, date_format)
+
+    def test_json_from_records_matches_dicts(self):
+        for date_format in ('iso', 'datetime'):
+            records, users = self._both(date_format)
+            for fmt, indent in (('json', None), ('ndjson', None), ('json', 2)):
+                encoder = JsonChunkEncoder(fmt, indent)
+                self.assertEqual(encoder(records), encoder(users), (date_format, fmt, indent))
+
+    def test_json_column(self):
+        encoder = JsonChunkEncoder()._encoder()
+        self.assertEqual(json_column(['a"', 'ç'], encoder), ['"a\\""', '"ç"'])
+        self.assertEqual(json_column([1, 2.5], encoder), ['1', '2.5'])
+        self.assertEqual(json_column([], encoder), [])
+        self.assertEqual(json_column([True, None], encoder), ['true', 'null'])
+        self.assertEqual(json_column([datetime(2024, 1, 2)], encoder), ['"2024-01-02T00:00:00"'])
+
+    def test_bson_from_records_matches_dicts(self):
+        records, users = self._both('datetime')
+        encoder = BsonChunkEncoder(id_field='consumer_id')
+        self.assertEqual(encoder(records), encoder(users))
+
+    def test_encoded_chunk_from_records(self):
+        chunk = generate_chunk(self.config, 1, 0, 0, 50, 'iso', JsonChunkEncoder('ndjson'), 0)
+        self.assertEqual(chunk.count, 50)
+        self.assertEqual(chunk.payload.count(b'\n'), 50)
+
+if __name__ == '__main__':
+    unittest.main()
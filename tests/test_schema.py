@@ -0,0 +1,109 @@
+import unittest
+from data_generator import DataGenerator
+from pipeline import generate_chunks
+from schema import GenerationPlan, DEFAULT_SCHEMA, categorical_fields
+
+LIMITS = {'consumer': 1, 'transaction': 4}
+
+class TestGenerationPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}, {'mcc': 5462, 'category': 'PADARIA'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD'],
+            "SCHEMA": DEFAULT_SCHEMA
+        }
+
+    def test_default_schema_matches_generator_shape(self):
+        hand_written = DataGenerator({k: v for k, v in self.config.items() if k != 'SCHEMA'}, seed=1)
+        generator = DataGenerator(self.config, seed=1)
+        expected = hand_written.generate_users_batch(50)
+        users = generator.generate_users_batch(50, 'iso')
+        self.assertEqual([list(user) for user in users], [list(user) for user in expected])
+        transactions = [t for user in users for t in user['transactions']]
+        self.assertEqual(generator.counters['users'], 50)
+        self.assertEqual(generator.counters['transactions'], len(transactions))
+        mccs = {item['mcc']: item['category'] for item in self.config['MCC_DICT']}
+        for transaction in transactions:
+            self.assertEqual(list(transaction), list(DEFAULT_SCHEMA['transactions']['items']))
+            self.assertEqual(mccs[transaction['mcc']], transaction['mccCategory'])
+            self.assertIsInstance(transaction['date'], str)
+            self.assertTrue(10 <= transaction['value'] < 201)
+
+    def test_unique_ids_across_chunks(self):
+        users = [user for chunk in generate_chunks(self.config, 300, 70, seed=3) for user in chunk]
+        self.assertEqual(len({user['consumer_id'] for user in users}), 300)
+        transaction_ids = [t['transactionId'] for user in users for t in user['transactions']]
+        self.assertEqual(len(set(transaction_ids)), len(transaction_ids))
+
+    def test_custom_schema(self):
+        schema = {
+            "id": {"type": "id", "sequence": "consumer"},
+            "country": {"type": "constant", "value": "BR"},
+            "tier": {"type": "choice", "values": ["gold", "silver"], "weights": [0, 1]},
+            "age": {"type": "int", "min": 18, "max": 30, "distribution": "normal"},
+            "orders": {"type": "array", "min": 2, "max": 2, "items": {
+                "items": {"type": "array", "min": 1, "max": 2, "items": {"sku": {"type": "int", "min": 1, "max": 9}}}
+            }}
+        }
+        generator = DataGenerator(dict(self.config, SCHEMA=schema), seed=2)
+        users = generator.generate_users_batch(20)
+        for user in users:
+            self.assertEqual(user['country'], 'BR')
+            self.assertEqual(user['tier'], 'silver')
+            self.assertTrue(18 <= user['age'] <= 30)
+            self.assertEqual(len(user['orders']), 2)
+            for order in user['orders']:
+                self.assertIn(len(order['items']), (1, 2))
+        self.assertFalse(generator.plan.new_sellers)
+
+    def test_id_budget_is_shared_by_the_sequence(self):
+        schema = {
+            "a": {"type": "array", "max": 2, "items": {"t": {"type": "id", "sequence": "transaction"}}},
+            "b": {"type": "array", "min": 2, "max": 2, "items": {"t": {"type": "id", "sequence": "transaction"}}}
+        }
+        self.assertEqual(GenerationPlan(schema, self.config, LIMITS).root.id_usage, {'transaction': 4})
+        users = [user for chunk in generate_chunks(dict(self.config, SCHEMA=schema), 200, 30, seed=4)
+                 for user in chunk]
+        ids = [t['t'] for user in users for t in user['a'] + user['b']]
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_invalid_schemas(self):
+        invalid = [
+            {"x": {"type": "unknown"}},
+            {"x": {"type": "choice", "source": "MISSING"}},
+            {"x": {"type": "id", "sequence": "consumer"}, "y": {"type": "array", "max": 2, "items": {
+                "z": {"type": "id", "sequence": "consumer"}}}},
+            {"x": {"type": "array", "max": 5, "items": {"t": {"type": "id", "sequence": "transaction"}}}},
+            {"x": {"type": "array", "max": 1, "items": {"s": {"type": "seller", "new": True}}}},
+            {"x": {"type": "choice", "values": [1, 2], "weights": [1]}},
+            {"x": {"type": "id", "sequence": "consumer"}, "y": {"type": "id", "sequence": "consumer"}},
+            {"x": {"type": "array", "max": 2, "items": {"t": {"type": "id", "sequence": "transaction"}}},
+             "y": {"type": "array", "max": 3, "items": {"t": {"type": "id", "sequence": "transaction"}}}},
+            {"x": {"type": "array", "max": 2, "items": {"t": {"type": "id", "sequence": "transaction"},
+                                                        "u": {"type": "id", "sequence": "transaction"},
+                                                        "v": {"type": "id", "sequence": "transaction"}}}},
+            {"x": {"type": "seller", "new": True}, "y": {"type": "seller", "new": True}},
+        ]
+        for schema in invalid:
+            with self.assertRaises(ValueError, msg=schema):
+                GenerationPlan(schema, self.config, LIMITS)
+
+    def test_missing_field_keys(self):
+        malformed = [
+            ({"x": {"type": "int", "min": 1}}, 'Field x needs "max"'),
+            ({"x": {"type": "decimal", "max": 10}}, 'Field x needs "min"'),
+            ({"x": {"type": "array", "max": 2}}, 'Field x needs "items"'),
+            ({"x": {"type": "array", "items": {"y": {"type": "int", "min": 0, "max": 1}}}}, 'Field x needs "max"'),
+            ({"x": {"type": "constant"}}, 'Field x needs "value"'),
+            ({"x": {"type": "lookup", "source": "MCC_DICT"}}, 'Field x needs "field"'),
+        ]
+        for schema, message in malformed:
+            with self.assertRaisesRegex(ValueError, message, msg=schema):
+                GenerationPlan(schema, self.config, LIMITS)
+        with self.assertRaisesRegex(ValueError, 'Field x needs "items"'):
+            categorical_fields({"x": {"type": "array", "max": 2}}, self.config)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import numpy as np
+from seller_registry import SellerRegistry, alias_table
+
+class TestSellerRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def test_initial_sellers(self):
+        registry = SellerRegistry(["221512", "000042"], rng=self.rng)
+        self.assertEqual(len(registry), 2)
+        self.assertEqual(registry.seller_ids(), ["221512", "000042"])
+
+    def test_ring_keeps_most_recent(self):
+        registry = SellerRegistry(capacity=4, rng=self.rng)
+        registry.add(np.arange(10, dtype=np.int64))
+        self.assertEqual(len(registry), 4)
+        self.assertEqual(registry.total, 10)
+        self.assertEqual(sorted(int(i) for i in registry.seller_ids()), [6, 7, 8, 9])
+        slots = np.arange(4)
+        names = dict(zip(registry.seller_ids(slots), registry.seller_names(slots)))
+        self.assertEqual(names['000007'], 'SELLER7')
+
+    def test_reservoir_is_bounded(self):
+        registry = SellerRegistry(capacity=8, eviction='reservoir', rng=self.rng)
+        for start in range(0, 1000, 100):
+            registry.add(np.arange(start, start + 100, dtype=np.int64))
+        self.assertEqual(len(registry), 8)
+        self.assertEqual(registry.total, 1000)
+        self.assertEqual(len(set(registry.seller_ids())), 8)
+
+    def test_uniform_sample_within_size(self):
+        registry = SellerRegistry(["1", "2", "3"], capacity=100, rng=self.rng)
+        slots = registry.sample(1000)
+        self.assertTrue(((slots >= 0) & (slots < 3)).all())
+
+    def test_zipf_favours_first_slots(self):
+        registry = SellerRegistry(capacity=1000, distribution='zipf', rng=self.rng)
+        registry.add(np.arange(1000, dtype=np.int64))
+        counts = np.bincount(registry.sample(100_000), minlength=1000)
+        self.assertGreater(counts[0], counts[10])
+        self.assertGreater(counts[10], counts[500])
+
+    def test_zipf_partially_filled(self):
+        registry = SellerRegistry(["1", "2"], capacity=1000, distribution='zipf', rng=self.rng)
+        self.assertTrue((registry.sample(500) < 2).all())
+
+    def test_scalar_calls_match_batch_calls(self):
+        for options in ({'eviction': 'ring'}, {'eviction': 'reservoir', 'distribution': 'zipf'}):
+            batch = SellerRegistry(["1"], capacity=50, rng=np.random.default_rng(3), **options)
+            scalar = SellerRegistry(["1"], capacity=50, rng=np.random.default_rng(3), **options)
+            for seller_id in range(100, 220):
+                batch.add(np.array([seller_id], dtype=np.int64))
+                scalar.add_one(seller_id)
+                self.assertEqual(scalar.sample_one(), int(batch.sample(1)[0]))
+            np.testing.assert_array_equal(scalar.ids, batch.ids)
+            np.testing.assert_array_equal(scalar.ordinals, batch.ordinals)
+
+    def test_alias_table(self):
+        prob, alias = alias_table(50, 1.2)
+        self.assertEqual(len(prob), 50)
+        self.assertTrue(((prob >= 0) & (prob <= 1.0 + 1e-9)).all())
+        self.assertTrue(((alias >= 0) & (alias < 50)).all())
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            SellerRegistry(capacity=0)
+        with self.assertRaises(ValueError):
+            SellerRegistry(eviction='lru')
+        with self.assertRaises(ValueError):
+            SellerRegistry().sample(1)
+
+    def test_from_config(self):
+        config = {"SELLERS": ["221512"], "SELLER_REGISTRY": {"capacity": 10, "distribution": "zipf"}}
+        registry = SellerRegistry.from_config(config, self.rng)
+        self.assertEqual(registry.capacity, 10)
+        self.assertEqual(registry.distribution, 'zipf')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import json
+import os
+import tempfile
+from data_generator import DataGenerator
+from sinks import JsonFileSink, JsonChunkEncoder
+from pipeline import generate_chunk
+
+class TestJsonFileSink(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD']
+        }
+        self.generator = DataGenerator(self.config)
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.directory.name, 'dados.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self):
+        with open(self.file_path, encoding='utf-8') as f:
+            return f.read()
+
+    def test_matches_json_dump(self):
+        users = self.generator.generate_users_batch(5)
+        with JsonFileSink(self.file_path, indent=4) as sink:
+            sink.write(users[:2])
+            sink.write(users[2:])
+        expected = json.dumps(users, ensure_ascii=False, indent=4, default=DataGenerator.json_serial)
+        self.assertEqual(self.read(), expected)
+
+    def test_compact(self):
+        users = self.generator.generate_users_batch(3)
+        with JsonFileSink(self.file_path) as sink:
+            sink.write(users[:1])
+            sink.write([])
+            sink.write(users[1:])
+        expected = json.dumps(users, ensure_ascii=False, separators=(',', ':'), default=DataGenerator.json_serial)
+        self.assertEqual(self.read(), expected)
+
+    def test_empty(self):
+        with JsonFileSink(self.file_path):
+            pass
+        self.assertEqual(json.loads(self.read()), [])
+
+    def test_ndjson(self):
+        users = self.generator.generate_users_batch(4)
+        with JsonFileSink(self.file_path, fmt='ndjson') as sink:
+            sink.write(users)
+        lines = self.read().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(json.loads(lines[0])['consumer_id'], users[0]['consumer_id'])
+
+    def test_encoded_chunks(self):
+        sink = JsonFileSink(self.file_path)
+        with sink:
+            for index in range(3):
+                sink.write(generate_chunk(self.config, 1, index, index * 5, 5, sink.date_format, sink.encoder))
+        users = json.loads(self.read())
+        self.assertEqual(len(users), 15)
+        self.assertIsInstance(users[0]['consumer_id'], str)
+
+    def test_encoded_chunks_of_a_shard(self):
+        sink = JsonFileSink(self.file_path, indent=2)
+        # O arquivo de um shard começa em um chunk que não é o 0
+        sink.first_chunk = 4
+        with sink:
+            for index in range(4, 6):
+                sink.write(generate_chunk(self.config, 1, index, index * 5, 5, sink.date_format, sink.encoder))
+        self.assertEqual(len(json.loads(self.read())), 10)
+        self.assertEqual(sink.bytes_written, os.path.getsize(self.file_path))
+
+    def test_iso_dates_match_isoformat(self):
+        generator = DataGenerator(self.config, seed=3)
+        users = DataGenerator(self.config, seed=3).generate_users_batch(20)
+        iso_users = generator.generate_users_batch(20, date_format='iso')
+        dates = [t['date'].isoformat() for user in users for t in user['transactions']]
+        iso_dates = [t['date'] for user in iso_users for t in user['transactions']]
+        self.assertEqual(dates, iso_dates)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            JsonChunkEncoder('xml')
+
+if __name__ == "__main__":
+    unittest.main()
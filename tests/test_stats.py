@@ -0,0 +1,65 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+from stats import Histogram, RunStats, LiveSummary, profiled
+from pipeline import EncodedChunk, prefetch
+
+class TestHistogram(unittest.TestCase):
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        for _ in range(90):
+            histogram.record(0.001)
+        for _ in range(10):
+            histogram.record(0.5)
+        self.assertEqual(histogram.count, 100)
+        self.assertLessEqual(histogram.percentile(50), 0.0016)
+        self.assertGreaterEqual(histogram.percentile(99), 0.4)
+        self.assertEqual(histogram.percentile(100), 0.5)
+        self.assertEqual(Histogram().percentile(50), 0.0)
+
+class TestRunStats(unittest.TestCase):
+
+    def test_report(self):
+        stats = RunStats()
+        stats.add_chunk(EncodedChunk(0, 10, b'', {'generate': 0.2, 'encode': 0.1}))
+        with stats.timer('write', histogram=True):
+            stats.count('bytes', 100)
+        stats.finish()
+        report = stats.to_dict()
+        self.assertEqual(report['counters'], {'chunks': 1, 'users': 10, 'bytes': 100})
+        self.assertAlmostEqual(report['stages']['generate'], 0.2)
+        self.assertEqual(set(report['latency']), {'generate', 'encode', 'write'})
+        self.assertIn('users_per_sec', report['rates'])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stats.json')
+            stats.write(path)
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(json.load(f)['counters']['users'], 10)
+
+    def test_prefetch_queue_timers(self):
+        stats = RunStats()
+        self.assertEqual(list(prefetch(iter([[1], [2]]), 1, stats)), [[1], [2]])
+        self.assertIn('queue_wait', stats.timers)
+
+    def test_live_summary(self):
+        stats = RunStats()
+        stream = io.StringIO()
+        with LiveSummary(stats, total=20, interval=0, stream=stream) as summary:
+            stats.count('users', 10)
+            summary.update(10)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('users 10/20 (50.0%)', lines[0])
+
+    def test_profiled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.prof')
+            with profiled(path):
+                sum(range(1000))
+            self.assertTrue(os.path.exists(path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+import asyncio
+import io
+import json
+import unittest
+from unittest.mock import patch
+import bson
+from data_generator import DataGenerator
+from pipeline import generate_chunks
+from streaming import (RateProfile, TokenBucket, EventEncoder, EventSource, StdoutTarget, MongoTarget,
+                       stream, stream_chunks, stream_documents, stream_records)
+from stats import RunStats
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+class TestRateProfile(unittest.TestCase):
+
+    def test_constant_rate(self):
+        profile = RateProfile(1000)
+        self.assertEqual(profile.allowed(2.5), 2500)
+        self.assertAlmostEqual(profile.time_of(2500), 2.5)
+        self.assertEqual(profile.rate_at(0), 1000)
+
+    def test_ramp_is_the_integral_of_the_rate(self):
+        profile = RateProfile(20000, ramp=2, start_rate=1000)
+        self.assertEqual(profile.rate_at(1), 10500)
+        self.assertAlmostEqual(profile.allowed(2), 21000)
+        self.assertAlmostEqual(profile.allowed(4), 61000)
+        for t in (0.001, 0.5, 1.9, 2.0, 3.7):
+            self.assertAlmostEqual(profile.time_of(profile.allowed(t)), t)
+
+    def test_ramp_down_and_from_zero(self):
+        for profile in (RateProfile(100, ramp=5, start_rate=1000), RateProfile(500, ramp=3)):
+            for t in (0.01, 1.0, 2.9, 6.0):
+                self.assertAlmostEqual(profile.time_of(profile.allowed(t)), t)
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            RateProfile(0)
+        with self.assertRaises(ValueError):
+            RateProfile(10, ramp=-1)
+
+class TestTokenBucket(unittest.IsolatedAsyncioTestCase):
+
+    async def test_tokens_follow_the_clock_without_drift(self):
+        clock = FakeClock()
+        bucket = TokenBucket(RateProfile(2), burst=5000, clock=clock)
+        bucket.start()
+        clock.now += 1.25
+        self.assertEqual(await bucket.take(100), 2)
+        clock.now += 1.25
+        # A fração de token que sobrou do despertar anterior não se perde
+        self.assertEqual(await bucket.take(100), 3)
+        clock.now += 100
+        self.assertEqual(await bucket.take(100), 100)
+        self.assertEqual(bucket.dropped, 0)
+
+    async def test_backlog_beyond_burst_is_dropped(self):
+        clock = FakeClock()
+        bucket = TokenBucket(RateProfile(1000), burst=50, clock=clock)
+        bucket.start()
+        clock.now += 1
+        self.assertEqual(await bucket.take(1000), 50)
+        self.assertEqual(bucket.dropped, 950)
+
+    async def test_take_waits_for_the_next_token(self):
+        clock = FakeClock()
+        bucket = TokenBucket(RateProfile(200), clock=clock)
+        bucket.start()
+
+        async def sleep(delay):
+            # Dorme exatamente o pedido: um atraso real do event loop liberaria mais tokens
+            clock.now += delay
+
+        with patch('streaming.asyncio.sleep', new=sleep):
+            self.assertEqual(await bucket.take(10), 1)
+        self.assertGreaterEqual(bucket.elapsed, bucket.profile.time_of(1))
+
+class TestEvents(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}, {'mcc': 5462, 'category': 'PADARIA'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD']
+        }
+
+    def test_transaction_events(self):
+        generator = DataGenerator(self.config, seed=2, reference_time=0)
+        users = generator.generate_users_batch(50, 'iso')
+        events = stream_documents(users, 'transactions')
+        self.assertEqual(len(events), sum(len(user['transactions']) for user in users))
+        self.assertEqual(events[0]['consumer_id'], next(u for u in users if u['transactions'])['consumer_id'])
+        self.assertEqual(list(events[0])[0], 'consumer_id')
+
+    def test_records_match_documents(self):
+        records = DataGenerator(self.config, seed=2, reference_time=0).generate_records(80, 'iso')
+        users = records.to_dicts()
+        for unit in ('users', 'transactions'):
+            self.assertEqual(stream_records(records, unit).to_dicts(), stream_documents(users, unit))
+
+    def test_encoder_emits_one_buffer_per_event(self):
+        records = DataGenerator(self.config, seed=2, reference_time=0).generate_records(30, 'iso')
+        lines = EventEncoder('transactions')(records)
+        self.assertEqual([json.loads(line) for line in lines], stream_documents(records.to_dicts(), 'transactions'))
+        records = DataGenerator(self.config, seed=2, reference_time=0).generate_records(30, 'datetime')
+        documents = EventEncoder('users', 'bson')(records)
+        self.assertEqual(len(documents), 30)
+        self.assertEqual(bson.decode(documents[0])['consumer_id'], records.column('consumer_id')[0])
+
+class FakeCollection:
+
+    def __init__(self):
+        self.documents = []
+
+    async def insert_many(self, documents, ordered=True):
+        self.documents.extend(documents)
+
+class TestStream(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.config = {
+            "SELLERS": ["221512"],
+            "MCC_DICT": [{'mcc': 5422, 'category': 'AÇOUGUEIRO'}],
+            "TRANSACTION_TYPES": ['QRCODE', 'PIX', 'CARD']
+        }
+
+    def _source(self, target, unit='users', limit=None):
+        return EventSource(stream_chunks(self.config, limit, unit, 100, 7, 1, target.date_format, target.encoder,
+                                         reference_time=0), unit)
+
+    async def test_limit_and_report(self):
+        output = io.BytesIO()
+        target = StdoutTarget('users', output)
+        stats = RunStats()
+        report = await stream(self._source(target, limit=250), target, TokenBucket(RateProfile(100000)),
+                              max_batch=40, limit=250, stats=stats, summary_interval=None)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 250)
+        expected = [user for chunk in generate_chunks(self.config, 250, 100, 7, reference_time=0, date_format='iso')
+                    for user in chunk]
+        self.assertEqual([json.loads(line) for line in lines], expected)
+        self.assertEqual(report['events'], 250)
+        self.assertEqual(report['errors'], 0)
+        self.assertGreaterEqual(report['batches'], 250 // 40)
+        self.assertEqual(stats.histograms['send'].count, report['batches'])
+
+    async def test_stream_continues_past_the_id_space(self):
+        # Com seller_ids de 2 dígitos, cada ciclo tem 100 usuários
+        self.config["SELLER_ID_LENGTH"] = 2
+        output = io.BytesIO()
+        target = StdoutTarget('users', output)
+        report = await stream(self._source(target), target, TokenBucket(RateProfile(100000)),
+                              max_batch=40, limit=250, summary_interval=None)
+        self.assertEqual(report['events'], 250)
+        users = [json.loads(line) for line in output.getvalue().splitlines()]
+        for cycle in range(0, 250, 100):
+            consumers = [user['consumer_id'] for user in users[cycle:cycle + 100]]
+            self.assertEqual(len(set(consumers)), len(consumers))
+        self.assertNotEqual(users[0]['consumer_id'], users[100]['consumer_id'])
+
+    def test_user_limit_beyond_the_id_space(self):
+        self.config["SELLER_ID_LENGTH"] = 2
+        with self.assertRaises(ValueError):
+            stream_chunks(self.config, 250, 'users')
+
+    async def test_duration_holds_the_rate(self):
+        output = io.BytesIO()
+        target = StdoutTarget('transactions', output)
+        report = await stream(self._source(target, 'transactions'), target, TokenBucket(RateProfile(2000)),
+                              duration=0.5, summary_interval=None)
+        self.assertAlmostEqual(report['events'], report['expected_events'], delta=report['expected_events'] * 0.1)
+        self.assertEqual(report['events'], len(output.getvalue().splitlines()))
+        self.assertAlmostEqual(report['expected_rate'], 2000, delta=1)
+
+    async def test_stop_event(self):
+        target = StdoutTarget('users', io.BytesIO())
+        stop = asyncio.Event()
+        asyncio.get_running_loop().call_later(0.2, stop.set)
+        report = await stream(self._source(target), target, TokenBucket(RateProfile(500)), stop=stop,
+                              summary_interval=None)
+        self.assertGreater(report['events'], 0)
+        self.assertLess(report['elapsed'], 1)
+
+    async def test_send_errors_are_counted(self):
+        class FailingTarget(StdoutTarget):
+            async def send(self, events):
+                raise OSError('broken pipe')
+        target = FailingTarget('users', io.BytesIO())
+        report = await stream(self._source(target, limit=30), target, TokenBucket(RateProfile(100000)),
+                              max_batch=10, limit=30, summary_interval=None)
+        self.assertEqual(report['events'], 0)
+        self.assertEqual(report['errors'], report['batches'])
+
+    async def test_mongo_target(self):
+        class Handler:
+            coll = FakeCollection()
+        target = MongoTarget(Handler(), 'users', concurrency=4)
+        report = await stream(self._source(target, limit=120), target, TokenBucket(RateProfile(100000)),
+                              max_batch=25, limit=120, summary_interval=None)
+        self.assertEqual(report['events'], 120)
+        self.assertEqual(len({document['_id'] for document in Handler.coll.documents}), 120)
+        self.assertEqual(len({document['consumer_id'] for document in Handler.coll.documents}), 120)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from datetime import datetime
+import numpy as np
+from time_window import TimeWindow, to_timestamp
+
+class TestTimeWindow(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+        self.reference = datetime(2024, 3, 1, 12, 30)
+
+    def test_fixed_reference(self):
+        window = TimeWindow(60, self.reference)
+        self.assertEqual(window.end, int(self.reference.timestamp()))
+        self.assertEqual(window.end - window.start, 60 * 86400)
+        timestamps = window.sample(self.rng, 10_000)
+        self.assertTrue(((timestamps >= window.start) & (timestamps <= window.end)).all())
+
+    def test_reference_formats(self):
+        expected = int(self.reference.timestamp())
+        self.assertEqual(to_timestamp('2024-03-01T12:30:00'), expected)
+        self.assertEqual(to_timestamp(expected), expected)
+
+    def test_hour_weights(self):
+        hours = [0.0] * 24
+        hours[9] = 1.0
+        window = TimeWindow(10, self.reference, hour_weights=hours)
+        timestamps = window.sample(self.rng, 1000)
+        self.assertTrue(((timestamps >= window.start) & (timestamps <= window.end)).all())
+        self.assertEqual({datetime.fromtimestamp(t).hour for t in timestamps.tolist()}, {9})
+
+    def test_weekday_weights(self):
+        window = TimeWindow(28, self.reference, weekday_weights=[0, 0, 0, 0, 0, 1, 1])
+        days = {datetime.fromtimestamp(t).weekday() for t in window.sample(self.rng, 1000).tolist()}
+        self.assertTrue(days <= {5, 6})
+
+    def test_sample_one_matches_sample(self):
+        for window in (TimeWindow(60, self.reference), TimeWindow(10, self.reference, weekday_weights=[1, 2, 3, 4, 5, 6, 7])):
+            batch, scalar = np.random.default_rng(4), np.random.default_rng(4)
+            for _ in range(200):
+                self.assertEqual(window.sample_one(scalar), int(window.sample(batch, 1)[0]))
+
+    def test_invalid_weights(self):
+        with self.assertRaises(ValueError):
+            TimeWindow(hour_weights=[1.0] * 23)
+
+    def test_from_config(self):
+        window = TimeWindow.from_config({"TIME_WEIGHTS": {"weekday": [1] * 7}}, self.reference)
+        self.assertEqual(window.days, 60)
+        self.assertIsNotNone(window.sample(self.rng, 1))
+
+if __name__ == "__main__":
+    unittest.main()
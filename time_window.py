@@ -0,0 +1,127 @@
+from bisect import bisect_right
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple, Union
+import numpy as np
+
+# Janela padrão, em dias, das datas das transações
+DEFAULT_DAYS = 60
+
+
+def to_timestamp(reference: Union[datetime, str, int, float, None]) -> int:
+    """
+    Converte uma data de referência em timestamp Unix.
+
+    Parâmetros:
+    reference (datetime, str, int ou None): Data (str em ISO 8601) ou timestamp; None usa o instante atual.
+
+    Retorno:
+    int: Timestamp Unix em segundos.
+    """
+    if reference is None:
+        return int(datetime.now().timestamp())
+    if isinstance(reference, str):
+        reference = datetime.fromisoformat(reference)
+    if isinstance(reference, datetime):
+        return int(reference.timestamp())
+    return int(reference)
+
+
+@lru_cache(maxsize=16)
+def _buckets(start: int, end: int, hour_weights: Tuple[float, ...],
+             weekday_weights: Tuple[float, ...]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Divide a janela em faixas de uma hora e calcula a probabilidade acumulada de cada faixa.
+
+    Retorno:
+    tuple: Arrays (início das faixas, duração das faixas, probabilidade acumulada).
+    """
+    edges = np.arange((start // 3600 + 1) * 3600, end + 1, 3600, dtype=np.int64)
+    starts = np.concatenate([[start], edges])
+    lengths = np.diff(np.concatenate([starts, [end + 1]]))
+    weights = np.empty(len(starts))
+    for i, bucket_start in enumerate(starts.tolist()):
+        local = datetime.fromtimestamp(bucket_start)
+        weights[i] = hour_weights[local.hour] * weekday_weights[local.weekday()]
+    weights *= lengths
+    cumulative = np.cumsum(weights)
+    return starts, lengths, cumulative / cumulative[-1]
+
+
+class TimeWindow:
+    def __init__(self, days: int = DEFAULT_DAYS, reference: Union[datetime, str, int, None] = None,
+                 hour_weights: Optional[Sequence[float]] = None,
+                 weekday_weights: Optional[Sequence[float]] = None):
+        """
+        Inicializa a janela de datas das transações, calculada uma única vez por execução.
+
+        Parâmetros:
+        days (int): O número de dias para trás a partir da referência.
+        reference (datetime, str, int, opcional): Fim da janela; None usa o instante atual.
+            Fixar a referência torna as datas reproduzíveis.
+        hour_weights (Sequence[float], opcional): 24 pesos relativos por hora do dia (horário local).
+        weekday_weights (Sequence[float], opcional): 7 pesos relativos por dia da semana, de segunda a domingo.
+        """
+        if hour_weights is not None and len(hour_weights) != 24:
+            raise ValueError('hour_weights must have 24 values')
+        if weekday_weights is not None and len(weekday_weights) != 7:
+            raise ValueError('weekday_weights must have 7 values')
+        self.days = days
+        self.end = to_timestamp(reference)
+        self.start = self.end - days * 86400
+        self._buckets = None
+        self._bucket_lists = None
+        if hour_weights is not None or weekday_weights is not None:
+            self._buckets = _buckets(self.start, self.end,
+                                     tuple(hour_weights or [1.0] * 24),
+                                     tuple(weekday_weights or [1.0] * 7))
+            self._bucket_lists = tuple(array.tolist() for array in self._buckets)
+
+    @classmethod
+    def from_config(cls, config: dict, reference: Union[datetime, str, int, None] = None) -> 'TimeWindow':
+        """
+        Cria a janela com os pesos de config["TIME_WEIGHTS"] ({"hour": [...], "weekday": [...]}).
+
+        Parâmetros:
+        config (dict): Dicionário de configuração carregado do arquivo config.json.
+        reference (datetime, str, int, opcional): Fim da janela; None usa o instante atual.
+
+        Retorno:
+        TimeWindow: Janela de datas.
+        """
+        weights = config.get("TIME_WEIGHTS", {})
+        return cls(DEFAULT_DAYS, reference, weights.get("hour"), weights.get("weekday"))
+
+    def sample(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """
+        Sorteia em lote timestamps Unix dentro da janela (extremos inclusos).
+
+        Parâmetros:
+        rng (Generator): Gerador NumPy.
+        n (int): Quantidade de timestamps.
+
+        Retorno:
+        ndarray: Timestamps Unix em segundos (int64).
+        """
+        if self._buckets is None:
+            return rng.integers(self.start, self.end + 1, size=n, dtype=np.int64)
+        starts, lengths, cumulative = self._buckets
+        bucket = np.minimum(np.searchsorted(cumulative, rng.random(n), side='right'), len(starts) - 1)
+        return starts[bucket] + (rng.random(n) * lengths[bucket]).astype(np.int64)
+
+    def sample_one(self, rng: np.random.Generator) -> int:
+        """
+        Sorteia um timestamp, com os mesmos sorteios de `sample(rng, 1)`, sem o
+        custo fixo das operações NumPy.
+
+        Parâmetros:
+        rng (Generator): Gerador NumPy.
+
+        Retorno:
+        int: Timestamp Unix em segundos.
+        """
+        if self._bucket_lists is None:
+            return int(rng.integers(self.start, self.end + 1, dtype=np.int64))
+        starts, lengths, cumulative = self._bucket_lists
+        bucket = min(bisect_right(cumulative, rng.random()), len(starts) - 1)
+        return starts[bucket] + int(rng.random() * lengths[bucket])